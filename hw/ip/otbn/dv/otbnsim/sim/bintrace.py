@@ -0,0 +1,307 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''A compact binary format for simulator traces, with a writer and reader.
+
+A trace has one row for each cycle that the simulator steps. Each row holds
+the PC at the start of the cycle and whether the cycle was a stall (rather
+than one where an instruction retired). Rows can have any number of GPR or
+WDR writes and DMEM stores attached.
+
+The file starts with MAGIC and is followed by a sequence of chunks. Each
+chunk starts with a header (CHUNK_HDR) giving the index of its first row, the
+number of rows, register writes and stores in the chunk and the sizes of the
+two value columns. This is followed by the columns of the chunk, in this
+order:
+
+  pcs           u32 per row
+  flags         u8 per row (FLAG_STALL)
+  reg_rows      u32 per register write (row index, relative to the chunk)
+  reg_ids       u8 per register write (REG_WDR for a WDR, plus REG_UNKNOWN
+                if the value is unknown, plus the register index)
+  reg_values    4 bytes per GPR write and 32 bytes per WDR write
+  store_rows    u32 per store (row index, relative to the chunk)
+  store_addrs   u32 per store
+  store_wide    u8 per store (1 for a 256-bit store)
+  store_values  4 bytes per narrow store and 32 bytes per wide store
+
+All integers (including the values) are little-endian. Storing columns,
+rather than one record per row, means that a reader that only wants the PCs
+can pull them out of each chunk with a single array conversion.
+
+'''
+
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+from .dmem import TraceDmemStore
+from .reg import TraceRegister
+from .trace import Trace
+
+MAGIC = b'OTBNTRC1'
+
+# Tag, first row, number of rows, register writes and stores, then the sizes
+# in bytes of the reg_values and store_values columns.
+CHUNK_HDR = struct.Struct('<4sQIIIII')
+CHUNK_TAG = b'CHNK'
+
+FLAG_STALL = 1
+
+REG_WDR = 0x20
+REG_UNKNOWN = 0x80
+
+NARROW_BYTES = 4
+WIDE_BYTES = 32
+
+# The default number of rows in a chunk
+DEFAULT_CHUNK_ROWS = 4096
+
+
+def _u32_array(data: bytes) -> 'array[int]':
+    ret = array('I')
+    assert ret.itemsize == 4
+    ret.frombytes(data)
+    if sys.byteorder != 'little':
+        ret.byteswap()
+    return ret
+
+
+def _u32_bytes(values: 'array[int]') -> bytes:
+    if sys.byteorder != 'little':
+        values = array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class TraceRecord:
+    '''The contents of a single row of a binary trace'''
+    def __init__(self,
+                 index: int,
+                 pc: int,
+                 stall: bool,
+                 regs: List[Tuple[str, Optional[int]]],
+                 stores: List[Tuple[int, int, bool]]):
+        self.index = index
+        self.pc = pc
+        self.stall = stall
+        # (name, value) pairs. The name is formatted like TraceRegister names
+        # (x01, w31) and the value is None if it is unknown.
+        self.regs = regs
+        # (address, value, is_wide) triples
+        self.stores = stores
+
+
+class TraceChunk:
+    '''The columns of a single chunk of a binary trace'''
+    def __init__(self, first_row: int, data: bytes,
+                 num_rows: int, num_regs: int, num_stores: int,
+                 reg_value_bytes: int, store_value_bytes: int):
+        self.first_row = first_row
+        self.num_rows = num_rows
+
+        pos = 0
+
+        def take(num_bytes: int) -> bytes:
+            nonlocal pos
+            ret = data[pos:pos + num_bytes]
+            pos += num_bytes
+            return ret
+
+        self.pcs = _u32_array(take(4 * num_rows))
+        self.flags = take(num_rows)
+        self.reg_rows = _u32_array(take(4 * num_regs))
+        self.reg_ids = take(num_regs)
+        self.reg_values = take(reg_value_bytes)
+        self.store_rows = _u32_array(take(4 * num_stores))
+        self.store_addrs = _u32_array(take(4 * num_stores))
+        self.store_wide = take(num_stores)
+        self.store_values = take(store_value_bytes)
+
+    @staticmethod
+    def data_size(num_rows: int, num_regs: int, num_stores: int,
+                  reg_value_bytes: int, store_value_bytes: int) -> int:
+        '''The number of bytes of column data after a chunk header'''
+        return (5 * num_rows + 5 * num_regs + 9 * num_stores +
+                reg_value_bytes + store_value_bytes)
+
+    def records(self) -> Iterator[TraceRecord]:
+        '''Iterate over the rows of the chunk'''
+        reg_idx = 0
+        reg_pos = 0
+        store_idx = 0
+        store_pos = 0
+        for row in range(self.num_rows):
+            regs = []
+            while (reg_idx < len(self.reg_rows) and
+                   self.reg_rows[reg_idx] == row):
+                reg_id = self.reg_ids[reg_idx]
+                is_wdr = bool(reg_id & REG_WDR)
+                size = WIDE_BYTES if is_wdr else NARROW_BYTES
+                name = '{}{:02}'.format('w' if is_wdr else 'x', reg_id & 0x1f)
+                value: Optional[int] = None
+                if not reg_id & REG_UNKNOWN:
+                    value = int.from_bytes(
+                        self.reg_values[reg_pos:reg_pos + size], 'little')
+                regs.append((name, value))
+                reg_idx += 1
+                reg_pos += size
+
+            stores = []
+            while (store_idx < len(self.store_rows) and
+                   self.store_rows[store_idx] == row):
+                is_wide = bool(self.store_wide[store_idx])
+                size = WIDE_BYTES if is_wide else NARROW_BYTES
+                value = int.from_bytes(
+                    self.store_values[store_pos:store_pos + size], 'little')
+                stores.append((self.store_addrs[store_idx], value, is_wide))
+                store_idx += 1
+                store_pos += size
+
+            yield TraceRecord(self.first_row + row, self.pcs[row],
+                              bool(self.flags[row] & FLAG_STALL),
+                              regs, stores)
+
+
+class BinTraceWriter:
+    '''Writes a binary trace to a file, a chunk at a time.
+
+    Rows are collected in memory until there are chunk_rows of them, when
+    they are written to the file as a chunk. Call close() at the end of the
+    trace to write the last (partial) chunk. This doesn't close the file
+    itself.
+
+    '''
+    def __init__(self, out: BinaryIO,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS) -> None:
+        assert chunk_rows > 0
+        self.out = out
+        self.chunk_rows = chunk_rows
+        self.num_rows = 0
+        self._chunk_start = 0
+        self._reset()
+        out.write(MAGIC)
+
+    def _reset(self) -> None:
+        self._pcs = array('I')
+        self._flags = bytearray()
+        self._reg_rows = array('I')
+        self._reg_ids = bytearray()
+        self._reg_values = bytearray()
+        self._store_rows = array('I')
+        self._store_addrs = array('I')
+        self._store_wide = bytearray()
+        self._store_values = bytearray()
+
+    def record(self, pc: int, stall: bool, changes: Sequence[Trace]) -> None:
+        '''Add a row for a cycle.
+
+        changes is the list of changes returned by OTBNSim.step(). GPR and
+        WDR writes and DMEM stores are recorded. Anything else is ignored.
+
+        '''
+        row = len(self._pcs)
+        self._pcs.append(pc)
+        self._flags.append(FLAG_STALL if stall else 0)
+
+        for change in changes:
+            if isinstance(change, TraceRegister):
+                pfx = change.name[0]
+                if pfx not in 'xw':
+                    continue
+                reg_id = int(change.name[1:])
+                size = NARROW_BYTES
+                if pfx == 'w':
+                    reg_id |= REG_WDR
+                    size = WIDE_BYTES
+                value = change.new_value
+                if value is None:
+                    reg_id |= REG_UNKNOWN
+                    value = 0
+                self._reg_rows.append(row)
+                self._reg_ids.append(reg_id)
+                self._reg_values += value.to_bytes(size, 'little')
+            elif isinstance(change, TraceDmemStore):
+                size = WIDE_BYTES if change.is_wide else NARROW_BYTES
+                self._store_rows.append(row)
+                self._store_addrs.append(change.addr)
+                self._store_wide.append(1 if change.is_wide else 0)
+                self._store_values += change.value.to_bytes(size, 'little')
+
+        self.num_rows += 1
+        if row + 1 >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        '''Write out the rows collected so far as a chunk'''
+        num_rows = len(self._pcs)
+        if not num_rows:
+            return
+
+        self.out.write(CHUNK_HDR.pack(CHUNK_TAG, self._chunk_start, num_rows,
+                                      len(self._reg_rows),
+                                      len(self._store_rows),
+                                      len(self._reg_values),
+                                      len(self._store_values)))
+        self.out.write(_u32_bytes(self._pcs))
+        self.out.write(self._flags)
+        self.out.write(_u32_bytes(self._reg_rows))
+        self.out.write(self._reg_ids)
+        self.out.write(self._reg_values)
+        self.out.write(_u32_bytes(self._store_rows))
+        self.out.write(_u32_bytes(self._store_addrs))
+        self.out.write(self._store_wide)
+        self.out.write(self._store_values)
+
+        self._chunk_start += num_rows
+        self._reset()
+
+    def close(self) -> None:
+        self.flush()
+        self.out.flush()
+
+
+def is_bin_trace(path: str) -> bool:
+    '''Return true if the file at path starts like a binary trace'''
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_chunks(inp: BinaryIO) -> Iterator[TraceChunk]:
+    '''Read the chunks of a binary trace from a file'''
+    if inp.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Input is not a binary OTBN trace.')
+
+    while True:
+        hdr = inp.read(CHUNK_HDR.size)
+        if not hdr:
+            return
+        if len(hdr) != CHUNK_HDR.size:
+            raise ValueError('Binary trace ends with a truncated chunk header.')
+        tag, first_row, *counts = CHUNK_HDR.unpack(hdr)
+        if tag != CHUNK_TAG:
+            raise ValueError('Bad chunk tag in binary trace: {!r}.'
+                             .format(tag))
+        size = TraceChunk.data_size(*counts)
+        data = inp.read(size)
+        if len(data) != size:
+            raise ValueError('Binary trace ends with a truncated chunk.')
+        yield TraceChunk(first_row, data, *counts)
+
+
+def read_records(path: str) -> Iterator[TraceRecord]:
+    '''Iterate over the rows of the binary trace at path'''
+    with open(path, 'rb') as f:
+        for chunk in read_chunks(f):
+            yield from chunk.records()
+
+
+def read_pcs(path: str) -> 'array[int]':
+    '''Return the PC of each row of the binary trace at path'''
+    pcs = array('I')
+    with open(path, 'rb') as f:
+        for chunk in read_chunks(f):
+            pcs.extend(chunk.pcs)
+    return pcs
@@ -5,7 +5,9 @@
 '''Code to load instruction words into a simulator'''
 
 import struct
-from typing import Iterator, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Type, Union
+
+from shared.operand import ImmOperandType
 
 from .constants import ErrBits
 from .isa import INSNS_FILE, OTBNInsn
@@ -14,6 +16,28 @@ from .state import OTBNState
 
 MNEM_TO_CLASS = {cls.insn.mnemonic: cls for cls in INSN_CLASSES}
 
+# The decoding of a word. This is either an error message (for a word that
+# doesn't decode to a legal instruction) or a tuple (cls, enc_vals, op_vals).
+# op_vals is None if the instruction has a PC-relative operand, in which case
+# the operand values depend on where the word is and are computed from
+# enc_vals each time.
+_DecodedInsn = Tuple[Type[OTBNInsn], Dict[str, int], Optional[Dict[str, int]]]
+_Decoded = Union[str, _DecodedInsn]
+
+# A cache of decoded words, keyed by the raw 32-bit word. This is shared
+# between calls to decode_words (so reloading a program decodes nothing new)
+# and, because it is module state, with any worker processes that are forked
+# after a program has been loaded.
+_DECODE_CACHE: Dict[int, _Decoded] = {}
+
+
+def _has_pc_rel_operand(cls: Type[OTBNInsn]) -> bool:
+    return any(isinstance(op.op_type, ImmOperandType) and op.op_type.pc_rel
+               for op in cls.insn.operands)
+
+
+_PC_REL_CLASSES = {cls for cls in INSN_CLASSES if _has_pc_rel_operand(cls)}
+
 
 class IllegalInsn(OTBNInsn):
     '''A catch-all subclass of Instruction for bad data
@@ -62,14 +86,14 @@ class EmptyInsn(OTBNInsn):
         return None
 
 
-def _decode_word(pc: int, word: int) -> OTBNInsn:
+def _decode_raw(pc: int, word: int) -> _Decoded:
     mnem = INSNS_FILE.mnem_for_word(word)
     if mnem is None:
-        return IllegalInsn(pc, word, 'No legal decoding')
+        return 'No legal decoding'
 
     cls = MNEM_TO_CLASS.get(mnem)
     if cls is None:
-        return IllegalInsn(pc, word, f'No insn class for mnemonic {mnem}')
+        return f'No insn class for mnemonic {mnem}'
 
     # Decode the instruction. We know that we have an encoding (we checked in
     # get_insn_masks).
@@ -77,8 +101,28 @@ def _decode_word(pc: int, word: int) -> OTBNInsn:
     enc_vals = cls.insn.encoding.extract_operands(word)
 
     # Make sense of these encoded values as "operand values" (doing any
-    # shifting, sign interpretation etc.)
-    op_vals = cls.insn.enc_vals_to_op_vals(pc, enc_vals)
+    # shifting, sign interpretation etc.) unless they depend on the PC.
+    op_vals = (None if cls in _PC_REL_CLASSES
+               else cls.insn.enc_vals_to_op_vals(pc, enc_vals))
+
+    return (cls, enc_vals, op_vals)
+
+
+def _decode_word(pc: int, word: int) -> OTBNInsn:
+    decoded = _DECODE_CACHE.get(word)
+    if decoded is None:
+        decoded = _decode_raw(pc, word)
+        _DECODE_CACHE[word] = decoded
+
+    if isinstance(decoded, str):
+        return IllegalInsn(pc, word, decoded)
+
+    # Each instruction gets its own object (even if the same word appears
+    # more than once) because OTBNInsn memoizes its disassembly at a PC. The
+    # operand values can be shared: nothing modifies them.
+    cls, enc_vals, op_vals = decoded
+    if op_vals is None:
+        op_vals = cls.insn.enc_vals_to_op_vals(pc, enc_vals)
 
     return cls(word, op_vals)
 
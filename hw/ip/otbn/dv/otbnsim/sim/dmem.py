@@ -25,10 +25,10 @@ class TraceDmemStore(Trace):
 class Dmem:
     '''An object representing OTBN's DMEM.
 
-    Memory is stored as an array of 32-byte words (the native width for the
-    OTBN wide side). These words are stored as 256-bit unsigned integers. This
-    is the same width as the wide-side registers (to avoid unnecessary
-    packing/unpacking work), but the unsigned values simplify tracing.
+    Memory is stored as a flat little-endian bytearray, with a parallel
+    bytearray holding a validity flag (0 or 1) for each 32-bit word. This
+    layout matches the dump/load formats, so whole-memory transfers and wide
+    accesses turn into slice operations rather than per-word loops.
 
     '''
 
@@ -47,14 +47,13 @@ class Dmem:
             raise RuntimeError('DMEM size ({}) is not divisible by 32.'
                                .format(dmem_size))
 
-        # We represent the contents of DMEM as a list of 32-bit words (unlike
-        # the RTL, which uses an array of 256-bit words). An entry in self.data
-        # is a tuple of (value, validity). The value is an integer representing
-        # the 32-bit word, and validity is a boolean indicating whether the
-        # word has valid integrity bits. If validity is False, we'll get
-        # an error if we try to read it.
-        num_words = dmem_size // 4
-        self.data: List[Tuple[int, bool]] = [(0, False)] * num_words
+        # We represent the contents of DMEM as a bytearray (self.mem) of
+        # dmem_size bytes and a validity map (self.valid) with one byte per
+        # 32-bit word. A validity byte is 1 if the word has valid integrity
+        # bits. If it is 0, we'll get an error if we try to read the word.
+        self.num_words = dmem_size // 4
+        self.mem = bytearray(dmem_size)
+        self.valid = bytearray(self.num_words)
 
         # Because it's an actual memory, stores to DMEM take two cycles in the
         # RTL. We wouldn't need to model this except that a DMEM invalidation
@@ -63,11 +62,18 @@ class Dmem:
         # trace/commit dance that all the other blocks do. A memory write will
         # generate a trace entry which will appear in changes() at the end of
         # this cycle. However, the first commit() will then move it to the
-        # self.pending list. Entries here will only make it to self.data on the
-        # next commit().
+        # self.pending dictionary (keyed by word index). Entries there will
+        # only make it to self.mem on the next commit().
         self.trace: List[TraceDmemStore] = []
         self.pending: Dict[int, int] = {}
 
+    def _check_load_size(self, num_bytes: int, word_offset: int) -> None:
+        '''Raise a ValueError if a load of num_bytes wouldn't fit'''
+        if 4 * word_offset + num_bytes > len(self.mem):
+            raise ValueError('Trying to load {} bytes of data at word offset '
+                             '{}, but DMEM is only {} bytes long.'
+                             .format(num_bytes, word_offset, len(self.mem)))
+
     def _load_5byte_le_words(self, data: bytes, word_offset: int) -> None:
         '''Replace the memory start at word_offset with data
 
@@ -81,25 +87,25 @@ class Dmem:
                              'which is not a multiple of 5.'
                              .format(len(data)))
 
-        len_data_32 = len(data) // 5
-        len_mem_32 = (256 // 32) * len(self.data)
-
-        if len_data_32 > len_mem_32:
-            raise ValueError('Trying to load {} bytes of data, but DMEM '
-                             'is only {} bytes long.'
-                             .format(4 * len_data_32, 32 * len(self.data)))
-
-        # Zero-pad up to the next 32-bit word, represented by 5 bytes. Because
-        # things are little-endian, this is like zero-extending the last word.
-        if len(data) % 5:
-            data = data + b'0' * (5 - (len(data) % 5))
-
-        for idx32, (vld, u32) in enumerate(struct.iter_unpack('<BI', data)):
-            if vld not in [0, 1]:
-                raise ValueError('The validity byte for 32-bit word {} '
-                                 'in the input data is {}, not 0 or 1.'
-                                 .format(idx32, vld))
-            self.data[idx32 + word_offset] = (u32, vld)
+        num_words = len(data) // 5
+        self._check_load_size(4 * num_words, word_offset)
+        if not num_words:
+            return
+
+        # De-interleave the input with extended slices: every 5th byte is a
+        # validity byte and the other four lanes are the bytes of each word.
+        vlds = data[0::5]
+        if max(vlds) > 1:
+            idx32 = next(i for i, vld in enumerate(vlds) if vld > 1)
+            raise ValueError('The validity byte for 32-bit word {} '
+                             'in the input data is {}, not 0 or 1.'
+                             .format(idx32, vlds[idx32]))
+
+        lo = 4 * word_offset
+        hi = lo + 4 * num_words
+        for i in range(4):
+            self.mem[lo + i:hi:4] = data[1 + i::5]
+        self.valid[word_offset:word_offset + num_words] = vlds
 
     def _load_4byte_le_words(self, data: bytes, word_offset: int) -> None:
         '''Replace the memory start at word_offset with data
@@ -108,17 +114,17 @@ class Dmem:
         little-endian format.
 
         '''
-        if len(data) > 32 * len(self.data):
-            raise ValueError('Trying to load {} bytes of data, but DMEM '
-                             'is only {} bytes long.'
-                             .format(len(data), 32 * len(self.data)))
         # Zero-pad bytes up to the next multiple of 32 bits (because things
         # are little-endian, is like zero-extending the last word).
         if len(data) % 4:
-            data = data + b'0' * (32 - (len(data) % 32))
+            data = bytes(data) + bytes(4 - (len(data) % 4))
+
+        self._check_load_size(len(data), word_offset)
 
-        for idx32, u32 in enumerate(struct.iter_unpack('<I', data)):
-            self.data[idx32 + word_offset] = (u32[0], True)
+        num_words = len(data) // 4
+        lo = 4 * word_offset
+        self.mem[lo:lo + len(data)] = data
+        self.valid[word_offset:word_offset + num_words] = b'\x01' * num_words
 
     def load_le_words(self, data: bytes, has_validity: bool, word_offset: int) -> None:
         '''Replace the memory start at word_offset with data
@@ -135,24 +141,42 @@ class Dmem:
     def dump_le_words(self) -> bytes:
         '''Return the contents of memory as bytes.
 
-        The bytes are formatted as little-endian 32-bit words. These
-        words are themselves packed little-endian into 256-bit words.
+        Each 32-bit word is represented by 5 bytes: a validity byte (0 or 1)
+        followed by the word itself in little-endian format. Invalid words
+        are dumped as zero.
 
         '''
-        ret = b''
-        for idx, (u32, valid) in enumerate(self.data):
-            # If there's a pending store, apply it. This matches the RTL, where
-            # we only observe the memory after that store has landed.
-            # A pending store is assumed to have always valid data.
-            has_pending_store = self.pending.get(idx) is not None
-            u32 = self.pending.get(idx, u32)
-
-            if valid or has_pending_store:
-                ret += struct.pack('<BI', 1, u32)
-            else:
-                ret += struct.pack('<BI', 0, 0)
-
-        return ret
+        mem = self.mem
+        valid = self.valid
+
+        # If there are pending stores, apply them to a copy. This matches the
+        # RTL, where we only observe the memory after that store has landed.
+        # A pending store is assumed to have always valid data.
+        if self.pending:
+            mem = bytearray(mem)
+            valid = bytearray(valid)
+            for idx, u32 in self.pending.items():
+                struct.pack_into('<I', mem, 4 * idx, u32)
+                valid[idx] = 1
+
+        # Zero out the contents of invalid words by expanding the validity
+        # map to a byte mask and ANDing it with the memory as a big integer.
+        num_bytes = len(mem)
+        byte_mask = bytearray(num_bytes)
+        lane_mask = valid.translate(_VALID_TO_MASK)
+        for i in range(4):
+            byte_mask[i::4] = lane_mask
+        masked = ((int.from_bytes(mem, 'little') &
+                   int.from_bytes(byte_mask, 'little'))
+                  .to_bytes(num_bytes, 'little'))
+
+        # Interleave the validity bytes with the four bytes of each word.
+        ret = bytearray(5 * self.num_words)
+        ret[0::5] = valid
+        for i in range(4):
+            ret[1 + i::5] = masked[i::4]
+
+        return bytes(ret)
 
     def is_valid_256b_addr(self, addr: int) -> bool:
         '''Return true if this is a valid address for a BN.LID/BN.SID'''
@@ -161,7 +185,7 @@ class Dmem:
             return False
 
         word_addr = addr // 4
-        if word_addr >= len(self.data):
+        if word_addr >= self.num_words:
             return False
 
         return True
@@ -170,13 +194,23 @@ class Dmem:
         '''Read a u256 little-endian value from an aligned address'''
         assert addr >= 0
         assert self.is_valid_256b_addr(addr)
-        ret_data = 0
-        valid = True
-        for i in range(256 // 32):
-            data_32, valid_32 = self.load_u32(addr + 4 * i)
-            ret_data = ret_data | (data_32 << (i * 32))
-            valid = valid and valid_32
 
+        idx = addr // 4
+        if self.pending:
+            # Handle "read under write" hazards properly by falling back to
+            # word-sized reads if any of the words have a pending store.
+            if any(idx + i in self.pending for i in range(8)):
+                ret_data = 0
+                valid = True
+                for i in range(256 // 32):
+                    data_32, valid_32 = self.load_u32(addr + 4 * i)
+                    ret_data = ret_data | (data_32 << (i * 32))
+                    valid = valid and valid_32
+
+                return (ret_data, valid)
+
+        ret_data = int.from_bytes(self.mem[addr:addr + 32], 'little')
+        valid = self.valid.find(0, idx, idx + 8) < 0
         return (ret_data, valid)
 
     def store_u256(self, addr: int, value: int) -> None:
@@ -193,7 +227,7 @@ class Dmem:
         if addr & 3:
             return False
 
-        if (addr + 3) // 4 >= len(self.data):
+        if (addr + 3) // 4 >= self.num_words:
             return False
 
         return True
@@ -215,7 +249,8 @@ class Dmem:
         if pending_val is not None:
             return (pending_val, True)
 
-        return self.data[addr // 4]
+        return (int.from_bytes(self.mem[addr:addr + 4], 'little'),
+                self.valid[idx] != 0)
 
     def store_u32(self, addr: int, value: int) -> None:
         '''Store a 32-bit unsigned value to memory.
@@ -234,21 +269,21 @@ class Dmem:
 
     def _commit_trace_entry(self, item: TraceDmemStore) -> None:
         '''Apply a trace entry to self.pending'''
+        idx = item.addr // 4
         if item.is_wide:
             assert 0 <= item.value < (1 << 256)
-            mask = (1 << 32) - 1
-            for i in range(256 // 32):
-                wr_data = (item.value >> (i * 32)) & mask
-                self.pending[(item.addr // 4) + i] = wr_data
+            words = struct.unpack('<8I', item.value.to_bytes(32, 'little'))
+            self.pending.update(zip(range(idx, idx + 8), words))
 
         else:
             assert 0 <= item.value <= (1 << 32) - 1
-            self.pending[item.addr // 4] = item.value
+            self.pending[idx] = item.value
 
     def commit(self) -> None:
-        # Move items from self.pending to self.data
+        # Move items from self.pending to self.mem
         for idx, value in self.pending.items():
-            self.data[idx] = (value, True)
+            struct.pack_into('<I', self.mem, 4 * idx, value)
+            self.valid[idx] = 1
         self.pending = {}
 
         # Apply trace entries to self.pending
@@ -260,6 +295,9 @@ class Dmem:
         self.trace = []
 
     def invalidate_dmem(self) -> None:
-        for idx in range(len(self.data)):
-            u32, _ = self.data[idx]
-            self.data[idx] = (u32, False)
+        self.valid[:] = bytes(self.num_words)
+
+
+# A translation table that maps a validity byte of 1 to an all-ones byte mask
+# (and 0 to zero), used by Dmem.dump_le_words.
+_VALID_TO_MASK = bytes([0, 0xff] + [0] * 254)
@@ -5,7 +5,7 @@
 from typing import List
 
 from .constants import ErrBits
-from .reg import Reg, RegFile
+from .reg import FlatRegFile, Reg
 
 
 class CallStackReg(Reg):
@@ -66,7 +66,7 @@ class CallStackReg(Reg):
         self.saw_read = False
 
 
-class GPRs(RegFile):
+class GPRs(FlatRegFile):
     '''The narrow OTBN register file'''
 
     def __init__(self) -> None:
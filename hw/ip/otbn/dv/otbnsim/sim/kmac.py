@@ -2,8 +2,9 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
+import copy
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 from enum import Enum, auto, unique
 from Crypto.Hash import SHAKE128, SHAKE256, SHA3_224, SHA3_256, SHA3_384, SHA3_512
 import secrets
@@ -175,6 +176,21 @@ class Kmac():
         self._csrs = csrs
         self._wsrs = wsrs
 
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'Kmac':
+        """Copy the model, including any in-progress Keccak state.
+
+        The Crypto.Hash objects can't be deep-copied, but they have a copy()
+        method that clones their internal state.
+        """
+        ret = self.__class__.__new__(self.__class__)
+        memo[id(self)] = ret
+        for name, value in self.__dict__.items():
+            if name == '_keccak_state' and value is not None:
+                ret.__dict__[name] = value.copy()
+            else:
+                ret.__dict__[name] = copy.deepcopy(value, memo)
+        return ret
+
     def step(self) -> None:
         """Advance the KMAC state by one cycle."""
 
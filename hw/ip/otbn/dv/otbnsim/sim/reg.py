@@ -2,7 +2,7 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import List, Optional, Set
+from typing import List, Optional, Sequence, Set, Tuple, Union
 
 from .trace import Trace
 
@@ -27,7 +27,7 @@ class TraceRegister(Trace):
 
 class Reg:
     def __init__(self,
-                 parent: Optional['RegFile'],
+                 parent: Optional[Union['RegFile', 'FlatRegFile']],
                  idx: int,
                  width: int,
                  uval: int):
@@ -132,6 +132,10 @@ class RegFile:
             self._registers[idx].abort()
         self._pending_writes.clear()
 
+    def pending_writes(self) -> List[int]:
+        '''Get the indices of registers with a pending write, in order'''
+        return sorted(self._pending_writes)
+
     def peek_unsigned_values(self) -> List[int]:
         '''Get a list of the (unsigned) values of the registers'''
         return [reg.read_unsigned(backdoor=True) for reg in self._registers]
@@ -139,3 +143,156 @@ class RegFile:
     def wipe(self) -> None:
         for r in self._registers:
             r.write_invalid()
+
+
+class FlatReg(Reg):
+    '''A register whose value is stored in a FlatRegFile'''
+    def __init__(self, parent: 'FlatRegFile', idx: int, width: int):
+        super().__init__(None, idx, width, 0)
+        self._file = parent
+
+    def read_unsigned(self, backdoor: bool = False) -> int:
+        return self._file._uvals[self._idx]
+
+    def write_unsigned(self, uval: int) -> None:
+        assert 0 <= uval < (1 << self._width)
+        self._file.write_unsigned(self._idx, uval)
+
+    def read_next(self) -> Optional[int]:
+        return self._file.read_next(self._idx)
+
+    def write_invalid(self) -> None:
+        self._file.write_invalid(self._idx)
+
+    def commit(self) -> None:
+        # Pending values are committed for the whole register file at once by
+        # FlatRegFile.commit()
+        return
+
+    def abort(self) -> None:
+        # Pending values are discarded for the whole register file at once by
+        # FlatRegFile.abort()
+        return
+
+
+class FlatRegFile:
+    '''An alternative to RegFile that stores values in flat arrays.
+
+    This has the same interface as RegFile and produces the same trace, but
+    holds the current and next values of the registers in two flat sequences,
+    together with a bitmask of the registers that have a pending write. This
+    means that commit() and abort() are single bulk copies and
+    peek_unsigned_values() doesn't need to build a new list.
+
+    A register can be written with an "invalid" value (see wipe()). This
+    appears as such in the trace, but leaves the register's value unchanged
+    when committed, matching Reg.commit().
+
+    Subclasses may use registers of their own (like GPRs does for x1). These
+    should call mark_written() when written and will appear in changes(), but
+    their values aren't stored here.
+
+    '''
+    def __init__(self,
+                 name_pfx: str,
+                 width: int,
+                 depth: int):
+        assert 0 <= width
+        assert 0 <= depth
+
+        self._name_pfx = name_pfx
+        self._width = width
+
+        # The committed values of the registers. This is a tuple that is
+        # replaced (rather than updated) on commit, which means that
+        # peek_unsigned_values() can return it directly.
+        self._uvals: Tuple[int, ...] = (0,) * depth
+
+        # The committed values of the registers, updated with any pending
+        # writes.
+        self._next_uvals = [0] * depth
+
+        # Bitmasks of registers with a pending write and of registers whose
+        # pending write is of an invalid value.
+        self._dirty = 0
+        self._invalid = 0
+
+        self._registers = [FlatReg(self, i, width) for i in range(depth)]
+
+    def mark_written(self, idx: int) -> None:
+        '''Mark a register as having been written'''
+        assert 0 <= idx < len(self._registers)
+        self._dirty |= 1 << idx
+
+    def write_unsigned(self, idx: int, uval: int) -> None:
+        '''Stage a write of uval to the register with index idx'''
+        bit = 1 << idx
+        self._next_uvals[idx] = uval
+        self._dirty |= bit
+        self._invalid &= ~bit
+
+    def write_invalid(self, idx: int) -> None:
+        '''Stage an invalid write to the register with index idx'''
+        bit = 1 << idx
+        self._next_uvals[idx] = self._uvals[idx]
+        self._dirty |= bit
+        self._invalid |= bit
+
+    def read_next(self, idx: int) -> Optional[int]:
+        '''Get the pending value for the register with index idx
+
+        This is None if there is no pending write or if the pending write is
+        invalid.
+
+        '''
+        bit = 1 << idx
+        if (self._dirty & ~self._invalid) & bit:
+            return self._next_uvals[idx]
+        return None
+
+    def get_reg(self, idx: int) -> Reg:
+        assert 0 <= idx < len(self._registers)
+        return self._registers[idx]
+
+    def pending_writes(self) -> List[int]:
+        '''Get the indices of registers with a pending write, in order'''
+        ret = []
+        dirty = self._dirty
+        idx = 0
+        while dirty:
+            if dirty & 1:
+                ret.append(idx)
+            dirty >>= 1
+            idx += 1
+        return ret
+
+    def changes(self) -> List[TraceRegister]:
+        return [TraceRegister('{}{:02}'.format(self._name_pfx, idx),
+                              self._width,
+                              self.get_reg(idx).read_next())
+                for idx in self.pending_writes()]
+
+    def commit(self) -> None:
+        if self._dirty:
+            self._uvals = tuple(self._next_uvals)
+            self._dirty = 0
+            self._invalid = 0
+
+    def abort(self) -> None:
+        if self._dirty:
+            self._next_uvals[:] = self._uvals
+            self._dirty = 0
+            self._invalid = 0
+
+    def peek_unsigned_values(self) -> Sequence[int]:
+        '''Get the (unsigned) values of the registers
+
+        This doesn't make a copy: the returned tuple is replaced, rather than
+        modified, by the next commit that changes anything.
+
+        '''
+        return self._uvals
+
+    def wipe(self) -> None:
+        for idx in range(len(self._registers)):
+            self.write_invalid(idx)
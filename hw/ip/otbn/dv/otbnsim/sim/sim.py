@@ -2,8 +2,11 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import Dict, Iterator, List, Optional, Tuple
+import copy
+import inspect
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
+from .bintrace import BinTraceWriter
 from .constants import ErrBits, LcTx, Status, read_lc_tx_t
 from .decode import EmptyInsn
 from .isa import OTBNInsn
@@ -22,6 +25,20 @@ LoopWarps = Dict[int, Dict[int, int]]
 StepRes = Tuple[Optional[OTBNInsn], List[Trace]]
 
 
+class SimSnapshot:
+    '''A saved copy of the mutable state of an OTBNSim.
+
+    This is returned by OTBNSim.snapshot() and can be passed to
+    OTBNSim.restore() any number of times. It holds its own copy of the
+    architectural and FSM state (registers, DMEM, loop and call stacks, WSRs,
+    KMAC, URND, external registers and so on), together with any execution
+    statistics. The loaded program is shared, not copied.
+
+    '''
+    def __init__(self, attrs: Dict[str, Any]) -> None:
+        self.attrs = attrs
+
+
 class OTBNSim:
     def __init__(self) -> None:
         self.state = OTBNState()
@@ -32,9 +49,56 @@ class OTBNSim:
         self._execute_generator: Optional[Iterator[None]] = None
         self._next_insn: Optional[OTBNInsn] = None
 
+        # If this is set, step() records each cycle in a binary trace
+        self.bin_trace: Optional[BinTraceWriter] = None
+
+        # For each instruction index in the program, the number of
+        # instructions in the straight-line run that starts there and can be
+        # executed by run_block(). This is zero for an instruction that must go
+        # through step().
+        self._block_lens: List[int] = []
+
+        # Pairs: (stepper, handles_injected_err). If handles_injected_err is
+        # False then the generic code in step() will deal with any pending
+        # errors in self.state.injected_err_bits. If True, then we expect the
+        # stepper function to handle them.
+        self._steppers: Dict[FsmState,
+                             Tuple[Callable[[bool], StepRes], bool]] = {
+            FsmState.MEM_SEC_WIPE: (self._step_ext_wipe, False),
+            FsmState.IDLE: (self._step_idle, False),
+            FsmState.PRE_EXEC: (self._step_pre_exec, False),
+            FsmState.EXEC: (self._step_exec, True),
+            FsmState.PRE_WIPE: (self._step_pre_wipe, False),
+            FsmState.WIPING: (self._step_wiping, False),
+            FsmState.LOCKED: (self._step_idle, False)
+        }
+
     def load_program(self, program: List[OTBNInsn]) -> None:
         self.program = program.copy()
         self.state.clear_imem_invalidation()
+        self._find_blocks()
+
+    @staticmethod
+    def _is_straight_line(insn: OTBNInsn) -> bool:
+        '''Return true if run_block() can execute insn.
+
+        These are the instructions that always complete in a single cycle
+        without redirecting control flow or causing a fetch stall. Anything
+        that might yield (loads and stores, reads from RND and so on) must be
+        run by step().
+
+        '''
+        return (insn.has_bits and
+                not insn.affects_control and
+                not insn.has_fetch_stall and
+                not inspect.isgeneratorfunction(insn.execute))
+
+    def _find_blocks(self) -> None:
+        '''Split the program into basic blocks for run_block()'''
+        self._block_lens = [0] * (len(self.program) + 1)
+        for idx in range(len(self.program) - 1, -1, -1):
+            if self._is_straight_line(self.program[idx]):
+                self._block_lens[idx] = self._block_lens[idx + 1] + 1
 
     def add_loop_warp(self, addr: int, from_cnt: int, to_cnt: int) -> None:
         '''Add a new loop warp to the simulation'''
@@ -77,6 +141,58 @@ class OTBNSim:
         self.state.set_fsm_state(FsmState.MEM_SEC_WIPE)
         self.state.ext_regs.write('STATUS', new_status, True)
 
+    def _program_memo(self) -> Dict[int, Any]:
+        '''A deepcopy memo that maps the loaded program to itself.
+
+        The decoded instructions are never modified by execution, so a copy of
+        the simulator can share them.
+
+        '''
+        memo: Dict[int, Any] = {id(self.program): self.program,
+                                id(self._block_lens): self._block_lens}
+        for insn in self.program:
+            memo[id(insn)] = insn
+        return memo
+
+    def _check_can_copy(self) -> None:
+        if self._execute_generator is not None:
+            raise RuntimeError('Cannot copy the simulator state in the middle '
+                               'of a multi-cycle instruction.')
+
+    def snapshot(self) -> SimSnapshot:
+        '''Save the current state of the simulation.
+
+        This can be taken at any point except in the middle of a multi-cycle
+        instruction (when it raises a RuntimeError).
+
+        '''
+        self._check_can_copy()
+        attrs = {'state': self.state,
+                 'stats': self.stats,
+                 '_next_insn': self._next_insn}
+        return SimSnapshot(copy.deepcopy(attrs, self._program_memo()))
+
+    def restore(self, snapshot: SimSnapshot) -> None:
+        '''Restore state saved with snapshot()'''
+        attrs = copy.deepcopy(snapshot.attrs, self._program_memo())
+        for name, value in attrs.items():
+            setattr(self, name, value)
+        self._execute_generator = None
+
+    def fork(self) -> 'OTBNSim':
+        '''Return an independent copy of this simulation.
+
+        The copy has the same type as self and can be run (or forked again)
+        without affecting the original. As with snapshot(), this isn't
+        possible in the middle of a multi-cycle instruction.
+
+        '''
+        self._check_can_copy()
+        memo = self._program_memo()
+        # The copy doesn't write to our binary trace (if we have one)
+        memo[id(self.bin_trace)] = None
+        return copy.deepcopy(self, memo)
+
     def _fetch(self, pc: int) -> OTBNInsn:
         word_pc = pc >> 2
         if word_pc >= len(self.program):
@@ -132,8 +248,8 @@ class OTBNSim:
         no_fetch = halting or insn.has_fetch_stall
         self._next_insn = None if no_fetch else self._fetch(self.state.pc)
 
-        disasm = insn.disassemble(pc_before)
         if verbose:
+            disasm = insn.disassemble(pc_before)
             self._print_trace(pc_before, disasm, changes)
 
         return changes
@@ -184,25 +300,108 @@ class OTBNSim:
 
         '''
         fsm_state = self.state.get_fsm_state()
-        # Pairs: (stepper, handles_injected_err). If handles_injected_err is
-        # False then the generic code here will deal with any pending errors in
-        # self.state.injected_err_bits. If True, then we expect the stepper
-        # function to handle them.
-        steppers = {
-            FsmState.MEM_SEC_WIPE: (self._step_ext_wipe, False),
-            FsmState.IDLE: (self._step_idle, False),
-            FsmState.PRE_EXEC: (self._step_pre_exec, False),
-            FsmState.EXEC: (self._step_exec, True),
-            FsmState.PRE_WIPE: (self._step_pre_wipe, False),
-            FsmState.WIPING: (self._step_wiping, False),
-            FsmState.LOCKED: (self._step_idle, False)
-        }
-
-        stepper, handles_injected_err = steppers[fsm_state]
+        stepper, handles_injected_err = self._steppers[fsm_state]
         self.state.take_pending_err_bits()
         self.state.step(not handles_injected_err)
 
-        return stepper(verbose)
+        if self.bin_trace is None:
+            return stepper(verbose)
+
+        pc = self.state.pc
+        insn, changes = stepper(verbose)
+        self.bin_trace.record(pc, insn is None, changes)
+        return (insn, changes)
+
+    def _can_run_block(self) -> bool:
+        '''Return true if run_block() can start at the current cycle'''
+        state = self.state
+        if state.get_fsm_state() != FsmState.EXEC:
+            return False
+
+        # Binary tracing records each cycle in step()
+        if self.bin_trace is not None:
+            return False
+
+        # We must be between instructions, with the next one already fetched
+        # from IMEM that hasn't been (and isn't about to be) invalidated.
+        if self._execute_generator is not None or self._next_insn is None:
+            return False
+        if state.invalidated_imem or state.imem_invalidation_pending():
+            return False
+
+        # Anything coming from outside (errors, escalations, stall or RMA
+        # requests) is handled cycle-by-cycle by step().
+        return not (state.pending_halt or
+                    state.injected_err_bits or
+                    state.rma_req == LcTx.ON or
+                    state.stall_request_pending() or
+                    state.wsrs.RND.rep_err_escalate or
+                    state.wsrs.RND.fips_err_escalate)
+
+    def run_block(self) -> int:
+        '''Run straight-line code with no tracing.
+
+        This is a fast path for callers that don't need the list of changes
+        returned by step(). Starting at the instruction that has just been
+        fetched, it runs the rest of the basic block in a tight loop, doing the
+        same work for each cycle as step() but without collecting trace entries
+        or disassembling instructions.
+
+        It stops before any instruction that might stall or affect control
+        flow, when we reach the end of a loop body and jump back, when the
+        processor halts and when an RND or URND request appears (so that the
+        caller can respond to it before the next cycle).
+
+        Returns the number of cycles that were run. This is zero if the
+        simulation isn't in a state where the fast path applies, in which case
+        the caller should use step().
+
+        '''
+        if not self._can_run_block():
+            return 0
+
+        state = self.state
+        cycles = 0
+        block_left = self._block_lens[state.pc >> 2]
+        while block_left:
+            insn = self._next_insn
+            assert insn is not None
+
+            # This matches what happens in step() and then _step_exec() for a
+            # single-cycle instruction.
+            state.take_pending_err_bits()
+            state.step(False)
+            state.wsrs.URND.step()
+            state.pre_insn(False)
+            insn.execute(state)
+
+            # This matches _on_retire()
+            pc = state.pc
+            state.post_insn(self.loop_warps.get(pc, {}))
+            if self.stats is not None:
+                self.stats.record_insn(insn, state)
+            halting = state.stop_if_pending_halt()
+            state.commit(sim_stalled=False)
+            cycles += 1
+
+            if halting:
+                self._next_insn = None
+                break
+
+            self._next_insn = self._fetch(state.pc)
+
+            if (state.ext_regs.read('RND_REQ', True) or
+                    state.wsrs.URND.requesting):
+                break
+
+            # If we just jumped back to the start of a loop body, we have left
+            # the basic block.
+            if state.pc != pc + 4:
+                break
+
+            block_left -= 1
+
+        return cycles
 
     def _step_idle(self, verbose: bool) -> StepRes:
         '''Step the simulation when OTBN is IDLE or LOCKED'''
@@ -3,7 +3,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from itertools import cycle
-from typing import Dict, Optional, TextIO
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Union
+
+from shared.testcase import OtbnTestCase
+
 from .sim import OTBNSim
 from .state import FsmState
 
@@ -21,13 +24,48 @@ _TEST_URND_SEED = [
 ]
 
 
+# An input set for StandaloneSim.run_inputs(): either a testcase or a
+# dictionary of DMEM variables (keyed by symbol, with little-endian values).
+BatchInput = Union[OtbnTestCase, Dict[str, bytes]]
+
+
+class BatchResult:
+    '''The outputs of a single run of StandaloneSim.run_inputs()
+
+    regs is keyed in the same way as the output of dump_regs() (ERR_BITS,
+    INSN_CNT, STOP_PC, x0..x31 and w0..w31). dmem holds the contents of DMEM,
+    without the validity bytes that dump_data() includes (invalid words read
+    as zero).
+
+    '''
+    def __init__(self, index: int, cycles: int, stop_addr: int,
+                 regs: Dict[str, int], dmem: bytes) -> None:
+        self.index = index
+        self.cycles = cycles
+        self.stop_addr = stop_addr
+        self.regs = regs
+        self.dmem = dmem
+
+    def read_dmem(self, addr: int, num_bytes: int) -> bytes:
+        '''Return num_bytes of DMEM, starting at addr'''
+        return self.dmem[addr:addr + num_bytes]
+
+
 class StandaloneSim(OTBNSim):
-    def run(self, verbose: bool, dump_file: Optional[TextIO]) -> int:
+    def run(self,
+            verbose: bool,
+            dump_file: Optional[TextIO],
+            fast: bool = False) -> int:
         '''Run until ECALL.
 
+        If fast is true and verbose is false, straight-line code is run
+        through run_block(), which skips the work needed for tracing. This
+        doesn't change the behaviour of the simulation.
+
         Return the number of cycles taken.
 
         '''
+        use_blocks = fast and not verbose
         insn_count = 0
         urnd_seed_count = 0
 
@@ -47,8 +85,11 @@ class StandaloneSim(OTBNSim):
                 if urnd_seed_count == 0:
                     self.state.wsrs.URND.reseed_done = True
 
-            self.step(verbose)
-            insn_count += 1
+            cycles = self.run_block() if use_blocks else 0
+            if cycles == 0:
+                self.step(verbose)
+                cycles = 1
+            insn_count += cycles
 
             # Dump registers on the first wipe cycle. This makes sure that we
             # dump them before zeroing.
@@ -59,6 +100,61 @@ class StandaloneSim(OTBNSim):
 
         return insn_count
 
+    def _batch_result(self, index: int, cycles: int) -> BatchResult:
+        regs = {reg: self.state.ext_regs.read(reg, False)
+                for reg in ['ERR_BITS', 'INSN_CNT', 'STOP_PC']}
+        for idx, value in enumerate(self.state.gprs.peek_unsigned_values()):
+            regs[f'x{idx}'] = value
+        for idx, value in enumerate(self.state.wdrs.peek_unsigned_values()):
+            regs[f'w{idx}'] = value
+
+        # Drop the validity byte from each 5-byte word of the dump
+        dump = self.dump_data()
+        dmem = bytearray(4 * (len(dump) // 5))
+        for i in range(4):
+            dmem[i::4] = dump[1 + i::5]
+
+        return BatchResult(index, cycles, self.state.pc, regs, bytes(dmem))
+
+    def run_inputs(self,
+                   inputs: Iterable[BatchInput],
+                   fast: bool = True) -> Iterator[BatchResult]:
+        '''Run the loaded program once for each input set.
+
+        The simulation should have been set up as for run(), except that the
+        external registers haven't been committed and start() hasn't been
+        called (so, typically, just after load_elf and setting any sideload
+        keys). Its state is saved before the first run and restored before
+        each run, so the decoded program is reused and runs don't affect
+        each other. Inputs are consumed lazily and the results are yielded
+        as each run finishes, so inputs can be a generator.
+
+        A testcase input loads its DMEM and register inputs and sets the
+        entrypoint. A dictionary input just loads DMEM variables. After the
+        last run, the simulation is left as it was after that run.
+
+        '''
+        initial = self.snapshot()
+        for index, inp in enumerate(inputs):
+            if index:
+                self.restore(initial)
+
+            entrypoint = None
+            if isinstance(inp, OtbnTestCase):
+                self.load_dmem_vars(inp.input.dmem)
+                self.load_regs_vars(inp.input.regs)
+                entrypoint = inp.entrypoint
+            else:
+                self.load_dmem_vars(inp)
+
+            self.state.ext_regs.commit()
+            self.start(collect_stats=False)
+            if entrypoint:
+                self.state.pc = entrypoint
+
+            cycles = self.run(verbose=False, dump_file=None, fast=fast)
+            yield self._batch_result(index, cycles)
+
     def load_dmem_vars(self, dmem_vars: Dict[str, bytes]) -> None:
         for label, value in dmem_vars.items():
             offset = self.symbols.get(label)
@@ -16,7 +16,7 @@ from .gpr import GPRs
 from .kmac import Kmac
 from .loop import LoopStack
 from .mai import MaskingAcceleratorInterface
-from .reg import RegFile
+from .reg import FlatRegFile
 from .trace import Trace, TracePC
 from .wsr import WSRFile
 
@@ -80,7 +80,7 @@ class InitSecWipeState(IntEnum):
 class OTBNState:
     def __init__(self) -> None:
         self.gprs = GPRs()
-        self.wdrs = RegFile('w', 256, 32)
+        self.wdrs = FlatRegFile('w', 256, 32)
 
         self.ext_regs = OTBNExtRegs()
         self.wsrs = WSRFile(self.ext_regs)
@@ -594,6 +594,10 @@ class OTBNState:
     def invalidate_imem(self) -> None:
         self._time_to_imem_invalidation = 2
 
+    def imem_invalidation_pending(self) -> bool:
+        '''Return true if IMEM is about to be invalidated'''
+        return self._time_to_imem_invalidation is not None
+
     def clear_imem_invalidation(self) -> None:
         '''Clear any effective or pending IMEM invalidation'''
         self._time_to_imem_invalidation = None
@@ -620,6 +624,10 @@ class OTBNState:
         self._stall_requested = True
         self._enforce_stall_request = enforce
 
+    def stall_request_pending(self) -> bool:
+        '''Returns whether there is a stall request, without consuming it.'''
+        return self._stall_requested
+
     def stall_requested(self) -> bool:
         '''Returns whether a stall should happen. Any call resets a pending
         stall request.
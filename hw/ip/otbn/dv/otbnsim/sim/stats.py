@@ -3,7 +3,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from collections import Counter, defaultdict, namedtuple
-from typing import Dict, Iterator, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from elftools.dwarf.dwarfinfo import DWARFInfo  # type: ignore
 from elftools.elf.elffile import ELFFile  # type: ignore
@@ -15,41 +15,117 @@ from .isa import OTBNInsn
 from .state import OTBNState
 
 
+# Flags describing how an instruction affects the statistics. These are
+# computed once for each instruction in the program, so that record_insn()
+# doesn't need to look at instruction classes.
+_JUMP = 1 << 0
+_BRANCH = 1 << 1
+_ECALL = 1 << 2
+_CALL = 1 << 3  # A jump that writes x1 (a function call)
+_LOOP = 1 << 4  # A LOOP instruction (not LOOPI)
+_LOOPI = 1 << 5
+
+# An instruction with one of these flags ends a basic block (as does the last
+# instruction of a loop body).
+_BB_END = _JUMP | _BRANCH | _ECALL
+
+# An instruction with one of these flags ends an extended basic block (as does
+# the last instruction of a LOOP body).
+_EXT_BB_END = _BRANCH | _ECALL
+
+
+def _insn_flags(insn: OTBNInsn) -> int:
+    flags = 0
+    if isinstance(insn, (JAL, JALR)):
+        flags |= _JUMP
+        if insn.grd == 1:
+            flags |= _CALL
+    if isinstance(insn, (BEQ, BNE)):
+        flags |= _BRANCH
+    if isinstance(insn, ECALL):
+        flags |= _ECALL
+    if isinstance(insn, LOOP):
+        flags |= _LOOP
+    if isinstance(insn, LOOPI):
+        flags |= _LOOPI
+    return flags
+
+
 class ExecutionStats:
+    '''Statistics collected while running a program.
+
+    This is designed to make record_insn() (which runs for every instruction)
+    cheap. Instruction counts are kept in a list indexed by instruction
+    address and function calls and loops are recorded as tuples. The
+    histogram, coverage map and lists of dictionaries that
+    ExecutionStatAnalyzer uses are derived from these when they are needed.
+
+    '''
     def __init__(self, program: List[OTBNInsn]) -> None:
         # Executed program (the contents of the instruction memory).
         self.program = program
 
         self.stall_count = 0
-        self.insn_histo: Counter[str] = Counter()
-        self.func_calls: List[Dict[str, int]] = []
-        self.loops: List[Dict[str, int]] = []
+
+        # For each instruction in the program, its flags and the number of
+        # times it has been executed.
+        self._flags = bytes(_insn_flags(insn) for insn in program)
+        self._exec_counts = [0] * len(program)
+
+        # Mnemonics of executed instructions that don't come from the program
+        # (which happens if IMEM has been invalidated).
+        self._other_insns: Counter[str] = Counter()
+
+        # Function calls, as tuples (call_site, caller_func, callee_func), and
+        # loops, as tuples (loop_addr, loop_len, iterations).
+        self._func_calls: List[Tuple[int, int, int]] = []
+        self._loops: List[Tuple[int, int, int]] = []
 
         # Histogram indexed by the length of the (extended) basic block.
         self.basic_block_histo: Counter[int] = Counter()
         self.ext_basic_block_histo: Counter[int] = Counter()
 
-        # Coverage map indexed by pc.
-        self.coverage: Counter[int] = Counter()
-
         self._current_basic_block_len = 0
         self._current_ext_basic_block_len = 0
 
+    @property
+    def insn_histo(self) -> Counter[str]:
+        '''A histogram of executed instructions, keyed by mnemonic'''
+        histo = self._other_insns.copy()
+        for insn, count in zip(self.program, self._exec_counts):
+            if count:
+                histo[insn.insn.mnemonic] += count
+        return histo
+
+    @property
+    def coverage(self) -> Counter[int]:
+        '''A coverage map: the number of times each address was executed'''
+        return Counter({4 * idx: count
+                        for idx, count in enumerate(self._exec_counts)
+                        if count})
+
+    @property
+    def func_calls(self) -> List[Dict[str, int]]:
+        return [{'call_site': call_site,
+                 'caller_func': caller_func,
+                 'callee_func': callee_func}
+                for call_site, caller_func, callee_func in self._func_calls]
+
+    @property
+    def loops(self) -> List[Dict[str, int]]:
+        return [{'loop_addr': loop_addr,
+                 'loop_len': loop_len,
+                 'iterations': iterations}
+                for loop_addr, loop_len, iterations in self._loops]
+
     def get_insn_count(self) -> int:
         '''Get the number of executed instructions.'''
-        return sum(self.insn_histo.values())
+        return sum(self._exec_counts) + sum(self._other_insns.values())
 
     def record_stall(self) -> None:
         '''Record a single stall cycle.'''
         self.stall_count += 1
 
-    def _insn_at_addr(self, addr: int) -> Optional[OTBNInsn]:
-        '''Get the instruction at a given address.'''
-        assert addr % 4 == 0
-        assert addr >= 0
-        word_addr = addr >> 2
-        return self.program[word_addr]
-
     def record_insn(self,
                     insn: OTBNInsn,
                     state_bc: OTBNState) -> None:
@@ -60,41 +136,36 @@ class ExecutionStats:
 
         '''
         pc = state_bc.pc
-        self.coverage[pc] += 1
-
-        is_jump = isinstance(insn, JAL) or isinstance(insn, JALR)
-        is_branch = isinstance(insn, BEQ) or isinstance(insn, BNE)
-
-        # Instruction histogram
-        self.insn_histo[insn.insn.mnemonic] += 1
+        idx = pc >> 2
+        if idx < len(self.program) and insn is self.program[idx]:
+            self._exec_counts[idx] += 1
+            flags = self._flags[idx]
+        else:
+            self._other_insns[insn.insn.mnemonic] += 1
+            flags = _insn_flags(insn)
 
         # Function calls
         # - Direct function calls: jal x1, <offset>
         # - Indirect function calls: jalr x1, <grs1>, 0
-        if is_jump and insn.grd == 1:  # type: ignore
+        if flags & _CALL:
             call_stack = state_bc.peek_call_stack()
             if call_stack:
                 caller_func = call_stack[0]
             else:
                 caller_func = 0  # (start address)
 
-            self.func_calls.append({
-                'call_site': pc,
-                'caller_func': caller_func,
-                'callee_func': state_bc.get_next_pc(),
-            })
+            self._func_calls.append((pc, caller_func,
+                                     state_bc.get_next_pc()))
+
+        loop_stack = state_bc.loop_stack.stack
 
         # Loops
-        if isinstance(insn, LOOP) or isinstance(insn, LOOPI):
-            assert state_bc.in_loop()
-            iterations = state_bc.loop_stack.stack[-1].loop_count
-            self.loops.append({
-                'loop_addr': pc,
-                'loop_len': insn.bodysize,
-                'iterations': iterations,
-            })
+        if flags & (_LOOP | _LOOPI):
+            assert loop_stack
+            self._loops.append((pc, insn.bodysize,  # type: ignore
+                                loop_stack[-1].loop_count))
 
-        last_in_loop_body = state_bc.loop_stack.is_last_insn_in_loop_body(pc)
+        last_in_loop_body = bool(loop_stack) and loop_stack[-1].last_addr == pc
 
         # Basic blocks
         #
@@ -104,9 +175,7 @@ class ExecutionStats:
         # length of the basic block equals the number of instructions within
         # the basic block.
         self._current_basic_block_len += 1
-        if (is_jump or is_branch or last_in_loop_body or
-                isinstance(insn, ECALL)):
-
+        if flags & _BB_END or last_in_loop_body:
             self.basic_block_histo[self._current_basic_block_len] += 1
             self._current_basic_block_len = 0
 
@@ -121,12 +190,11 @@ class ExecutionStats:
         # LOOP body (only LOOP, not LOOPI!).
         finishing_loop = False
         if last_in_loop_body:
-            loop_insn_addr = state_bc.loop_stack.stack[-1].get_loop_insn_addr()
-            last_insn = self._insn_at_addr(loop_insn_addr)
-            finishing_loop = isinstance(last_insn, LOOP)
+            loop_insn_addr = loop_stack[-1].get_loop_insn_addr()
+            finishing_loop = bool(self._flags[loop_insn_addr >> 2] & _LOOP)
 
         self._current_ext_basic_block_len += 1
-        if is_branch or finishing_loop or isinstance(insn, ECALL):
+        if flags & _EXT_BB_END or finishing_loop:
             self.ext_basic_block_histo[self._current_ext_basic_block_len] += 1
             self._current_ext_basic_block_len = 0
 
@@ -160,10 +228,10 @@ def _dwarf_iter_file_line(dwarf_info: DWARFInfo,
             yield SourceLine(state.address, path, state.line)
 
 
-def _dwarf_decode_file_line(dwarf_info: DWARFInfo, address: int) -> Optional[SourceLine]:
-    # Go over all the line programs in the DWARF information, looking for
-    # one that describes the given address.
-    lines = list(_dwarf_iter_file_line(dwarf_info, full_path=False))
+def _dwarf_decode_file_line(lines: List[Optional[SourceLine]],
+                            address: int) -> Optional[SourceLine]:
+    # Go over the lines from _dwarf_iter_file_line, looking for one that
+    # describes the given address.
     for before, after in zip(lines, lines[1:]):
         if before is None or after is None:
             continue
@@ -189,6 +257,8 @@ class ExecutionStatAnalyzer:
         self._elf_file = ELFFile(open(elf_file_path, 'rb'))
         self._stats = stats
         self._addr_symbol_map = _get_addr_symbol_map(self._elf_file)
+        # The DWARF line table, read on first use by _describe_imem_addr
+        self._source_lines: Optional[List[Optional[SourceLine]]] = None
 
     def _describe_imem_addr(self, address: int) -> str:
         symbol_name = None
@@ -206,8 +276,11 @@ class ExecutionStatAnalyzer:
 
         file_line = None
         if self._elf_file.has_dwarf_info():
-            dwarf_info = self._elf_file.get_dwarf_info()
-            file_line = _dwarf_decode_file_line(dwarf_info, address)
+            if self._source_lines is None:
+                dwarf_info = self._elf_file.get_dwarf_info()
+                self._source_lines = list(
+                    _dwarf_iter_file_line(dwarf_info, full_path=False))
+            file_line = _dwarf_decode_file_line(self._source_lines, address)
 
         add_info = []
         if symbol_name:
@@ -395,11 +468,12 @@ class ExecutionStatAnalyzer:
             return ''
         dwarf_info = self._elf_file.get_dwarf_info()
 
+        coverage = self._stats.coverage
         hits_by_path: defaultdict[str, Dict[int, int]] = defaultdict(dict)
         for info in _dwarf_iter_file_line(dwarf_info, full_path=True):
             if info is None:
                 continue
-            hit = self._stats.coverage.get(info.addr, 0)
+            hit = coverage.get(info.addr, 0)
             hits_by_path[info.path][info.lineno] = hit
 
         out = []
@@ -7,6 +7,7 @@ import argparse
 import os
 import sys
 
+from sim.bintrace import BinTraceWriter
 from sim.load_elf import load_elf
 from sim.standalonesim import StandaloneSim
 from sim.stats import ExecutionStatAnalyzer
@@ -17,6 +18,13 @@ def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument('elf')
     parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument(
+        '--cycle-accurate',
+        action='store_true',
+        help=("step every cycle through the full simulation loop, rather "
+              "than running straight-line code in basic blocks. The results "
+              "are the same, but this is slower.")
+    )
     parser.add_argument(
         '--testcase',
         type=argparse.FileType('r'),
@@ -37,6 +45,14 @@ def main() -> int:
         help=("after execution, write the GPR and WDR contents to this file. "
               "Use '-' to write to STDOUT.")
     )
+    parser.add_argument(
+        '--bin-trace',
+        metavar="FILE",
+        type=argparse.FileType('wb'),
+        help=("write a binary trace of each cycle to this file. This is much "
+              "smaller and faster to parse than the text trace from -v (see "
+              "sim/bintrace.py for a reader).")
+    )
     parser.add_argument(
         '--dump-stats',
         metavar="FILE",
@@ -76,7 +92,14 @@ def main() -> int:
     if testcase and testcase.entrypoint:
         sim.state.pc = testcase.entrypoint
 
-    sim.run(verbose=args.verbose, dump_file=args.dump_regs)
+    if args.bin_trace is not None:
+        sim.bin_trace = BinTraceWriter(args.bin_trace)
+
+    sim.run(verbose=args.verbose, dump_file=args.dump_regs,
+            fast=not args.cycle_accurate)
+
+    if sim.bin_trace is not None:
+        sim.bin_trace.close()
 
     if exp_end_addr is not None:
         if sim.state.pc != exp_end_addr:
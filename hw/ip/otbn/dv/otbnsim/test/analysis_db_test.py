@@ -0,0 +1,93 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the persistent analysis database for OTBN programs.'''
+
+import os
+from typing import List
+
+import py
+import pytest
+
+from testutil import asm_and_link_one_file
+from shared import information_flow_analysis
+from shared.analysis_db import AnalysisDB
+
+_PROGRAM = '''
+main:
+  jal     x1, callee_a
+  jal     x1, callee_b
+  ecall
+
+callee_a:
+  add     x2, x3, x4
+  jalr    x0, x1, 0
+
+callee_b:
+  add     x5, x6, x7
+{}
+  jalr    x0, x1, 0
+'''
+
+
+def _build(tmpdir: py.path.local, extra: str) -> str:
+    asm_path = str(tmpdir.join('prog.s'))
+    with open(asm_path, 'w') as f:
+        f.write(_PROGRAM.format(extra))
+    return asm_and_link_one_file(asm_path, tmpdir)
+
+
+def _entries(cache_dir: str, kind: str) -> List[str]:
+    return [name for name in os.listdir(cache_dir)
+            if name.startswith(kind + '-')]
+
+
+def test_analysis_db(tmpdir: py.path.local) -> None:
+    '''Results from the database match fresh ones and are shared'''
+    cache_dir = str(tmpdir.mkdir('db'))
+    elf = _build(tmpdir, '')
+
+    for db in [AnalysisDB(None), AnalysisDB(cache_dir), AnalysisDB(cache_dir)]:
+        analysis = db.open(elf)
+        assert analysis.insn_count_range('callee_a') == (2, 2)
+        assert analysis.insn_count_range(None) == (7, 7)
+        ret_iflow, _, deps = analysis.subroutine_iflow('callee_b', {})
+        assert ret_iflow.sources('x5') == {'x6', 'x7'}
+        assert deps == {}
+
+    assert len(_entries(cache_dir, 'program')) == 1
+    assert len(_entries(cache_dir, 'iflow')) == 1
+
+
+def test_changed_function(tmpdir: py.path.local) -> None:
+    '''Only the functions that reach changed code are analysed again'''
+    cache_dir = str(tmpdir.mkdir('db'))
+
+    for extra in ['', '  add     x5, x5, x5']:
+        analysis = AnalysisDB(cache_dir).open(_build(tmpdir, extra))
+        for name in ['callee_a', 'callee_b']:
+            analysis.insn_count_range(name)
+            analysis.subroutine_iflow(name, {})
+
+    # The new version of callee_b needs new entries, but callee_a doesn't.
+    assert len(_entries(cache_dir, 'program')) == 2
+    assert len(_entries(cache_dir, 'count')) == 3
+    assert len(_entries(cache_dir, 'iflow')) == 3
+
+
+def test_changed_insns(tmpdir: py.path.local,
+                       monkeypatch: pytest.MonkeyPatch) -> None:
+    '''Information flow is analysed again if the instructions change'''
+    cache_dir = str(tmpdir.mkdir('db'))
+    elf = _build(tmpdir, '')
+
+    AnalysisDB(cache_dir).open(elf).subroutine_iflow('callee_b', {})
+    assert len(_entries(cache_dir, 'iflow')) == 1
+
+    # Pretend that the instruction database (and so the information flow of
+    # some instruction) has changed.
+    monkeypatch.setattr(information_flow_analysis, 'insns_fingerprint',
+                        lambda: 'changed')
+    AnalysisDB(cache_dir).open(elf).subroutine_iflow('callee_b', {})
+    assert len(_entries(cache_dir, 'iflow')) == 2
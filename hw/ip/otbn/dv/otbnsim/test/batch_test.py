@@ -0,0 +1,115 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that StandaloneSim.run_inputs matches separate simulations.'''
+
+import os
+from typing import Dict, Iterator, Tuple
+
+import py
+
+from sim.load_elf import load_elf
+from sim.standalonesim import StandaloneSim
+from testutil import asm_and_link_one_file
+
+# Importing sim puts the OTBN util directory (with shared) on the path
+from shared.testcase import OtbnTestCase, StateExpectations
+
+# Sum the words at inp (stopping at a zero word) and store the result at out.
+# The program also leaves state behind (x5 and scratch) that the next run
+# mustn't see.
+_ASM = """
+    la x2, inp
+    la x3, out
+    la x4, scratch
+    lw x6, 0(x4)
+    add x5, x5, x6
+  loop:
+    lw x7, 0(x2)
+    beq x7, x0, done
+    add x5, x5, x7
+    addi x2, x2, 4
+    jal x0, loop
+  done:
+    sw x5, 0(x3)
+    sw x5, 0(x4)
+    ecall
+
+    .data
+    inp:
+    .zero 16
+    out:
+    .word 0
+    scratch:
+    .word 0
+"""
+
+
+def _elf(tmpdir: py.path.local) -> str:
+    asm_path = os.path.join(str(tmpdir), 'batch.s')
+    with open(asm_path, 'w') as f:
+        f.write(_ASM)
+    return asm_and_link_one_file(asm_path, tmpdir)
+
+
+def _new_sim(elf: str) -> StandaloneSim:
+    sim = StandaloneSim()
+    load_elf(sim, elf)
+    return sim
+
+
+def _words(*vals: int) -> bytes:
+    return b''.join(v.to_bytes(4, 'little') for v in vals)
+
+
+def _separate_run(elf: str, dmem_vars: Dict[str, bytes]) -> Tuple[int, int]:
+    sim = _new_sim(elf)
+    sim.load_dmem_vars(dmem_vars)
+    sim.state.ext_regs.commit()
+    sim.start(False)
+    cycles = sim.run(verbose=False, dump_file=None)
+    out_addr = sim.symbols['out']
+    return (cycles, int.from_bytes(sim.dump_data()[5 * out_addr // 4 + 1:
+                                                   5 * out_addr // 4 + 5],
+                                   'little'))
+
+
+def test_dmem_inputs(tmpdir: py.path.local) -> None:
+    '''A generator of DMEM inputs gives the same results as separate runs'''
+    elf = _elf(tmpdir)
+    inputs = [{'inp': _words(1, 2, 3)},
+              {'inp': _words(10)},
+              {'inp': _words(7, 8, 9, 10)},
+              {}]
+
+    def gen() -> Iterator[Dict[str, bytes]]:
+        yield from inputs
+
+    sim = _new_sim(elf)
+    out_addr = sim.symbols['out']
+    results = list(sim.run_inputs(gen()))
+
+    assert [res.index for res in results] == list(range(len(inputs)))
+    for res, dmem_vars in zip(results, inputs):
+        cycles, out = _separate_run(elf, dmem_vars)
+        assert res.cycles == cycles
+        assert res.regs['ERR_BITS'] == 0
+        assert res.regs['x5'] == out
+        assert int.from_bytes(res.read_dmem(out_addr, 4), 'little') == out
+
+
+def test_testcase_inputs(tmpdir: py.path.local) -> None:
+    '''Testcase inputs can set registers as well as DMEM'''
+    elf = _elf(tmpdir)
+    sim = _new_sim(elf)
+    testcases = [
+        OtbnTestCase(entrypoint=0,
+                     input=StateExpectations(dmem={'inp': _words(5)},
+                                             regs={'x5': n}),
+                     output=StateExpectations(dmem={}, regs={}))
+        for n in range(3)
+    ]
+
+    results = list(sim.run_inputs(testcases, fast=False))
+    assert [res.regs['x5'] for res in results] == [5, 6, 7]
@@ -0,0 +1,98 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that binary traces read back as the changes that step() returned.'''
+
+import io
+from typing import Any, List, Optional, Tuple
+
+import py
+import pytest
+
+from sim.bintrace import (BinTraceWriter, is_bin_trace, read_chunks,
+                          read_pcs, read_records)
+from sim.dmem import TraceDmemStore
+from sim.reg import TraceRegister
+from testutil import prepare_sim_for_asm_str
+
+_ASM = """
+    li x2, 5
+    la x3, buf
+    bn.addi w1, w1, 1
+    loopi 3, 4
+      addi x2, x2, -1
+      sw x2, 0(x3)
+      bn.add w1, w1, w1
+      bn.sid x0, 0(x3)
+    ecall
+
+    .data
+    .balign 32
+    buf:
+    .zero 32
+"""
+
+_Row = Tuple[int, bool,
+             List[Tuple[str, Optional[int]]],
+             List[Tuple[int, int, bool]]]
+
+
+def test_round_trip(tmpdir: py.path.local) -> None:
+    '''Trace a program over several chunks and read it back'''
+    sim = prepare_sim_for_asm_str(_ASM, tmpdir, False)
+    out = io.BytesIO()
+    writer = BinTraceWriter(out, chunk_rows=4)
+    sim.bin_trace = writer
+
+    expected: List[_Row] = []
+    step = sim.step
+
+    def recording_step(verbose: bool) -> Any:
+        pc = sim.state.pc
+        insn, changes = step(verbose)
+        regs = [(c.name, c.new_value) for c in changes
+                if isinstance(c, TraceRegister) and c.name[0] in 'xw']
+        stores = [(c.addr, c.value, c.is_wide) for c in changes
+                  if isinstance(c, TraceDmemStore)]
+        expected.append((pc, insn is None, regs, stores))
+        return (insn, changes)
+
+    setattr(sim, 'step', recording_step)
+    sim.run(verbose=False, dump_file=None)
+    writer.close()
+
+    # Make sure the program did what we expect to trace
+    assert any(stores and stores[0][2] for _, _, _, stores in expected)
+    assert any(name == 'w01' for _, _, regs, _ in expected
+               for name, _ in regs)
+    assert len(expected) > 8
+
+    path = str(tmpdir.join('trace.bin'))
+    with open(path, 'wb') as f:
+        f.write(out.getvalue())
+
+    assert is_bin_trace(path)
+    assert list(read_pcs(path)) == [row[0] for row in expected]
+
+    records = list(read_records(path))
+    assert [rec.index for rec in records] == list(range(len(expected)))
+    assert [(rec.pc, rec.stall, rec.regs, rec.stores)
+            for rec in records] == expected
+
+    with open(path, 'rb') as inp:
+        assert all(chunk.num_rows <= 4 for chunk in read_chunks(inp))
+
+
+def test_truncated() -> None:
+    '''A trace that was cut short is an error, not a shorter trace'''
+    out = io.BytesIO()
+    writer = BinTraceWriter(out)
+    writer.record(0x10, False, [TraceRegister('x01', 32, 1234)])
+    writer.close()
+
+    data = out.getvalue()
+    with pytest.raises(ValueError, match='truncated chunk'):
+        list(read_chunks(io.BytesIO(data[:-1])))
+    with pytest.raises(ValueError, match='not a binary'):
+        list(read_chunks(io.BytesIO(b'0x00000010\n')))
@@ -0,0 +1,68 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the decode cache and the opcode decision tree.'''
+
+import random
+from typing import List, Optional
+
+from sim.decode import IllegalInsn, decode_words
+from sim.isa import INSNS_FILE
+
+
+def _linear_mnem_for_word(word: int) -> Optional[str]:
+    ret = None
+    for mnem, (m0, m1) in INSNS_FILE._masks.items():
+        if not (word & m0 or (~ word) & m1):
+            ret = mnem
+    return ret
+
+
+def _test_words() -> List[int]:
+    rng = random.Random(1)
+    # Random words are mostly illegal, so also generate a word that matches
+    # each instruction's fixed bits.
+    words = [rng.getrandbits(32) for _ in range(5000)]
+    for m0, m1 in INSNS_FILE._masks.values():
+        for _ in range(10):
+            words.append((rng.getrandbits(32) & ~m0) | m1)
+    return words
+
+
+def test_dispatch_matches_scan() -> None:
+    '''The decision tree finds the same mnemonics as a linear scan'''
+    for word in _test_words():
+        assert INSNS_FILE.mnem_for_word(word) == _linear_mnem_for_word(word)
+
+
+def test_decode_many() -> None:
+    '''decode_many matches mnem_for_word, including for repeated words'''
+    words = _test_words()
+    words += words[:100]
+    assert (INSNS_FILE.decode_many(words) ==
+            [INSNS_FILE.mnem_for_word(word) for word in words])
+
+
+def test_no_ambiguities() -> None:
+    '''No two instructions in insns.yml have overlapping encodings'''
+    assert INSNS_FILE.find_ambiguities() == []
+
+
+def test_cached_decode() -> None:
+    '''Repeated words decode to separate objects, with PC-relative operands
+    computed at each PC'''
+    beq = 0x00000863  # beq x0, x0, .+16
+    addi = 0x00108093  # addi x1, x1, 1
+    data = [(True, beq), (True, addi), (True, beq), (True, addi),
+            (True, 0), (False, 0)]
+
+    for _ in range(2):
+        insns = decode_words(0, data)
+        assert insns[0] is not insns[2]
+        assert insns[0].op_vals['offset'] == 16
+        assert insns[2].op_vals['offset'] == 24
+        assert insns[1].op_vals == insns[3].op_vals
+        assert insns[1].disassemble(4) == insns[3].disassemble(12)
+        assert isinstance(insns[4], IllegalInsn)
+        assert not insns[5].has_bits
@@ -0,0 +1,90 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that forked fault runs match separate runs for each fault.'''
+
+import traceback
+from typing import Any, List, Optional, TextIO
+
+import py
+import pytest
+
+# Importing sim puts the OTBN util directory (with otbn_fi_campaign) on the
+# path
+import sim  # noqa: F401
+from otbn_fi_campaign import (FaultPoint, FISim, get_symbol_offsets,
+                              run_faults_and_get_dmem, run_test_and_get_dmem)
+from testutil import asm_and_link_one_file
+
+# The load takes more than one cycle, so some fault points are in the middle
+# of an instruction.
+_PROGRAM = '''
+  la    x3, value
+  lw    x4, 0(x3)
+  addi  x5, x0, 3
+loop:
+  add   x4, x4, x5
+  addi  x5, x5, -1
+  bne   x5, x0, loop
+  sw    x4, 0(x3)
+  ecall
+
+.data
+value:
+  .word 0x10
+'''
+
+_MAX_INSNS = 1000
+
+
+def _check_faults(elf: str) -> None:
+    offsets = get_symbol_offsets(elf, ['value'])
+    sizes = {'value': 4}
+
+    # Try each occurrence of each instruction up to a limit. Some of these
+    # are never reached.
+    faults: List[FaultPoint] = [(pc, occ)
+                                for pc in range(0, 4 * 12, 4)
+                                for occ in range(5)]
+    forked = run_faults_and_get_dmem(elf, offsets, sizes, faults,
+                                     max_insns=_MAX_INSNS)
+    assert set(forked) == set(faults)
+
+    for pc, occ in faults:
+        expected = run_test_and_get_dmem(elf, offsets, sizes,
+                                         skip_pc=pc, skip_occurrence=occ,
+                                         max_insns=_MAX_INSNS)
+        assert forked[(pc, occ)] == expected, (pc, occ)
+
+
+def test_forked_faults(tmpdir: py.path.local) -> None:
+    '''Forked runs match separate ones for every fault point'''
+    asm_path = str(tmpdir.join('prog.s'))
+    with open(asm_path, 'w') as f:
+        f.write(_PROGRAM)
+    _check_faults(asm_and_link_one_file(asm_path, tmpdir))
+
+
+def test_forked_faults_error(tmpdir: py.path.local,
+                             monkeypatch: pytest.MonkeyPatch) -> None:
+    '''Fault points after the simulation fails still get results'''
+    asm_path = str(tmpdir.join('prog.s'))
+    with open(asm_path, 'w') as f:
+        f.write(_PROGRAM)
+    elf = asm_and_link_one_file(asm_path, tmpdir)
+
+    # Make every run fail with an exception part way through.
+    fi_step = FISim._fi_step
+
+    def failing_step(self: FISim, verbose: bool,
+                     trace_file: Optional[TextIO],
+                     max_insns: Optional[int]) -> Any:
+        if self.insn_count >= 8:
+            raise RuntimeError('Simulated failure')
+        return fi_step(self, verbose, trace_file, max_insns)
+
+    monkeypatch.setattr(FISim, '_fi_step', failing_step)
+    # Don't print a traceback for each failed run
+    monkeypatch.setattr(traceback, 'print_exc', lambda: None)
+    _check_faults(elf)
@@ -0,0 +1,56 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the information-flow graphs and the cache used to compute them.'''
+
+# Importing sim puts the OTBN util directory (with shared) on the path
+import sim  # noqa: F401
+from shared.constants import ConstantContext
+from shared.information_flow import InformationFlowGraph
+from shared.information_flow_analysis import IFlowCache, IFlowResult
+
+
+def test_graph_copies() -> None:
+    '''Updating a graph doesn't change copies of it (or graphs it came from)'''
+    first = InformationFlowGraph({'x1': {'x2'}, 'x3': {'x3', 'x4'}})
+    second = InformationFlowGraph({'x5': {'x1'}, 'x6': {'x6'}})
+
+    both = first.seq(second)
+    assert both.flow == {'x5': {'x2'}, 'x6': {'x6'},
+                         'x1': {'x2'}, 'x3': {'x3', 'x4'}}
+
+    copied = both.copy()
+    both.update(InformationFlowGraph({'x5': {'x7'}}))
+    both.remove_source('x2')
+    assert both.sources('x5') == {'x7'}
+    assert copied.sources('x5') == {'x2'}
+    assert first.flow == {'x1': {'x2'}, 'x3': {'x3', 'x4'}}
+    assert second.flow == {'x5': {'x1'}, 'x6': {'x6'}}
+
+
+def _result(tag: str) -> IFlowResult:
+    return ({tag}, InformationFlowGraph.empty(),
+            InformationFlowGraph.empty(), None, {}, {})
+
+
+def test_cache_lookup() -> None:
+    '''A lookup matches the oldest entry whose constants agree'''
+    cache = IFlowCache()
+    cache.add(4, ConstantContext({'x0': 0, 'x1': 1}), _result('a'))
+    cache.add(4, ConstantContext({'x0': 0, 'x2': 2}), _result('b'))
+    cache.add(8, ConstantContext({'x0': 0}), _result('c'))
+
+    def lookup(pc: int, **values: int) -> object:
+        res = cache.lookup(pc, ConstantContext({'x0': 0, **values}))
+        return None if res is None else res[0]
+
+    assert lookup(4, x1=1, x2=2) == {'a'}
+    assert lookup(4, x1=3, x2=2) == {'b'}
+    assert lookup(4, x1=3) is None
+    assert lookup(8, x5=5) == {'c'}
+    assert lookup(12) is None
+
+    # Adding an entry that matches an existing one doesn't replace it
+    cache.add(4, ConstantContext({'x0': 0, 'x2': 2}), _result('d'))
+    assert lookup(4, x2=2) == {'b'}
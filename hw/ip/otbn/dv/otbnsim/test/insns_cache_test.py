@@ -0,0 +1,54 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the on-disk cache of the instruction database.'''
+
+import os
+
+import py
+
+# Importing sim puts the OTBN util directory (with shared) on the path
+import sim  # noqa: F401
+from shared import insn_yaml, insns_cache
+
+
+def _load(cache_dir: str) -> insn_yaml.InsnsFile:
+    # load_insns_yaml keeps the first file that it loads, so clear that to
+    # force it to look at the cache directory.
+    insn_yaml._DEFAULT_INSNS_FILE = None
+    try:
+        return insn_yaml.load_insns_yaml(cache_dir)
+    finally:
+        insn_yaml._DEFAULT_INSNS_FILE = None
+
+
+def test_cache_matches_yaml(tmpdir: py.path.local) -> None:
+    '''A database loaded from the cache matches one parsed from YAML'''
+    cache_dir = str(tmpdir)
+    fresh = _load(cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert insn_yaml.check_insns_cache(cache_dir) == []
+
+    cached = _load(cache_dir)
+    assert cached is not fresh
+    assert insns_cache.describe(cached) == insns_cache.describe(fresh)
+
+    # The assembler regexes are compiled on demand after loading
+    for insn in cached.insns:
+        assert insn.asm_pattern.pattern == insn.asm_pattern_str
+
+
+def test_bad_cache(tmpdir: py.path.local) -> None:
+    '''A corrupt cache file is spotted by the check and then replaced'''
+    cache_dir = str(tmpdir)
+    assert insn_yaml.check_insns_cache(cache_dir) != []
+
+    _load(cache_dir)
+    (name,) = os.listdir(cache_dir)
+    with open(os.path.join(cache_dir, name), 'wb') as f:
+        f.write(b'not a pickle')
+    assert insn_yaml.check_insns_cache(cache_dir) != []
+
+    _load(cache_dir)
+    assert insn_yaml.check_insns_cache(cache_dir) == []
@@ -0,0 +1,51 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the parallel and cached input transformation in otbn_as.py.'''
+
+import os
+from typing import List, Optional
+
+import py
+
+# Importing sim puts the OTBN util directory (with otbn_as) on the path
+import sim  # noqa: F401
+import otbn_as
+from shared.insn_yaml import load_insns_yaml
+
+_SIMPLE_DIR = os.path.join(os.path.dirname(__file__), 'simple')
+
+
+def _transform(out_dir: str, inputs: List[str], jobs: int,
+               cache_dir: Optional[str]) -> List[str]:
+    insns_file = load_insns_yaml()
+    glued = sorted((insn for insn in insns_file.insns if insn.glued_ops),
+                   key=lambda insn: len(insn.mnemonic), reverse=True)
+    mnem_to_rve = otbn_as.find_insn_schemes(insns_file.mnemonic_to_insn)
+    os.makedirs(out_dir)
+    paths = otbn_as.transform_inputs(out_dir, inputs, insns_file,
+                                     mnem_to_rve, glued, False, jobs,
+                                     cache_dir)
+    ret = []
+    for path in paths:
+        with open(path) as f:
+            ret.append(f.read())
+    return ret
+
+
+def test_transform_cache(tmpdir: py.path.local) -> None:
+    '''Parallel and cached transformations match a serial one'''
+    inputs = [os.path.join(_SIMPLE_DIR, 'subroutines', name)
+              for name in ['direct-call.s', 'indirect-call.s']]
+    inputs.append(os.path.join(_SIMPLE_DIR, 'loops', 'loops.s'))
+    cache_dir = str(tmpdir.join('cache'))
+
+    expected = _transform(str(tmpdir.join('serial')), inputs, 1, None)
+    assert len(set(expected)) == len(inputs)
+
+    # The first parallel run fills the cache and the second uses it.
+    for idx in range(2):
+        out_dir = str(tmpdir.join('parallel{}'.format(idx)))
+        assert _transform(out_dir, inputs, 2, cache_dir) == expected
+        assert len(os.listdir(cache_dir)) == len(inputs)
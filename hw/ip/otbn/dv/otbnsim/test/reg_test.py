@@ -0,0 +1,62 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that FlatRegFile behaves like RegFile.'''
+
+import random
+from typing import List, Union
+
+from sim.reg import FlatRegFile, RegFile
+
+
+def _trace(regfile: Union[RegFile, FlatRegFile]) -> List[str]:
+    return [t.trace() for t in regfile.changes()]
+
+
+def test_flat_regfile_matches() -> None:
+    '''Apply the same random operations to both register files'''
+    rng = random.Random(1234)
+    ref = RegFile('w', 256, 32)
+    flat = FlatRegFile('w', 256, 32)
+
+    for _ in range(2000):
+        op = rng.randrange(6)
+        idx = rng.randrange(32)
+        if op == 0:
+            val = rng.getrandbits(256)
+            ref.get_reg(idx).write_unsigned(val)
+            flat.get_reg(idx).write_unsigned(val)
+        elif op == 1:
+            ref.get_reg(idx).write_invalid()
+            flat.get_reg(idx).write_invalid()
+        elif op == 2:
+            assert _trace(ref) == _trace(flat)
+            assert ref.pending_writes() == flat.pending_writes()
+            ref.commit()
+            flat.commit()
+        elif op == 3:
+            ref.abort()
+            flat.abort()
+        elif op == 4:
+            ref.wipe()
+            flat.wipe()
+        else:
+            assert (ref.get_reg(idx).read_next() ==
+                    flat.get_reg(idx).read_next())
+
+        assert (ref.get_reg(idx).read_signed() ==
+                flat.get_reg(idx).read_signed())
+        assert list(ref.peek_unsigned_values()) == \
+            list(flat.peek_unsigned_values())
+
+
+def test_flat_regfile_peek_snapshot() -> None:
+    '''A value returned by peek_unsigned_values() isn't changed by commit()'''
+    flat = FlatRegFile('x', 32, 32)
+    before = flat.peek_unsigned_values()
+    flat.get_reg(3).write_unsigned(0x1234)
+    flat.commit()
+    after = flat.peek_unsigned_values()
+    assert before[3] == 0
+    assert after[3] == 0x1234
@@ -0,0 +1,70 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that the basic block fast path matches cycle-by-cycle stepping.'''
+
+import io
+import os
+from typing import Any, List, Tuple
+
+import py
+
+from simple_test import BN_SIMD_DIR_NAME, find_simple_tests
+from testutil import prepare_sim_for_asm_file, prepare_sim_for_asm_str
+
+
+def _run(asm_file: str, tmpdir: py.path.local,
+         fast: bool) -> Tuple[int, str, bytes, int]:
+    sim = prepare_sim_for_asm_file(asm_file, tmpdir, False)
+    regs = io.StringIO()
+    cycles = sim.run(verbose=False, dump_file=regs, fast=fast)
+    return (cycles, regs.getvalue(), sim.dump_data(),
+            sim.state.ext_regs.read('INSN_CNT', False))
+
+
+def test_fast_matches_stepped(tmpdir: py.path.local, asm_file: str) -> None:
+    '''Run a program with and without the fast path and compare results'''
+    assert _run(asm_file, tmpdir, True) == _run(asm_file, tmpdir, False)
+
+
+def test_fast_path_used(tmpdir: py.path.local) -> None:
+    '''Check that straight-line code and loop bodies use run_block()'''
+    asm = """
+    loopi 10, 3
+      addi x2, x2, 1
+      addi x3, x3, 2
+      bn.add w1, w1, w2
+    ecall
+    """
+    sim = prepare_sim_for_asm_str(asm, tmpdir, False)
+
+    block_runs: List[Tuple[int, int]] = []
+    run_block = sim.run_block
+
+    def recording_run_block() -> int:
+        pc = sim.state.pc
+        cycles = run_block()
+        if cycles:
+            block_runs.append((pc, cycles))
+        return cycles
+
+    setattr(sim, 'run_block', recording_run_block)
+
+    regs = io.StringIO()
+    sim.run(verbose=False, dump_file=regs, fast=True)
+    assert ' x2  = 0x0000000a\n' in regs.getvalue()
+    assert ' x3  = 0x00000014\n' in regs.getvalue()
+
+    # Each iteration of the loop body should run as a single block, jumping
+    # back to the start of the body at the end. On the last iteration, we fall
+    # through to the ECALL, which is part of the same block.
+    assert block_runs == [(4, 3)] * 9 + [(4, 4)]
+
+
+def pytest_generate_tests(metafunc: Any) -> None:
+    if metafunc.function is test_fast_matches_stepped:
+        tests = [asm for asm, _ in find_simple_tests()
+                 if BN_SIMD_DIR_NAME not in asm.split(os.sep)]
+        test_ids = [os.path.basename(asm) for asm in tests]
+        metafunc.parametrize("asm_file", tests, ids=test_ids)
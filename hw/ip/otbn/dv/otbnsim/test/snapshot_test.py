@@ -0,0 +1,111 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check that snapshot/restore and fork reproduce an uninterrupted run.'''
+
+import io
+import os
+from typing import Any, List, Tuple
+
+import py
+
+from sim.standalonesim import StandaloneSim
+from simple_test import BN_SIMD_DIR_NAME, find_simple_tests
+from testutil import prepare_sim_for_asm_file, prepare_sim_for_asm_str
+
+
+def _finish(sim: StandaloneSim) -> Tuple[str, bytes, int]:
+    regs = io.StringIO()
+    sim.run(verbose=False, dump_file=regs)
+    return (regs.getvalue(), sim.dump_data(),
+            sim.state.ext_regs.read('INSN_CNT', False))
+
+
+def _fork_after(sim: StandaloneSim, cycles: int) -> List[StandaloneSim]:
+    '''Arrange for sim to fork itself once it has stepped cycles times.
+
+    The fork happens on the first instruction boundary after that point and
+    is returned as the single element of the list.
+
+    '''
+    forks: List[StandaloneSim] = []
+    step = sim.step
+    count = [0]
+
+    def forking_step(verbose: bool) -> Any:
+        count[0] += 1
+        if (not forks and count[0] > cycles and
+                sim._execute_generator is None):
+            # Drop this wrapper before forking so that the copy doesn't
+            # inherit it.
+            delattr(sim, 'step')
+            forked = sim.fork()
+            assert isinstance(forked, StandaloneSim)
+            forks.append(forked)
+        return step(verbose)
+
+    setattr(sim, 'step', forking_step)
+    return forks
+
+
+def test_fork_matches(tmpdir: py.path.local, asm_file: str) -> None:
+    '''Fork a simulation half way through and run both copies to the end'''
+    sim = prepare_sim_for_asm_file(asm_file, tmpdir, False)
+    total_cycles = sim.run(verbose=False, dump_file=None)
+
+    sim = prepare_sim_for_asm_file(asm_file, tmpdir, False)
+    forks = _fork_after(sim, total_cycles // 2)
+    expected = _finish(sim)
+
+    assert len(forks) == 1
+    assert _finish(forks[0]) == expected
+
+
+def test_snapshot_restore(tmpdir: py.path.local) -> None:
+    '''Restore a snapshot taken in a loop, with state in DMEM and stacks'''
+    asm = """
+    li x2, 0
+    la x3, buf
+    loopi 4, 3
+      jal x1, inc
+      sw x2, 0(x3)
+      bn.addi w1, w1, 3
+    ecall
+
+    inc:
+      addi x2, x2, 1
+      ret
+
+    .data
+    buf:
+    .word 0
+    """
+    sim = prepare_sim_for_asm_str(asm, tmpdir, False)
+
+    snapshots = []
+    step = sim.step
+
+    def snapshotting_step(verbose: bool) -> Any:
+        if (not snapshots and sim.state.pc == 0x18 and
+                sim.state.loop_stack.stack):
+            snapshots.append(sim.snapshot())
+        return step(verbose)
+
+    setattr(sim, 'step', snapshotting_step)
+
+    expected = _finish(sim)
+    assert ' x2  = 0x00000004\n' in expected[0]
+
+    # The snapshot can be restored more than once.
+    for _ in range(2):
+        sim.restore(snapshots[0])
+        assert _finish(sim) == expected
+
+
+def pytest_generate_tests(metafunc: Any) -> None:
+    if metafunc.function is test_fork_matches:
+        tests = [asm for asm, _ in find_simple_tests()
+                 if BN_SIMD_DIR_NAME not in asm.split(os.sep)]
+        test_ids = [os.path.basename(asm) for asm in tests]
+        metafunc.parametrize("asm_file", tests, ids=test_ids)
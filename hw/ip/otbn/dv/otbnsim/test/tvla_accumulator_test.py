@@ -0,0 +1,153 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Check the streamed TVLA statistics against a direct computation.'''
+
+import math
+import random
+import statistics
+from typing import List, Sequence, Tuple
+
+import pytest
+
+# Importing sim puts the OTBN util directory (with otbn_tvla_campaign) on the
+# path
+import sim  # noqa: F401
+from otbn_tvla_campaign import NUM_MODELS, LeakageSums, TVLAAccumulator
+
+# A point is (pc, occurrence) and each trace has a sample for each model.
+_Trace = List[int]
+_POINT = (0x10, 0)
+_MAX_ORDER = 3
+
+
+def _random_traces(rng: random.Random, count: int) -> List[_Trace]:
+    return [[rng.randrange(33) for _ in range(NUM_MODELS)]
+            for _ in range(count)]
+
+
+def _accumulate(sets: Sequence[List[_Trace]],
+                batch_size: int) -> TVLAAccumulator:
+    '''Add the traces in batches, as the campaign does'''
+    acc = TVLAAccumulator(_MAX_ORDER)
+    for set_idx, traces in enumerate(sets):
+        for start in range(0, len(traces), batch_size):
+            sums = LeakageSums(2 * _MAX_ORDER)
+            for samples in traces[start:start + batch_size]:
+                sums.add(*_POINT, samples)
+            acc.add_batch(set_idx, sums)
+    return acc
+
+
+def _preprocess(xs: List[int], order: int) -> List[float]:
+    '''The samples that the test of the given order compares'''
+    if order == 1:
+        return [float(x) for x in xs]
+    mean = statistics.mean(xs)
+    if order == 2:
+        return [(x - mean) ** 2 for x in xs]
+    sigma = math.sqrt(statistics.pvariance(xs))
+    return [((x - mean) / sigma) ** order for x in xs]
+
+
+def _direct_stats(xs: List[int], order: int) -> Tuple[float, float]:
+    '''Return (mean, variance) of the preprocessed samples'''
+    ys = _preprocess(xs, order)
+    # The first order test uses the sample variance. The higher order tests
+    # use the variance of the preprocessed samples from their moments.
+    var = (statistics.variance(ys) if order == 1
+           else statistics.pvariance(ys))
+    return (statistics.mean(ys), var)
+
+
+def _direct_t(fixed: List[int], rand: List[int], order: int) -> float:
+    mean0, var0 = _direct_stats(fixed, order)
+    mean1, var1 = _direct_stats(rand, order)
+    return (mean0 - mean1) / math.sqrt(var0 / len(fixed) +
+                                       var1 / len(rand))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_matches_direct(seed: int) -> None:
+    '''Streamed moments and t-values match ones computed from the traces'''
+    rng = random.Random(seed)
+    sets = [_random_traces(rng, 23), _random_traces(rng, 17)]
+    acc = _accumulate(sets, 5)
+
+    assert acc.points() == [_POINT]
+    for set_idx, traces in enumerate(sets):
+        assert acc.count(*_POINT, set_idx) == len(traces)
+        for model in range(NUM_MODELS):
+            xs = [samples[model] for samples in traces]
+            n, mean, cms = acc.sets[set_idx].central_moments(*_POINT, model)
+            assert n == len(xs)
+            assert mean == pytest.approx(statistics.mean(xs))
+            assert cms[2] == pytest.approx(statistics.pvariance(xs))
+            for k in range(3, 2 * _MAX_ORDER + 1):
+                direct = sum((x - mean) ** k for x in xs) / n
+                assert cms[k] == pytest.approx(direct, rel=1e-9, abs=1e-9)
+
+    for model in range(NUM_MODELS):
+        fixed = [samples[model] for samples in sets[0]]
+        rand = [samples[model] for samples in sets[1]]
+        for order in range(1, _MAX_ORDER + 1):
+            expected = _direct_t(fixed, rand, order)
+            assert (acc.compute_t_test(*_POINT, model, order) ==
+                    pytest.approx(expected, rel=1e-9, abs=1e-9))
+
+
+def test_batches_merge() -> None:
+    '''The sums don't depend on how the traces are split into batches'''
+    rng = random.Random(0)
+    sets = [_random_traces(rng, 12), _random_traces(rng, 9)]
+    one_batch = _accumulate(sets, 100)
+    for batch_size in [1, 4]:
+        acc = _accumulate(sets, batch_size)
+        for set_idx in range(2):
+            assert acc.sets[set_idx].rows == one_batch.sets[set_idx].rows
+
+
+def test_single_trace() -> None:
+    '''There is no t-value unless both sets have at least two traces'''
+    rng = random.Random(1)
+    acc = _accumulate([_random_traces(rng, 1), _random_traces(rng, 10)], 1)
+
+    n, mean, cms = acc.sets[0].central_moments(*_POINT, 0)
+    assert n == 1
+    assert cms[2] == 0.0
+    for order in range(1, _MAX_ORDER + 1):
+        assert acc.compute_t_test(*_POINT, 0, order) == 0.0
+
+    # A point that one set never reached
+    assert acc.sets[0].central_moments(0x20, 0, 0) == (0, 0.0, [])
+    assert acc.compute_t_test(0x20, 0, 0) == 0.0
+
+
+def test_zero_variance() -> None:
+    '''Constant samples give no t-value or a finite one, never an error'''
+    const = [[5] * NUM_MODELS for _ in range(6)]
+    other_const = [[7] * NUM_MODELS for _ in range(4)]
+
+    # Both sets constant
+    acc = _accumulate([const, other_const], 2)
+    for order in range(1, _MAX_ORDER + 1):
+        assert acc.compute_t_test(*_POINT, 0, order) == 0.0
+
+    # Only the fixed set is constant. The first order test then only uses
+    # the variance of the random set.
+    rng = random.Random(2)
+    rand_traces = _random_traces(rng, 11)
+    acc = _accumulate([const, rand_traces], 3)
+    rand = [samples[0] for samples in rand_traces]
+    expected = ((5 - statistics.mean(rand)) /
+                math.sqrt(statistics.variance(rand) / len(rand)))
+    assert (acc.compute_t_test(*_POINT, 0, 1) ==
+            pytest.approx(expected, rel=1e-9))
+
+    # The constant set has no standardized moments, so the third order test
+    # compares zero with those of the random set.
+    mean1, var1 = _direct_stats(rand, 3)
+    expected = -mean1 / math.sqrt(var1 / len(rand))
+    assert (acc.compute_t_test(*_POINT, 0, 3) ==
+            pytest.approx(expected, rel=1e-9))
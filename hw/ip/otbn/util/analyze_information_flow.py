@@ -7,12 +7,9 @@ import argparse
 import sys
 
 from shared.constants import parse_required_constants
-from shared.control_flow import program_control_graph, subroutine_control_graph
-from shared.decode import decode_elf
+from shared.analysis_db import CACHE_DIR_ENV, AnalysisDB
 from shared.information_flow import InformationFlowGraph
-from shared.information_flow_analysis import (get_program_iflow,
-                                              get_subroutine_iflow,
-                                              stringify_control_deps)
+from shared.information_flow_analysis import stringify_control_deps
 
 
 def main() -> int:
@@ -52,14 +49,19 @@ def main() -> int:
         help=(
             'Initially secret information-flow nodes. If provided, the final '
             'secrets will be printed.'))
+    parser.add_argument(
+        '--cache-dir',
+        help=('The directory for the analysis database (default: ${}, or '
+              'a directory in the user\'s cache directory).'
+              .format(CACHE_DIR_ENV)))
     args = parser.parse_args()
-    program = decode_elf(args.elf, [])
+    db = (AnalysisDB(args.cache_dir) if args.cache_dir is not None
+          else AnalysisDB.from_env())
+    analysis = db.open(args.elf)
+    program = analysis.program
 
     # Compute control-flow graph.
-    if args.subroutine is None:
-        graph = program_control_graph(program)
-    else:
-        graph = subroutine_control_graph(program, args.subroutine)
+    graph = analysis.control_graph(args.subroutine)
 
     # Only print the control-flow graph if --verbose is set.
     if args.verbose:
@@ -87,12 +89,12 @@ def main() -> int:
     # Compute information-flow graph(s).
     if args.subroutine is None:
         what = 'program'
-        end_iflow, control_deps = get_program_iflow(program, graph)
+        end_iflow, control_deps = analysis.program_iflow()
         ret_iflow = InformationFlowGraph.nonexistent()
     else:
         what = 'subroutine'
-        ret_iflow, end_iflow, control_deps = get_subroutine_iflow(
-            program, graph, args.subroutine, constants)
+        ret_iflow, end_iflow, control_deps = analysis.subroutine_iflow(
+            args.subroutine, constants)
 
     # If no secrets were given or the --verbose flag is set, then print the
     # full information-flow graphs.
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Build (or check) the cached copy of the OTBN instruction database
+
+The OTBN tools load the parsed instruction database from a cache directory
+if they can (see shared/insns_cache.py). Running this script as a build step
+fills the cache, so that the tools never need to parse the YAML files.
+
+With --check, the script doesn't write anything. Instead, it loads the
+cached database, compares it with a fresh parse of the YAML files and fails
+if they differ.
+
+In either mode, the script also checks that no two instructions have
+ambiguous encodings (which is too slow a check to run on every load).
+'''
+
+import argparse
+import sys
+
+from shared import insns_cache
+from shared.insn_yaml import check_insns_cache, load_insns_yaml
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache-dir',
+                        help=('The cache directory to use (default: '
+                              '${}, or a directory in the user\'s cache '
+                              'directory).'.format(insns_cache.CACHE_DIR_ENV)))
+    parser.add_argument('--check', action='store_true',
+                        help=('Compare the cached database with the YAML '
+                              'files, rather than writing it.'))
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir
+    if cache_dir is None:
+        cache_dir = insns_cache.default_cache_dir()
+    if cache_dir is None:
+        print('No cache directory (${} is empty).'
+              .format(insns_cache.CACHE_DIR_ENV),
+              file=sys.stderr)
+        return 1
+
+    # Unless this is a check, load_insns_yaml writes the cache file if there
+    # isn't one already.
+    if not args.check:
+        load_insns_yaml(cache_dir)
+
+    problems = check_insns_cache(cache_dir)
+    if not problems:
+        insns_file = load_insns_yaml(cache_dir)
+        problems = ['Ambiguous instruction encodings: ' + amb
+                    for amb in insns_file.find_ambiguities()]
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
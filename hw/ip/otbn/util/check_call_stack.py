@@ -7,8 +7,9 @@ import argparse
 import sys
 from typing import Dict
 
+from shared.analysis_db import AnalysisDB
 from shared.check import CheckResult
-from shared.decode import OTBNProgram, decode_elf
+from shared.decode import OTBNProgram
 from shared.insn_yaml import Insn
 from shared.operand import RegOperandType
 
@@ -51,8 +52,8 @@ def main() -> int:
     parser.add_argument('elf', help=('The .elf file to check.'))
     parser.add_argument('-v', '--verbose', action='store_true')
     args = parser.parse_args()
-    program = decode_elf(args.elf, [])
-    result = check_call_stack(program)
+    analysis = AnalysisDB.from_env().open(args.elf)
+    result = analysis.check(check_call_stack)
     if args.verbose or result.has_errors() or result.has_warnings():
         print(result.report())
     return 1 if result.has_errors() else 0
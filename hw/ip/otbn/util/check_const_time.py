@@ -5,14 +5,59 @@
 
 import argparse
 import sys
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Set, Tuple
 
+from shared.analysis_db import CACHE_DIR_ENV, AnalysisDB, default_cache_dir
 from shared.check import CheckResult
 from shared.constants import parse_required_constants
-from shared.control_flow import program_control_graph, subroutine_control_graph
-from shared.decode import decode_elf
-from shared.information_flow_analysis import (get_program_iflow,
-                                              get_subroutine_iflow,
-                                              stringify_control_deps)
+from shared.decode import OTBNProgram
+from shared.information_flow_analysis import stringify_control_deps
+
+# The arguments for checking one subroutine (or the whole program if the
+# subroutine is None): (elf, ignore, subroutine, constants, secrets, cache_dir)
+CheckJob = Tuple[str, List[str], Optional[str], Dict[str, int],
+                 Optional[List[str]], Optional[str]]
+
+
+def check_control_deps(program: OTBNProgram,
+                       control_deps: Dict[str, Set[int]],
+                       secrets: Optional[List[str]]) -> CheckResult:
+    '''Check that no secrets influence control flow.
+
+    If secrets is None, everything is considered secret.
+    '''
+    if secrets is None:
+        secret_control_deps = control_deps
+    else:
+        # If secrets were provided, only show the ways in which those specific
+        # nodes could influence control flow.
+        secret_control_deps = {
+            node: pcs
+            for node, pcs in control_deps.items() if node in secrets
+        }
+
+    out = CheckResult()
+
+    if len(secret_control_deps) != 0:
+        msg = 'The following secrets may influence control flow:\n  '
+        msg += '\n  '.join(stringify_control_deps(program,
+                                                  secret_control_deps))
+        out.err(msg)
+
+    return out
+
+
+def run_check(job: CheckJob) -> CheckResult:
+    '''Decode the ELF and check one subroutine (or the whole program).'''
+    elf, ignore, subroutine, constants, secrets, cache_dir = job
+    analysis = AnalysisDB(cache_dir).open(elf, ignore)
+    if subroutine is None:
+        _, control_deps = analysis.program_iflow()
+    else:
+        _, _, control_deps = analysis.subroutine_iflow(subroutine,
+                                                       dict(constants))
+    return check_control_deps(analysis.program, control_deps, secrets)
 
 
 def main() -> int:
@@ -23,8 +68,9 @@ def main() -> int:
     parser.add_argument('--verbose', action='store_true')
     parser.add_argument(
         '--subroutine',
+        nargs='+',
         required=False,
-        help=('The specific subroutine to check. If not provided, the start '
+        help=('The specific subroutines to check. If not provided, the start '
               'point is _imem_start (whole program).'))
     parser.add_argument(
         '--ignore',
@@ -51,6 +97,16 @@ def main() -> int:
               'assume everything is secret; check that the subroutine or '
               'program has only one possible control-flow path regardless '
               'of input.'))
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help=('The number of subroutines to check in parallel.'))
+    parser.add_argument(
+        '--cache-dir',
+        help=('The directory for the analysis database (default: ${}, or '
+              'a directory in the user\'s cache directory).'
+              .format(CACHE_DIR_ENV)))
     args = parser.parse_args()
 
     # Parse initial constants.
@@ -63,50 +119,49 @@ def main() -> int:
                              'subroutine.')
         constants = parse_required_constants(args.constants)
 
-    # Compute control graph and get all nodes that influence control flow.
-    program = decode_elf(args.elf, args.ignore or [])
+    cache_dir = args.cache_dir or default_cache_dir()
+
     if args.subroutine is None:
-        graph = program_control_graph(program)
-        to_analyze = 'entire program'
-        _, control_deps = get_program_iflow(program, graph)
+        subroutines: List[Optional[str]] = [None]
     else:
-        graph = subroutine_control_graph(program, args.subroutine)
-        to_analyze = 'subroutine {}'.format(args.subroutine)
-        _, _, control_deps = get_subroutine_iflow(program, graph,
-                                                  args.subroutine, constants)
-
-    if args.secrets is None:
-        if args.verbose:
-            print(
-                'No specific secrets provided; checking that {} has only one '
-                'control-flow path'.format(to_analyze))
-        secret_control_deps = control_deps
-    else:
-        if args.verbose:
-            print('Analyzing {} with initial secrets {} and initial constants {}'.format(
-                to_analyze, args.secrets, constants))
-        # If secrets were provided, only show the ways in which those specific
-        # nodes could influence control flow.
-        secret_control_deps = {
-            node: pcs
-            for node, pcs in control_deps.items() if node in args.secrets
-        }
+        subroutines = list(args.subroutine)
 
-    out = CheckResult()
+    if args.verbose:
+        for subroutine in subroutines:
+            if subroutine is None:
+                to_analyze = 'entire program'
+            else:
+                to_analyze = 'subroutine {}'.format(subroutine)
+            if args.secrets is None:
+                print('No specific secrets provided; checking that {} has '
+                      'only one control-flow path'.format(to_analyze))
+            else:
+                print('Analyzing {} with initial secrets {} and initial '
+                      'constants {}'.format(to_analyze, args.secrets,
+                                            constants))
 
-    if len(secret_control_deps) != 0:
-        msg = 'The following secrets may influence control flow:\n  '
-        msg += '\n  '.join(stringify_control_deps(program,
-                                                  secret_control_deps))
-        out.err(msg)
+    # Compute control graph and get all nodes that influence control flow.
+    # Each job decodes the ELF file itself, so that they can run in separate
+    # processes.
+    jobs = [(args.elf, args.ignore or [], subroutine, constants, args.secrets,
+             cache_dir) for subroutine in subroutines]
+    if args.jobs > 1 and len(jobs) > 1:
+        with Pool(min(args.jobs, len(jobs))) as pool:
+            results = pool.map(run_check, jobs)
+    else:
+        results = [run_check(job) for job in jobs]
 
-    if args.verbose or out.has_errors() or out.has_warnings():
-        print(out.report())
+    failed = False
+    for subroutine, out in zip(subroutines, results):
+        if args.verbose or out.has_errors() or out.has_warnings():
+            if len(subroutines) > 1:
+                print('{}:'.format(subroutine))
+            print(out.report())
 
-    if out.has_errors() or out.has_warnings():
-        return 1
+        if out.has_errors() or out.has_warnings():
+            failed = True
 
-    return 0
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
@@ -7,8 +7,9 @@ import argparse
 import sys
 from typing import List
 
+from shared.analysis_db import AnalysisDB
 from shared.check import CheckResult
-from shared.decode import OTBNProgram, decode_elf
+from shared.decode import OTBNProgram
 from shared.section import CodeSection
 
 
@@ -224,8 +225,8 @@ def main() -> int:
     parser.add_argument('elf', help=('The .elf file to check.'))
     parser.add_argument('-v', '--verbose', action='store_true')
     args = parser.parse_args()
-    program = decode_elf(args.elf, [])
-    result = check_loop(program)
+    analysis = AnalysisDB.from_env().open(args.elf)
+    result = analysis.check(check_loop)
     if args.verbose or result.has_errors() or result.has_warnings():
         print(result.report())
     return 1 if result.has_errors() else 0
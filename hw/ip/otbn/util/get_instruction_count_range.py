@@ -5,9 +5,7 @@
 
 import argparse
 
-from shared.decode import decode_elf
-from shared.instruction_count_range import (program_insn_count_range,
-                                            subroutine_insn_count_range)
+from shared.analysis_db import AnalysisDB
 
 
 def main() -> int:
@@ -23,14 +21,10 @@ def main() -> int:
         help=('The specific subroutine to check. If not provided, the start '
               'point is _imem_start (whole program).'))
     args = parser.parse_args()
-    program = decode_elf(args.elf, [])
+    analysis = AnalysisDB.from_env().open(args.elf)
 
     # Compute instruction count range.
-    if args.subroutine is None:
-        min_count, max_count = program_insn_count_range(program)
-    else:
-        min_count, max_count = subroutine_insn_count_range(
-            program, args.subroutine)
+    min_count, max_count = analysis.insn_count_range(args.subroutine)
 
     # Print results.
     print(f'Minimum instruction count: {min_count}')
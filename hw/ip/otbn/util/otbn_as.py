@@ -14,18 +14,30 @@ Partial support:
   - Operands may not have embedded spaces or commas. Complicated immediate
     expressions are not currently supported.
 
+Transformed input files are cached in a directory, in files named after a hash
+of the source file, its name and position on the command line, the instruction
+database and this script. The directory is $OTBN_AS_CACHE_DIR if that is set
+(an empty value disables the cache) and otherwise "opentitan/otbn-as" in the
+user's cache directory.
+
 '''
 
+import hashlib
+import io
 import os
 import re
 import subprocess
 import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Optional, Set, TextIO, Tuple
 
 from shared.bit_ranges import BitRanges
+from shared.disk_cache import user_cache_dir, write_atomic
 from shared.encoding import Encoding
-from shared.insn_yaml import Insn, InsnsFile, load_insns_yaml
+from shared.insn_yaml import (Insn, InsnsFile, insns_fingerprint,
+                              load_insns_yaml)
 from shared.operand import ImmOperandType, Operand, RegOperandType
 from shared.toolchain import find_tool
 
@@ -405,6 +417,10 @@ def parse_positionals(
     # OTBN-specific flags
     otbn_flags = ['--otbn-translate']
 
+    # OTBN-specific flags that take a value (as "--foo=bar"). These aren't
+    # passed through to as.
+    otbn_value_flags = ['--otbn-jobs']
+
     flags = set()
 
     expecting_arg = False
@@ -417,6 +433,10 @@ def parse_positionals(
         if arg in otbn_flags:
             flags.add(arg)
 
+        if arg.split('=', 1)[0] in otbn_value_flags and '=' in arg:
+            flags.add(arg)
+            continue
+
         if arg in space_args:
             others.append(arg)
             expecting_arg = True
@@ -435,7 +455,9 @@ def parse_positionals(
               'for more information.\n'
               '\n'
               '  --otbn-translate: Translate the input and dump to '
-              'stdout rather than calling as.\n')
+              'stdout rather than calling as.\n'
+              '  --otbn-jobs=N: Transform up to N input files in '
+              'parallel.\n')
         sys.exit(0)
 
     return (positionals, others, flags)
@@ -1139,15 +1161,120 @@ def transform_input(out_handle: TextIO, in_path: str, in_handle: TextIO,
     transformer.at_eof()
 
 
+CACHE_DIR_ENV = 'OTBN_AS_CACHE_DIR'
+
+# Bump this if the format of a cache file changes
+_CACHE_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def _script_fingerprint() -> str:
+    '''A hash of this script (which defines the transformation)'''
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _transform_cache_path(cache_dir: str, in_path: str, in_idx: int,
+                          source: str) -> str:
+    '''Return the path of the cache file for a transformed input'''
+    h = hashlib.sha256()
+    h.update(repr((_CACHE_VERSION, insns_fingerprint(),
+                   _script_fingerprint(), in_path,
+                   in_idx)).encode('utf-8'))
+    h.update(source.encode('utf-8'))
+    return os.path.join(cache_dir,
+                        'otbn-as-{}.s'.format(h.hexdigest()))
+
+
+def transform_file(out_path: str, in_path: str, in_idx: int,
+                   insns_file: InsnsFile, glued_insns_dec_len: List[Insn],
+                   mnem_to_rve: Dict[str, RVEncoding],
+                   cache_dir: Optional[str]) -> None:
+    '''Transform the file at in_path, writing the result to out_path
+
+    If cache_dir is not None, the transformed file is loaded from (or stored
+    in) a cache file in that directory.
+
+    '''
+    with open(in_path, 'r') as in_handle:
+        source = in_handle.read()
+
+    cache_path = None
+    transformed = None
+    if cache_dir is not None:
+        cache_path = _transform_cache_path(cache_dir, in_path, in_idx, source)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as cache_handle:
+                transformed = cache_handle.read()
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    if transformed is None:
+        buf = io.StringIO()
+        transform_input(buf, in_path, io.StringIO(source), in_idx,
+                        insns_file, glued_insns_dec_len, mnem_to_rve)
+        transformed = buf.getvalue()
+        if cache_path is not None:
+            write_atomic(cache_path, transformed.encode('utf-8'))
+
+    with open(out_path, 'w') as out_handle:
+        out_handle.write(transformed)
+
+
+# The arguments to transform_file that are the same for every input file. This
+# is set in the worker processes that transform_inputs uses for parallel jobs.
+_WorkerArgs = Tuple[InsnsFile, List[Insn], Dict[str, RVEncoding],
+                    Optional[str]]
+_WORKER_ARGS = None  # type: Optional[_WorkerArgs]
+
+
+def _init_worker(insns_file: InsnsFile, glued_insns_dec_len: List[Insn],
+                 mnem_to_rve: Dict[str, RVEncoding],
+                 cache_dir: Optional[str]) -> None:
+    global _WORKER_ARGS
+    _WORKER_ARGS = (insns_file, glued_insns_dec_len, mnem_to_rve, cache_dir)
+
+
+def _transform_job(job: Tuple[str, str, int]) -> None:
+    assert _WORKER_ARGS is not None
+    out_path, in_path, in_idx = job
+    transform_file(out_path, in_path, in_idx, *_WORKER_ARGS)
+
+
 def transform_inputs(out_dir: str, inputs: List[str], insns_file: InsnsFile,
                      mnem_to_rve: Dict[str, RVEncoding],
                      glued_insns_dec_len: List[Insn],
-                     just_translate: bool) -> List[str]:
-    '''Transform inputs to make them suitable for riscv as'''
-    out_paths = []
+                     just_translate: bool,
+                     jobs: int = 1,
+                     cache_dir: Optional[str] = None) -> List[str]:
+    '''Transform inputs to make them suitable for riscv as
+
+    Unless the output is going to stdout or an input comes from stdin, the
+    input files are transformed with transform_file, in up to jobs worker
+    processes, using cache_dir as a cache directory.
+
+    '''
+    out_paths = [os.path.join(out_dir, str(idx))
+                 for idx in range(len(inputs))]
+
+    if not (just_translate or '--' in inputs):
+        file_jobs = list(zip(out_paths, inputs, range(len(inputs))))
+        if jobs > 1 and len(file_jobs) > 1:
+            with ProcessPoolExecutor(min(jobs, len(file_jobs)),
+                                     initializer=_init_worker,
+                                     initargs=(insns_file,
+                                               glued_insns_dec_len,
+                                               mnem_to_rve,
+                                               cache_dir)) as pool:
+                list(pool.map(_transform_job, file_jobs))
+        else:
+            for out_path, in_path, idx in file_jobs:
+                transform_file(out_path, in_path, idx, insns_file,
+                               glued_insns_dec_len, mnem_to_rve, cache_dir)
+        return out_paths
+
     for idx, in_path in enumerate(inputs):
-        out_path = os.path.join(out_dir, str(idx))
-        out_paths.append(out_path)
+        out_path = out_paths[idx]
 
         in_handle = sys.stdin
         pretty_in_path = 'stdin'
@@ -1206,6 +1333,16 @@ def main(argv: List[str]) -> int:
     files = files or ['--']
     just_translate = '--otbn-translate' in flags
 
+    jobs = 1
+    for flag in flags:
+        if flag.startswith('--otbn-jobs='):
+            try:
+                jobs = int(flag.split('=', 1)[1])
+            except ValueError:
+                sys.stderr.write('Invalid value for --otbn-jobs: {!r}.\n'
+                                 .format(flag.split('=', 1)[1]))
+                return 1
+
     # files is now a nonempty list of input files. Rather unusually, '--'
     # (rather than '-') denotes standard input.
 
@@ -1245,7 +1382,9 @@ def main(argv: List[str]) -> int:
         try:
             transformed = transform_inputs(tmpdir, files, insns_file,
                                            mnem_to_rve, glued_insns_dec_len,
-                                           just_translate)
+                                           just_translate, jobs,
+                                           user_cache_dir(CACHE_DIR_ENV,
+                                                          'otbn-as'))
         except RuntimeError as err:
             sys.stderr.write('{}\n'.format(err))
             return 1
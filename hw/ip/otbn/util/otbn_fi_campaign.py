@@ -2,21 +2,29 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-import concurrent.futures
-import multiprocessing
 import argparse
 import sys
 import tempfile
 import os
 import json
 import random
-from collections import Counter
 from elftools.elf.elffile import ELFFile
 
+from shared.campaign import CampaignRunner, campaign_key
+from sim.bintrace import BinTraceWriter, is_bin_trace, read_pcs, read_records
 from sim.standalonesim import StandaloneSim
 from sim.load_elf import load_elf
 from sim.state import FsmState
-from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Set, TextIO,
+                    Tuple)
+
+
+# The number of 32-bit words needed to seed URND (the PRNG state is 177 bits)
+URND_SEED_WORDS = 6
+
+# A fault point: the PC of the instruction to skip and the number of times
+# the simulation has already stepped at that PC when the skip happens.
+FaultPoint = Tuple[int, int]
 
 
 class FISim(StandaloneSim):
@@ -27,6 +35,56 @@ class FISim(StandaloneSim):
         self.fi_skip_pc = fi_skip_pc
         self.fi_skip_occurrence = fi_skip_occurrence
         self.pc_hit_counts: Dict[int, int] = {}
+        self.insn_count = 0
+        self.urnd_seed_count = 0
+
+    def _fi_step(
+        self, verbose: bool, trace_file: Optional[TextIO], max_insns: Optional[int]
+    ) -> bool:
+        """Step the simulation once, applying the fault if we hit it.
+
+        Returns true if the simulation has finished.
+        """
+        if max_insns is not None and self.insn_count >= max_insns:
+            raise TimeoutError("Maximum instruction limit reached")
+        if self.state.ext_regs.read("RND_REQ", True):
+            self.state.wsrs.RND.set_unsigned(random.getrandbits(256), False, False)
+        if self.state.wsrs.URND.requesting:
+            # Respond to URND requests immediately, in the same way as
+            # StandaloneSim.run(), but with random seed words.
+            self.state.wsrs.URND.set_seed(random.getrandbits(32))
+            self.urnd_seed_count = (self.urnd_seed_count + 1) % URND_SEED_WORDS
+            if self.urnd_seed_count == 0:
+                self.state.wsrs.URND.reseed_done = True
+
+        current_pc = self.state.pc
+
+        if trace_file is not None:
+            trace_file.write(f"0x{current_pc:08x}\n")
+
+        hits = self.pc_hit_counts.get(current_pc, 0)
+        self.pc_hit_counts[current_pc] = hits + 1
+
+        if current_pc == self.fi_skip_pc and hits == self.fi_skip_occurrence:
+            target_insn = self.program[current_pc // 4]
+            orig_execute = target_insn.execute
+
+            def nop_execute(*args: Any, **kwargs: Any) -> None:
+                pass
+
+            # Forks share the decoded program, so make sure that the
+            # instruction is restored even if the step raises an exception.
+            setattr(target_insn, "execute", nop_execute)
+            try:
+                self.step(verbose)
+            finally:
+                setattr(target_insn, "execute", orig_execute)
+        else:
+            self.step(verbose)
+
+        self.insn_count += 1
+
+        return self.state.get_fsm_state() in [FsmState.IDLE, FsmState.LOCKED]
 
     def run(
         self,
@@ -35,50 +93,57 @@ class FISim(StandaloneSim):
         trace_file: Optional[TextIO] = None,
         max_insns: Optional[int] = None,
     ) -> int:
-        insn_count = 0
         self.state.complete_init_sec_wipe()
-        while True:
-            if max_insns is not None and insn_count >= max_insns:
-                raise TimeoutError("Maximum instruction limit reached")
-            if self.state.ext_regs.read("RND_REQ", True):
-                self.state.wsrs.RND.set_unsigned(random.getrandbits(256), False, False)
-            if not self.state.wsrs.URND.running:
-                seed = [random.getrandbits(64) for _ in range(4)]
-                self.state.wsrs.URND.set_seed(seed)
-
-            current_pc = self.state.pc
+        while not self._fi_step(verbose, trace_file, max_insns):
+            pass
 
-            if trace_file is not None:
-                trace_file.write(f"0x{current_pc:08x}\n")
+        if dump_file is not None:
+            self.dump_regs(dump_file)
 
-            if current_pc == self.fi_skip_pc:
-                hits = self.pc_hit_counts.get(current_pc, 0)
-                if hits == self.fi_skip_occurrence:
-                    target_insn = self.program[current_pc // 4]
-                    orig_execute = target_insn.execute
+        return self.insn_count
 
-                    def nop_execute(*args: Any, **kwargs: Any) -> None:
-                        pass
-
-                    setattr(target_insn, "execute", nop_execute)
-                    self.step(verbose)
-                    setattr(target_insn, "execute", orig_execute)
-
-                    self.pc_hit_counts[current_pc] = hits + 1
-                    insn_count += 1
-                    continue
-
-                self.pc_hit_counts[current_pc] = hits + 1
+    def run_with_forks(
+        self,
+        faults: Set[FaultPoint],
+        on_fault: Callable[[FaultPoint, Optional["FISim"]], None],
+        max_insns: Optional[int] = None,
+    ) -> int:
+        """Run without faults, forking off a faulted copy at each fault point.
+
+        For each fault point that this run reaches, on_fault is called with
+        a fork of the simulation that will skip the instruction when it is
+        run. This means the common prefix of the faulted runs is only
+        simulated once.
+
+        If the fault point is in the middle of a multi-cycle instruction, we
+        can't fork. But skipping the instruction at that point has no effect
+        (the instruction has already started), so the faulted run would
+        behave exactly like this one. In that case, on_fault is called with
+        None. It is also called with None for any fault points that are never
+        reached.
+        """
+        self.state.complete_init_sec_wipe()
+        pending = set(faults)
+        done = False
+        while not done:
+            current_pc = self.state.pc
+            point = (current_pc, self.pc_hit_counts.get(current_pc, 0))
+            if point in pending:
+                pending.discard(point)
+                if self._execute_generator is None:
+                    forked = self.fork()
+                    assert isinstance(forked, FISim)
+                    forked.fi_skip_pc, forked.fi_skip_occurrence = point
+                    on_fault(point, forked)
+                else:
+                    on_fault(point, None)
 
-            self.step(verbose)
-            insn_count += 1
+            done = self._fi_step(False, None, max_insns)
 
-            if self.state.get_fsm_state() in [FsmState.IDLE, FsmState.LOCKED]:
-                if dump_file is not None:
-                    self.dump_regs(dump_file)
-                break
+        for point in sorted(pending):
+            on_fault(point, None)
 
-        return insn_count
+        return self.insn_count
 
 
 def parse_dmem_bytes(
@@ -101,6 +166,15 @@ def parse_dmem_bytes(
 # We go at most twice in a loop in order to shorten the test
 MAX_PC_DEPTH = 2
 
+# The minimum number of chunks of fault points to give each worker process.
+# Each chunk costs one fault-free run up to its last fault point, but smaller
+# chunks balance the load between workers better.
+CHUNKS_PER_WORKER = 4
+
+# The maximum number of fault points in a chunk. Results are checkpointed a
+# chunk at a time, so this bounds the work lost if a campaign is killed.
+MAX_FAULTS_PER_CHUNK = 64
+
 
 def get_symbol_offsets(
     elf_path: str, target_symbols: Iterable[str]
@@ -147,17 +221,16 @@ def parse_dmem(
     return results
 
 
-def run_test_and_get_dmem(
+def _prepare_fi_sim(
     elf_path: str,
-    offsets: Dict[str, int],
-    sizes: Dict[str, int],
-    dmem_json: Optional[str] = None,
-    trace_file: Optional[str] = None,
+    dmem_json: Optional[str],
     skip_pc: Optional[int] = None,
     skip_occurrence: int = 0,
-    max_insns: Optional[int] = None,
-) -> Dict[str, Any]:
-    """Runs the simulator and returns the parsed DMEM values."""
+) -> Tuple[FISim, Optional[int]]:
+    """Load the ELF and DMEM overrides and start the simulation.
+
+    Returns the simulator and the expected end address.
+    """
     sim = FISim(fi_skip_pc=skip_pc, fi_skip_occurrence=skip_occurrence)
     exp_end_addr = load_elf(sim, elf_path)
 
@@ -174,91 +247,216 @@ def run_test_and_get_dmem(
 
     sim.state.ext_regs.commit()
     sim.start(collect_stats=False)
+    return sim, exp_end_addr
 
-    trace_f = None
-    if trace_file:
-        trace_f = open(trace_file, "w")
 
+def _get_fi_result(
+    sim: FISim,
+    exp_end_addr: Optional[int],
+    offsets: Dict[str, int],
+    sizes: Dict[str, int],
+    insn_count: int,
+) -> Dict[str, Any]:
+    """Build the result dictionary for a completed run."""
+    if exp_end_addr is not None and sim.state.pc != exp_end_addr:
+        return {"status": "ERROR"}
+
+    dmem_data = sim.dump_data()
+    regs = parse_dmem_bytes(dmem_data, offsets, sizes)
+    return {"status": "SUCCESS", "regs": regs, "insn_count": insn_count}
+
+
+def _run_fi_sim(
+    run: Callable[[], int],
+    sim: FISim,
+    exp_end_addr: Optional[int],
+    offsets: Dict[str, int],
+    sizes: Dict[str, int],
+) -> Dict[str, Any]:
+    """Call run and convert the outcome to a result dictionary."""
     try:
-        insn_count = sim.run(verbose=False, trace_file=trace_f, max_insns=max_insns)
+        insn_count = run()
     except TimeoutError:
         return {"status": "TIMEOUT"}
     except Exception:
         import traceback
         traceback.print_exc()
         return {"status": "ERROR"}
+
+    return _get_fi_result(sim, exp_end_addr, offsets, sizes, insn_count)
+
+
+def run_test_and_get_dmem(
+    elf_path: str,
+    offsets: Dict[str, int],
+    sizes: Dict[str, int],
+    dmem_json: Optional[str] = None,
+    trace_file: Optional[str] = None,
+    skip_pc: Optional[int] = None,
+    skip_occurrence: int = 0,
+    max_insns: Optional[int] = None,
+    binary_trace: bool = False,
+) -> Dict[str, Any]:
+    """Runs the simulator and returns the parsed DMEM values.
+
+    If trace_file is given, the PC of each cycle is written to it. If
+    binary_trace is true, this is a binary trace (see sim/bintrace.py), which
+    also holds register writes and DMEM stores.
+    """
+    sim, exp_end_addr = _prepare_fi_sim(elf_path, dmem_json, skip_pc, skip_occurrence)
+
+    trace_f = None
+    bin_f = None
+    if trace_file and binary_trace:
+        bin_f = open(trace_file, "wb")
+        sim.bin_trace = BinTraceWriter(bin_f)
+    elif trace_file:
+        trace_f = open(trace_file, "w")
+
+    try:
+        return _run_fi_sim(
+            lambda: sim.run(verbose=False, trace_file=trace_f, max_insns=max_insns),
+            sim,
+            exp_end_addr,
+            offsets,
+            sizes,
+        )
     finally:
         if trace_f:
             trace_f.close()
+        if bin_f:
+            assert sim.bin_trace is not None
+            sim.bin_trace.close()
+            bin_f.close()
 
-    if exp_end_addr is not None and sim.state.pc != exp_end_addr:
-        return {"status": "ERROR"}
-
-    dmem_data = sim.dump_data()
-    regs = parse_dmem_bytes(dmem_data, offsets, sizes)
-    return {"status": "SUCCESS", "regs": regs, "insn_count": insn_count}
 
+def _run_faults(
+    template: FISim,
+    exp_end_addr: Optional[int],
+    offsets: Dict[str, int],
+    sizes: Dict[str, int],
+    faults: Iterable[FaultPoint],
+    max_insns: Optional[int],
+) -> Dict[FaultPoint, Dict[str, Any]]:
+    """Run each of the given faults, forking from a copy of template.
+
+    template should be a simulator that has been set up by _prepare_fi_sim
+    but not yet run. It isn't modified.
+    """
+    fault_set = set(faults)
+    sim = template.fork()
+    assert isinstance(sim, FISim)
+    results: Dict[FaultPoint, Dict[str, Any]] = {}
+    unfaulted: List[FaultPoint] = []
+
+    def on_fault(point: FaultPoint, forked: Optional[FISim]) -> None:
+        if forked is None:
+            unfaulted.append(point)
+            return
+        results[point] = _run_fi_sim(
+            lambda: forked.run(verbose=False, max_insns=max_insns),
+            forked,
+            exp_end_addr,
+            offsets,
+            sizes,
+        )
 
-def attack_worker(
-    task: Tuple[
-        int,
-        int,
-        str,
-        str,
-        bool,
-        Dict[str, int],
-        Dict[str, int],
-        str,
-        str,
-        int,
-    ]
-) -> Tuple[
-    int, int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]
-]:
-    random.seed()
-    (
-        pc,
-        occ,
-        elf_path,
-        attack_mode,
-        fixed_instruction_count,
+    golden = _run_fi_sim(
+        lambda: sim.run_with_forks(fault_set, on_fault, max_insns),
+        sim,
+        exp_end_addr,
         offsets,
         sizes,
-        dmem_a_path,
-        dmem_b_path,
-        baseline_insn_count,
-    ) = task
-    res_a = None
-    res_b = None
+    )
+    if golden["status"] != "SUCCESS":
+        # The fault-free run stopped early (at the instruction limit or with an
+        # exception), so fault points after that never got visited. Their runs
+        # would have stopped in the same way.
+        unfaulted.extend(fault_set - set(results) - set(unfaulted))
 
-    max_insns = baseline_insn_count * 2 if baseline_insn_count else None
+    for point in unfaulted:
+        results[point] = golden
 
-    if attack_mode in ["collision", "corruption"]:
-        res_a = run_test_and_get_dmem(
-            elf_path=elf_path,
-            offsets=offsets,
-            sizes=sizes,
-            dmem_json=dmem_a_path,
-            skip_pc=pc,
-            skip_occurrence=occ,
-            max_insns=max_insns,
-        )
+    return results
+
+
+def run_faults_and_get_dmem(
+    elf_path: str,
+    offsets: Dict[str, int],
+    sizes: Dict[str, int],
+    faults: Iterable[FaultPoint],
+    dmem_json: Optional[str] = None,
+    max_insns: Optional[int] = None,
+) -> Dict[FaultPoint, Dict[str, Any]]:
+    """Run the simulator with each of the given faults.
 
-        if res_a["status"] != "SUCCESS" and attack_mode == "collision":
-            return pc, occ, res_a, None
-
-    if attack_mode in ["collision", "bypass"]:
-        res_b = run_test_and_get_dmem(
-            elf_path=elf_path,
-            offsets=offsets,
-            sizes=sizes,
-            dmem_json=dmem_b_path,
-            skip_pc=pc,
-            skip_occurrence=occ,
-            max_insns=max_insns,
+    This gives the same results as calling run_test_and_get_dmem once for
+    each fault point, but only loads the ELF once and forks each faulted run
+    from a single fault-free run, rather than starting each from reset.
+    """
+    sim, exp_end_addr = _prepare_fi_sim(elf_path, dmem_json)
+    return _run_faults(sim, exp_end_addr, offsets, sizes, faults, max_insns)
+
+
+class FIWorker:
+    """The state of a worker process in the fault injection campaign.
+
+    This loads the ELF (with the DMEM overrides for each target that the
+    attack mode needs) once, when the worker starts. Each chunk of fault
+    points then forks the prepared simulators.
+    """
+    def __init__(
+        self,
+        elf_path: str,
+        attack_mode: str,
+        offsets: Dict[str, int],
+        sizes: Dict[str, int],
+        dmem_a_path: str,
+        dmem_b_path: str,
+        baseline_insn_count: int,
+    ) -> None:
+        self.attack_mode = attack_mode
+        self.offsets = offsets
+        self.sizes = sizes
+        self.max_insns = baseline_insn_count * 2 if baseline_insn_count else None
+
+        self.target_a = None
+        self.target_b = None
+        if attack_mode in ["collision", "corruption"]:
+            self.target_a = _prepare_fi_sim(elf_path, dmem_a_path)
+        if attack_mode in ["collision", "bypass"]:
+            self.target_b = _prepare_fi_sim(elf_path, dmem_b_path)
+
+    def run_faults(
+        self, target: Tuple[FISim, Optional[int]], faults: Iterable[FaultPoint]
+    ) -> Dict[FaultPoint, Dict[str, Any]]:
+        template, exp_end_addr = target
+        return _run_faults(
+            template, exp_end_addr, self.offsets, self.sizes, faults, self.max_insns
         )
 
-    return pc, occ, res_a, res_b
+
+def attack_worker(
+    worker: FIWorker, faults: Tuple[FaultPoint, ...]
+) -> List[
+    Tuple[int, int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+]:
+    """Run a chunk of fault points against the targets for the attack mode."""
+    res_a: Dict[FaultPoint, Dict[str, Any]] = {}
+    res_b: Dict[FaultPoint, Dict[str, Any]] = {}
+
+    faults_b = list(faults)
+    if worker.target_a is not None:
+        res_a = worker.run_faults(worker.target_a, faults)
+
+        if worker.attack_mode == "collision":
+            faults_b = [f for f in faults if res_a[f]["status"] == "SUCCESS"]
+
+    if worker.target_b is not None and faults_b:
+        res_b = worker.run_faults(worker.target_b, faults_b)
+
+    return [(pc, occ, res_a.get((pc, occ)), res_b.get((pc, occ)))
+            for pc, occ in faults]
 
 
 def build_pc_to_line_map(elf_path: str) -> Dict[int, Tuple[str, int]]:
@@ -285,6 +483,9 @@ def build_pc_to_line_map(elf_path: str) -> Dict[int, Tuple[str, int]]:
 
 
 def parse_trace_for_pcs(trace_file: str) -> List[int]:
+    if is_bin_trace(trace_file):
+        return list(read_pcs(trace_file))
+
     pc_list = []
     with open(trace_file, "r") as f:
         for line in f:
@@ -298,10 +499,44 @@ def parse_trace_for_pcs(trace_file: str) -> List[int]:
     return pc_list
 
 
+def annotate_bin_trace_file(
+    trace_path: str, out_path: str, dwarf_map: Dict[int, Tuple[str, int]]
+) -> None:
+    """Writes a binary trace as text, with DWARF source code mapping."""
+    with open(out_path, "w") as f:
+        for rec in read_records(trace_path):
+            changes = [
+                f"{name} = {value:#x}" if value is not None else f"{name} = x"
+                for name, value in rec.regs
+            ]
+            for addr, value, is_wide in rec.stores:
+                top = addr + (32 if is_wide else 4) - 1
+                changes.append(f"dmem[{addr:#x}..{top:#x}] = {value:#x}")
+
+            line = f"0x{rec.pc:08x}"
+            if changes:
+                line += ": " + ", ".join(changes)
+            if rec.pc in dwarf_map:
+                filepath, lineno = dwarf_map[rec.pc]
+                filename = os.path.basename(filepath)
+                line += f"    // [{filename}:{lineno}]"
+            f.write(line + "\n")
+
+
 def annotate_trace_file(
     trace_path: str, dwarf_map: Dict[int, Tuple[str, int]]
-) -> None:
-    """Rewrites the trace file to include DWARF source code mapping."""
+) -> str:
+    """Adds DWARF source code mapping to a trace file.
+
+    A text trace is rewritten in place. A binary trace is left alone and
+    written out as text to a file with the same name and a .log extension.
+    Returns the path of the annotated file.
+    """
+    if is_bin_trace(trace_path):
+        out_path = os.path.splitext(trace_path)[0] + ".log"
+        annotate_bin_trace_file(trace_path, out_path, dwarf_map)
+        return out_path
+
     with open(trace_path, "r") as f:
         lines = f.readlines()
 
@@ -322,6 +557,8 @@ def annotate_trace_file(
                     pass
             f.write(line)
 
+    return trace_path
+
 
 def generate_boolean_shares(
     secret: int, share_size: int, modulus: Optional[int] = None
@@ -495,6 +732,24 @@ def main() -> int:
         default=[],
         help="Format: sym[s]:mode:size:hex[:mod]",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of worker processes (default: number of CPUs minus 2)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Save results to this file as they arrive. If it exists, resume "
+        "the campaign that it holds.",
+    )
+    parser.add_argument(
+        "--binary-trace",
+        action="store_true",
+        help="Write the golden traces in the binary trace format, which is "
+        "much faster to write and parse for long runs. An annotated text copy "
+        "is written next to each one.",
+    )
     args = parser.parse_args()
 
     def parse_secret_args(arg_list: List[str]) -> List[Dict[str, Any]]:
@@ -546,7 +801,8 @@ def main() -> int:
         baseline_collision_val = None
 
         print("--- Generating Baseline (Target A) ---")
-        trace_file_a = "golden_trace_a.log"
+        trace_ext = ".bin" if args.binary_trace else ".log"
+        trace_file_a = "golden_trace_a" + trace_ext
         absolute_trace_path = os.path.abspath(trace_file_a)
         print(f"Trace file path: {absolute_trace_path}")
 
@@ -556,6 +812,7 @@ def main() -> int:
             sizes,
             dmem_json=dmem_a_path,
             trace_file=trace_file_a,
+            binary_trace=args.binary_trace,
         )
         if args.attack_mode in ["collision", "corruption"]:
             if res_a["status"] != "SUCCESS" or res_a["regs"][args.ok_sym] != ok_val_int:
@@ -564,7 +821,9 @@ def main() -> int:
                 )
                 return 1
 
-        annotate_trace_file(trace_file_a, dwarf_map)
+        annotated_path = annotate_trace_file(trace_file_a, dwarf_map)
+        if annotated_path != trace_file_a:
+            print(f"Annotated trace file path: {os.path.abspath(annotated_path)}")
         baseline_collision_val = 0
         if res_a["status"] == "SUCCESS":
             baseline_collision_val = unmask_value(
@@ -583,7 +842,7 @@ def main() -> int:
 
         if args.attack_mode in ["collision", "bypass"]:
             print("--- Generating Trace (Target B) ---")
-            trace_file = "golden_trace_b.log"
+            trace_file = "golden_trace_b" + trace_ext
             absolute_trace_path = os.path.abspath(trace_file)
             print(f"Trace file path: {absolute_trace_path}")
 
@@ -593,6 +852,7 @@ def main() -> int:
                 sizes,
                 dmem_json=dmem_b_path,
                 trace_file=trace_file,
+                binary_trace=args.binary_trace,
             )
 
             if args.attack_mode == "collision":
@@ -612,48 +872,75 @@ def main() -> int:
                     print("ERROR: In bypass mode, target B must fail. It returned ok.")
                     return 1
 
-            annotate_trace_file(trace_file, dwarf_map)
+            annotated_path = annotate_trace_file(trace_file, dwarf_map)
+            if annotated_path != trace_file:
+                print(f"Annotated trace file path: {os.path.abspath(annotated_path)}")
+
+        # Order the fault points by when they happen in the golden run of
+        # target A and split them into contiguous chunks. Each chunk
+        # simulates the fault-free prefix once and forks the faulted runs
+        # from it (see run_faults_and_get_dmem).
+        occurrences: Dict[int, int] = {}
+        fault_points = []
+        for pc in parse_trace_for_pcs(trace_file_a):
+            occ = occurrences.get(pc, 0)
+            occurrences[pc] = occ + 1
+            if occ < MAX_PC_DEPTH:
+                fault_points.append((pc, occ))
+        total_attacks = len(fault_points)
+        completed_attacks = 0
+        successful_attacks = 0
 
-        pc_counts = Counter(parse_trace_for_pcs(trace_file_a))
-        attack_queue = [
+        runner = CampaignRunner(
+            FIWorker,
             (
-                pc,
-                occ,
                 args.elf,
                 args.attack_mode,
-                args.fixed_instruction_count,
                 offsets,
                 sizes,
                 dmem_a_path,
                 dmem_b_path,
                 baseline_insn_count,
+            ),
+            attack_worker,
+            jobs=args.jobs,
+            checkpoint=args.checkpoint,
+            label="chunks",
+        )
+        num_chunks = min(
+            total_attacks,
+            max(
+                runner.jobs * CHUNKS_PER_WORKER,
+                -(-total_attacks // MAX_FAULTS_PER_CHUNK),
+            ),
+        )
+        chunks = [
+            tuple(
+                fault_points[
+                    idx * total_attacks // num_chunks:
+                    (idx + 1) * total_attacks // num_chunks
+                ]
             )
-            for pc, total in pc_counts.items()
-            for occ in range(min(MAX_PC_DEPTH, total))
+            for idx in range(num_chunks)
         ]
-        total_attacks = len(attack_queue)
-        completed_attacks = 0
-        successful_attacks = 0
-
-        max_workers = max(1, multiprocessing.cpu_count() - 2)
         print(
-            f"--- Starting fault simulation ({total_attacks} attacks, {max_workers} processes) ---"
+            f"--- Starting fault simulation ({total_attacks} attacks, {runner.jobs} processes) ---"
         )
 
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=max_workers
-        ) as executor:
-            future_to_task = {
-                executor.submit(attack_worker, task): task for task in attack_queue
-            }
-
-            for future in concurrent.futures.as_completed(future_to_task):
+        def on_error(chunk: Tuple[FaultPoint, ...], err: str) -> None:
+            nonlocal completed_attacks
+            completed_attacks += len(chunk)
+            print(f"Thread crashed unexpectedly: {err}", flush=True)
+
+        def on_result(
+            chunk: Tuple[FaultPoint, ...],
+            chunk_results: List[
+                Tuple[int, int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+            ],
+        ) -> None:
+            nonlocal completed_attacks, successful_attacks
+            for pc, occ, fault_res_a, fault_res_b in chunk_results:
                 completed_attacks += 1
-                try:
-                    pc, occ, fault_res_a, fault_res_b = future.result()
-                except Exception as e:
-                    print(f"Thread crashed unexpectedly: {e}", flush=True)
-                    continue
 
                 dwarf_str = "unknown_src"
                 if pc in dwarf_map:
@@ -810,6 +1097,23 @@ def main() -> int:
                     else:
                         print(f"{progress} No bypass", flush=True)
 
+        # The checkpoint is only valid for the same ELF and the arguments that
+        # change what the workers compute. Options that only control how the
+        # campaign runs (--jobs, --checkpoint and --binary-trace) or how
+        # results are judged are left out: saved results are passed back
+        # through on_result on resume. The DMEM overrides hold fresh random
+        # shares on each run, but they encode the same secrets.
+        key = campaign_key(
+            [
+                args.attack_mode,
+                sorted(sizes.items()),
+                target_a_secrets,
+                target_b_secrets,
+            ],
+            [args.elf],
+        )
+        runner.run(key, chunks, on_result, on_error)
+
         print(
             f"Campaign Complete. Successful Attacks: {successful_attacks}", flush=True
         )
@@ -7,35 +7,54 @@ import sys
 import os
 import random
 import math
-import tempfile
-import concurrent.futures
-import multiprocessing
-from collections import defaultdict, Counter
 from elftools.elf.elffile import ELFFile
 
+from shared.campaign import CampaignRunner, campaign_key
 from sim.standalonesim import StandaloneSim
 from sim.load_elf import load_elf
 from sim.state import FsmState
 from sim.isa import OTBNInsn
 from sim.trace import Trace
-from typing import Any, Dict, List, Optional, TextIO, Tuple
+from typing import Any, Dict, List, Optional, Sequence, TextIO, Tuple
+
+
+# The source registers of an instruction: wrs1, wrs2, grs1, grs2
+SrcRegs = Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]
+
+# The number of 32-bit words needed to seed URND (the PRNG state is 177 bits)
+URND_SEED_WORDS = 6
 
 
 class TVLASim(StandaloneSim):
-    def __init__(self, trace_hw_file: Optional[TextIO] = None) -> None:
+    """A simulator that computes leakage samples for each instruction.
+
+    The samples can be written to trace_hw_file (as text, one line per
+    instruction) or added to leakage (which is much cheaper). If neither is
+    given, no samples are computed.
+    """
+    def __init__(
+        self,
+        trace_hw_file: Optional[TextIO] = None,
+        leakage: Optional["LeakageSums"] = None,
+    ) -> None:
         super().__init__()
         self.trace_hw_file = trace_hw_file
-        if self.trace_hw_file is not None:
-            self._tvla_init()
+        self.leakage = leakage
+        # Source register indices (wrs1, wrs2, grs1, grs2) for each PC
+        self._tvla_srcs: Dict[int, SrcRegs] = {}
+        self._tvla_init()
+
+    def _tvla_enabled(self) -> bool:
+        return self.trace_hw_file is not None or self.leakage is not None
 
     def _on_retire(self, verbose: bool, insn: OTBNInsn) -> List[Trace]:
-        if self.trace_hw_file is not None:
-            self._tvla_pending_wdrs = list(self.state.wdrs._pending_writes)
+        if self._tvla_enabled():
+            self._tvla_pending_wdrs = self.state.wdrs.pending_writes()
         return super()._on_retire(verbose, insn)
 
     def _on_stall(self, verbose: bool, fetch_next: bool) -> List[Trace]:
-        if self.trace_hw_file is not None:
-            self._tvla_pending_wdrs = list(self.state.wdrs._pending_writes)
+        if self._tvla_enabled():
+            self._tvla_pending_wdrs = self.state.wdrs.pending_writes()
         return super()._on_stall(verbose, fetch_next)
 
     def run_batch(
@@ -45,6 +64,8 @@ class TVLASim(StandaloneSim):
         dmem_batch_data: Optional[List[Dict[str, bytes]]] = None,
     ) -> int:
         insn_count = 0
+        urnd_seed_count = 0
+        tvla_enabled = self._tvla_enabled()
         initial_pc = self.state.pc
         snapshot_dmem = self.state.dmem.dump_le_words() if batch_size > 1 else None
 
@@ -62,9 +83,6 @@ class TVLASim(StandaloneSim):
                 self.state.wsrs.ACC.write_unsigned(0)
                 self.state.csrs.flags[0].write_unsigned(0)
                 self.state.csrs.flags[1].write_unsigned(0)
-                self.state.wsrs.URND.set_seed(
-                    [random.getrandbits(64) for _ in range(4)]
-                )
                 self.state.pc = initial_pc
                 self.state.commit(sim_stalled=True)
                 self._tvla_init()
@@ -82,23 +100,28 @@ class TVLASim(StandaloneSim):
                     self.state.wsrs.RND.set_unsigned(
                         random.getrandbits(256), False, False
                     )
-                if not self.state.wsrs.URND.running:
-                    self.state.wsrs.URND.set_seed(
-                        [random.getrandbits(64) for _ in range(4)]
-                    )
+                if self.state.wsrs.URND.requesting:
+                    # Respond to URND requests immediately, in the same way as
+                    # StandaloneSim.run(), but with random seed words. The
+                    # call to start() above makes a new request for each
+                    # trace.
+                    self.state.wsrs.URND.set_seed(random.getrandbits(32))
+                    urnd_seed_count = (urnd_seed_count + 1) % URND_SEED_WORDS
+                    if urnd_seed_count == 0:
+                        self.state.wsrs.URND.reseed_done = True
 
                 current_pc = self.state.pc
 
                 tvla_hits = 0
-                if self.trace_hw_file is not None:
+                if tvla_enabled:
                     tvla_hits = self._tvla_hits.get(current_pc, 0)
                     self._tvla_pre_step(current_pc)
 
                 self.step(verbose)
                 insn_count += 1
 
-                if self.trace_hw_file is not None:
-                    self._tvla_post_step(current_pc, self.trace_hw_file)
+                if tvla_enabled:
+                    self._tvla_post_step(current_pc, tvla_hits)
                     self._tvla_hits[current_pc] = tvla_hits + 1
 
                 if self.state.get_fsm_state() in [FsmState.IDLE, FsmState.LOCKED]:
@@ -116,11 +139,8 @@ class TVLASim(StandaloneSim):
             "in_gp": 0,
         }
 
-    def _tvla_pre_step(self, current_pc: int) -> None:
-        self._tvla_wdrs_before = self.state.wdrs.peek_unsigned_values()
-        self._tvla_gprs_before = self.state.gprs.peek_unsigned_values()
-        self._tvla_acc_before = self.state.wsrs.ACC.read_unsigned()
-
+    def _tvla_src_regs(self, current_pc: int) -> SrcRegs:
+        """Find the source registers of the instruction at current_pc."""
         wrs1_idx, wrs2_idx = None, None
         grs1_idx, grs2_idx = None, None
         try:
@@ -151,6 +171,21 @@ class TVLASim(StandaloneSim):
         except Exception:
             pass
 
+        return (wrs1_idx, wrs2_idx, grs1_idx, grs2_idx)
+
+    def _tvla_pre_step(self, current_pc: int) -> None:
+        self._tvla_wdrs_before = self.state.wdrs.peek_unsigned_values()
+        self._tvla_gprs_before = self.state.gprs.peek_unsigned_values()
+        self._tvla_acc_before = self.state.wsrs.ACC.read_unsigned()
+
+        # The operands of an instruction don't change, so only decode them
+        # the first time we see each PC.
+        srcs = self._tvla_srcs.get(current_pc)
+        if srcs is None:
+            srcs = self._tvla_src_regs(current_pc)
+            self._tvla_srcs[current_pc] = srcs
+        wrs1_idx, wrs2_idx, grs1_idx, grs2_idx = srcs
+
         self._tvla_in_hw, self._tvla_in_hd = (
             0,
             0,
@@ -160,23 +195,23 @@ class TVLASim(StandaloneSim):
             val1 = self._tvla_wdrs_before[wrs1_idx] if wrs1_idx is not None else 0
             val2 = self._tvla_wdrs_before[wrs2_idx] if wrs2_idx is not None else 0
             val = (val1 << 256) | val2
-            self._tvla_in_hw = bin(val).count("1")
-            self._tvla_in_hd = bin(self._tvla_latches["in_wide"] ^ val).count("1")
+            self._tvla_in_hw = val.bit_count()
+            self._tvla_in_hd = (self._tvla_latches["in_wide"] ^ val).bit_count()
             self._tvla_latches["in_wide"] = val
             self._tvla_latches["in_gp"] = 0
         elif grs1_idx is not None or grs2_idx is not None:
             val1 = self._tvla_gprs_before[grs1_idx] if grs1_idx is not None else 0
             val2 = self._tvla_gprs_before[grs2_idx] if grs2_idx is not None else 0
             val = (val1 << 32) | val2
-            self._tvla_in_hw = bin(val).count("1")
-            self._tvla_in_hd = bin(self._tvla_latches["in_gp"] ^ val).count("1")
+            self._tvla_in_hw = val.bit_count()
+            self._tvla_in_hd = (self._tvla_latches["in_gp"] ^ val).bit_count()
             self._tvla_latches["in_gp"] = val
             self._tvla_latches["in_wide"] = 0
         else:
             self._tvla_latches["in_wide"] = 0
             self._tvla_latches["in_gp"] = 0
 
-    def _tvla_post_step(self, current_pc: int, trace_hw_file: TextIO) -> None:
+    def _tvla_post_step(self, current_pc: int, occ: int) -> None:
         wdrs_after = self.state.wdrs.peek_unsigned_values()
         acc_after = self.state.wsrs.ACC.read_unsigned()
         fg0_after = self.state.csrs.flags[0].read_unsigned()
@@ -186,24 +221,34 @@ class TVLASim(StandaloneSim):
         out_hd = 0
         if self._tvla_acc_before != acc_after:
             curr_alu_out = acc_after
-            out_hd = bin(self._tvla_acc_before ^ acc_after).count("1")
+            out_hd = (self._tvla_acc_before ^ acc_after).bit_count()
         else:
             if self._tvla_pending_wdrs:
-                idx = sorted(self._tvla_pending_wdrs)[0]
+                idx = self._tvla_pending_wdrs[0]
                 curr_alu_out = wdrs_after[idx]
-                out_hd = bin(self._tvla_wdrs_before[idx] ^ curr_alu_out).count("1")
-
-        out_hw = bin(curr_alu_out).count("1") if curr_alu_out is not None else 0
+                out_hd = (self._tvla_wdrs_before[idx] ^ curr_alu_out).bit_count()
+
+        out_hw = curr_alu_out.bit_count() if curr_alu_out is not None else 0
+
+        # The samples for each leakage model, in the order of MODEL_NAMES
+        samples = (
+            out_hw,
+            out_hd,
+            fg0_after.bit_count(),
+            (self._tvla_latches["fg0"] ^ fg0_after).bit_count(),
+            fg1_after.bit_count(),
+            (self._tvla_latches["fg1"] ^ fg1_after).bit_count(),
+            self._tvla_in_hw,
+            self._tvla_in_hd,
+        )
 
-        fg0_hw = bin(fg0_after).count("1")
-        fg0_hd = bin(self._tvla_latches["fg0"] ^ fg0_after).count("1")
-        fg1_hw = bin(fg1_after).count("1")
-        fg1_hd = bin(self._tvla_latches["fg1"] ^ fg1_after).count("1")
+        if self.leakage is not None:
+            self.leakage.add(current_pc, occ, samples)
 
-        trace_hw_file.write(
-            f"{current_pc:#x} {out_hw} {out_hd} {fg0_hw} {fg0_hd} "
-            f"{fg1_hw} {fg1_hd} {self._tvla_in_hw} {self._tvla_in_hd}\n"
-        )
+        if self.trace_hw_file is not None:
+            self.trace_hw_file.write(
+                f"{current_pc:#x} " + " ".join(str(x) for x in samples) + "\n"
+            )
 
         self._tvla_latches["fg0"] = fg0_after
         self._tvla_latches["fg1"] = fg1_after
@@ -223,43 +268,142 @@ MODEL_NAMES = {
 }
 
 
+class LeakageSums:
+    """Power sums of the leakage samples for a set of traces.
+
+    For each (pc, occurrence) point, this holds a row of integers. The first
+    entry is the number of samples, then there are NUM_MODELS entries for the
+    sum of the samples, NUM_MODELS entries for the sum of their squares, and
+    so on up to max_power.
+
+    The samples are small integers, so these sums are exact (Python integers
+    don't overflow). Sums for different sets of traces can be merged by
+    adding them, and central moments computed from them are exact up to the
+    final rounding to a float, so they are as numerically stable as an
+    online (Welford-style) update.
+    """
+    def __init__(self, max_power: int) -> None:
+        self.max_power = max_power
+        self.rows: Dict[Tuple[int, int], List[int]] = {}
+
+    def _new_row(self) -> List[int]:
+        return [0] * (1 + NUM_MODELS * self.max_power)
+
+    def add(self, pc: int, occ: int, samples: Sequence[int]) -> None:
+        """Add a sample for each leakage model at (pc, occ)"""
+        row = self.rows.get((pc, occ))
+        if row is None:
+            row = self._new_row()
+            self.rows[(pc, occ)] = row
+
+        row[0] += 1
+        for i, x in enumerate(samples):
+            idx = 1 + i
+            xp = x
+            row[idx] += xp
+            for _ in range(1, self.max_power):
+                idx += NUM_MODELS
+                xp *= x
+                row[idx] += xp
+
+    def merge(self, other: "LeakageSums") -> None:
+        """Add the sums from other to these"""
+        assert other.max_power == self.max_power
+        for point, other_row in other.rows.items():
+            row = self.rows.get(point)
+            if row is None:
+                self.rows[point] = list(other_row)
+            else:
+                for i, val in enumerate(other_row):
+                    row[i] += val
+
+    def count(self, pc: int, occ: int) -> int:
+        row = self.rows.get((pc, occ))
+        return row[0] if row is not None else 0
+
+    def central_moments(
+        self, pc: int, occ: int, model_idx: int
+    ) -> Tuple[int, float, List[float]]:
+        """Return (n, mean, cms) for a leakage model at (pc, occ).
+
+        cms[k] is the k'th central moment, (1/n) sum (x - mean)^k, for k up
+        to max_power (cms[0] and cms[1] are 1 and 0). The moments are
+        computed exactly from the integer power sums: n^(k+1) cms[k] is equal
+        to sum_j C(k, j) n^j S_j (-S_1)^(k-j), where S_j is the sum of the
+        j'th powers.
+        """
+        row = self.rows.get((pc, occ))
+        if row is None or row[0] == 0:
+            return (0, 0.0, [])
+
+        n = row[0]
+        sums = [n] + [row[1 + model_idx + NUM_MODELS * j] for j in range(self.max_power)]
+        s1 = sums[1]
+        cms = [1.0, 0.0]
+        for k in range(2, self.max_power + 1):
+            num = sum(
+                math.comb(k, j) * n**j * sums[j] * (-s1) ** (k - j)
+                for j in range(k + 1)
+            )
+            cms.append(num / n ** (k + 1))
+        return (n, s1 / n, cms)
+
+
 class TVLAAccumulator:
-    def __init__(self) -> None:
-        self.counts = defaultdict(lambda: defaultdict(lambda: [0, 0]))
-        self.sums = defaultdict(
-            lambda: defaultdict(lambda: [[0.0] * NUM_MODELS, [0.0] * NUM_MODELS])
-        )
-        self.sum_sqs = defaultdict(
-            lambda: defaultdict(lambda: [[0.0] * NUM_MODELS, [0.0] * NUM_MODELS])
+    """Leakage sums for the fixed (0) and random (1) sets of traces.
+
+    This supports univariate t-tests up to max_order. The order 1 test is a
+    Welch t-test on the samples. Order 2 tests the centered squares of the
+    samples and order 3 tests the standardized cubes (see Schneider and
+    Moradi, "Leakage Assessment Methodology", CHES 2015). A test of order d
+    needs power sums up to 2d.
+    """
+    def __init__(self, max_order: int = 1) -> None:
+        self.max_order = max_order
+        self.sets = (LeakageSums(2 * max_order), LeakageSums(2 * max_order))
+
+    def add_batch(self, set_idx: int, sums: LeakageSums) -> None:
+        self.sets[set_idx].merge(sums)
+
+    def points(self) -> List[Tuple[int, int]]:
+        """All the (pc, occ) points seen, in order"""
+        return sorted(set(self.sets[0].rows) | set(self.sets[1].rows))
+
+    def count(self, pc: int, occ: int, set_idx: int) -> int:
+        return self.sets[set_idx].count(pc, occ)
+
+    def _order_stats(
+        self, set_idx: int, pc: int, occ: int, model_idx: int, order: int
+    ) -> Tuple[int, float, float]:
+        """Return (n, mean, variance) of the preprocessed samples."""
+        n, mean, cms = self.sets[set_idx].central_moments(pc, occ, model_idx)
+        if n < 2:
+            return (n, 0.0, 0.0)
+        if order == 1:
+            # Use the unbiased sample variance for the first order test
+            return (n, mean, cms[2] * n / (n - 1))
+        if order == 2:
+            return (n, cms[2], max(0.0, cms[4] - cms[2] ** 2))
+
+        # Standardized moments for orders 3 and above
+        if cms[2] == 0:
+            return (n, 0.0, 0.0)
+        return (
+            n,
+            cms[order] / cms[2] ** (order / 2),
+            max(0.0, cms[2 * order] - cms[order] ** 2) / cms[2] ** order,
         )
 
-    def add_trace_hws(
-        self, pc: int, occ: int, set_idx: int, hws: List[int]
-    ) -> None:
-        self.counts[pc][occ][set_idx] += 1
-        for i in range(NUM_MODELS):
-            hw = hws[i]
-            self.sums[pc][occ][set_idx][i] += hw
-            self.sum_sqs[pc][occ][set_idx][i] += hw**2
-
-    def compute_t_test(self, pc: int, occ: int, model_idx: int) -> float:
-        n0 = self.counts[pc][occ][0]
-        n1 = self.counts[pc][occ][1]
+    def compute_t_test(
+        self, pc: int, occ: int, model_idx: int, order: int = 1
+    ) -> float:
+        assert 1 <= order <= self.max_order
+        n0, mean0, var0 = self._order_stats(0, pc, occ, model_idx, order)
+        n1, mean1, var1 = self._order_stats(1, pc, occ, model_idx, order)
 
         if n0 < 2 or n1 < 2:
             return 0.0
 
-        sum0 = self.sums[pc][occ][0][model_idx]
-        sum1 = self.sums[pc][occ][1][model_idx]
-        sq0 = self.sum_sqs[pc][occ][0][model_idx]
-        sq1 = self.sum_sqs[pc][occ][1][model_idx]
-
-        mean0 = sum0 / n0
-        mean1 = sum1 / n1
-
-        var0 = (sq0 - (sum0**2) / n0) / (n0 - 1)
-        var1 = (sq1 - (sum1**2) / n1) / (n1 - 1)
-
         if var0 == 0 and var1 == 0:
             return 0.0
 
@@ -384,140 +528,113 @@ def generate_shares(
     raise ValueError(f"Unknown mode: {mode}")
 
 
-def run_experiment(
-    task: Tuple[str, str, int, int, int, Dict[str, Any]]
-) -> Tuple[int, int, Dict[Tuple[int, int], List[Any]]]:
-    """Runs a batched simulation."""
-    _, elf_path, set_idx, batch_num, batch_size, cfg = task
-    random.seed()
-
-    # Write to RAM
-    shm_dir = "/dev/shm" if os.path.exists("/dev/shm") else None
+class TVLAWorker:
+    """The state of a worker process in the TVLA campaign.
 
-    trace_hw = tempfile.NamedTemporaryFile(dir=shm_dir, mode="w+", delete=False)
-    trace_path = trace_hw.name
+    This loads the ELF once, when the worker starts, and keeps the simulator
+    from just before it runs. Each batch then runs on a fork of it.
+    """
+    def __init__(
+        self, elf_path: str, batch_size: int, cfg: Dict[str, Any], max_order: int
+    ) -> None:
+        self.batch_size = batch_size
+        self.cfg = cfg
+        self.max_order = max_order
 
-    local_stats = {}
+        self.template = TVLASim()
+        load_elf(self.template, elf_path)
 
-    try:
-        batch_dmem = []
-        is_random_set = set_idx == 1
-
-        for _ in range(batch_size):
-            trace_dict = {}
-
-            # Target shares (fixed vs random)
-            for tvla in cfg["tvla_secrets"]:
-                if is_random_set:
-                    bit_len = tvla["size"] * 8
-                    current_secret = random.getrandbits(bit_len)
-                    if tvla["modulus"]:
-                        current_secret = current_secret % tvla["modulus"]
-                else:
-                    current_secret = tvla["secret"]
-
-                share0, share1 = generate_shares(
-                    tvla["mode"], current_secret, tvla["size"], tvla["modulus"]
-                )
-                trace_dict[tvla["symbols"][0]] = share0.to_bytes(
-                    tvla["size"], "little"
-                ).hex()
-                if share1 is not None and len(tvla["symbols"]) > 1:
-                    trace_dict[tvla["symbols"][1]] = share1.to_bytes(
-                        tvla["size"], "little"
-                    ).hex()
-
-            # Fixed background (value is always the same)
-            for bg in cfg["fixed_bg_secrets"]:
-                bg_share0, bg_share1 = generate_shares(
-                    bg["mode"], bg["secret"], bg["size"], bg["modulus"]
-                )
-                trace_dict[bg["symbols"][0]] = bg_share0.to_bytes(
-                    bg["size"], "little"
-                ).hex()
-                if bg_share1 is not None and len(bg["symbols"]) > 1:
-                    trace_dict[bg["symbols"][1]] = bg_share1.to_bytes(
-                        bg["size"], "little"
-                    ).hex()
-
-            # Random background (value is randomized on every trace)
-            for bg in cfg["random_bg_secrets"]:
-                bit_len = bg["size"] * 8
-                rnd_sec = random.getrandbits(bit_len)
-                if bg["modulus"]:
-                    rnd_sec = rnd_sec % bg["modulus"]
-
-                bg_share0, bg_share1 = generate_shares(
-                    bg["mode"], rnd_sec, bg["size"], bg["modulus"]
-                )
-                trace_dict[bg["symbols"][0]] = bg_share0.to_bytes(
-                    bg["size"], "little"
-                ).hex()
-                if bg_share1 is not None and len(bg["symbols"]) > 1:
-                    trace_dict[bg["symbols"][1]] = bg_share1.to_bytes(
-                        bg["size"], "little"
-                    ).hex()
+        key0 = int((str("deadbeef") * 12), 16)
+        key1 = int((str("baadf00d") * 12), 16)
+        self.template.state.wsrs.set_sideload_keys(key0, key1)
 
-            batch_dmem.append(trace_dict)
 
-        parsed_batch_dmem = []
-        for dmem_dict in batch_dmem:
-            parsed_dict = {k: bytes.fromhex(v) for k, v in dmem_dict.items()}
-            parsed_batch_dmem.append(parsed_dict)
+def run_experiment(worker: TVLAWorker, task: Tuple[int, int]) -> "LeakageSums":
+    """Runs a batched simulation.
 
-        sim = TVLASim(trace_hw_file=trace_hw)
-        load_elf(sim, elf_path)
+    The task is (batch_num, set_idx). Returns the leakage sums for the batch.
+    """
+    batch_num, set_idx = task
+    batch_size = worker.batch_size
+    cfg = worker.cfg
 
-        key0 = int((str("deadbeef") * 12), 16)
-        key1 = int((str("baadf00d") * 12), 16)
-        sim.state.wsrs.set_sideload_keys(key0, key1)
+    batch_dmem = []
+    is_random_set = set_idx == 1
 
-        sim.run_batch(
-            verbose=False, batch_size=batch_size, dmem_batch_data=parsed_batch_dmem
-        )
+    for _ in range(batch_size):
+        trace_dict = {}
 
-        trace_hw.flush()
-        trace_hw.seek(0)
+        # Target shares (fixed vs random)
+        for tvla in cfg["tvla_secrets"]:
+            if is_random_set:
+                bit_len = tvla["size"] * 8
+                current_secret = random.getrandbits(bit_len)
+                if tvla["modulus"]:
+                    current_secret = current_secret % tvla["modulus"]
+            else:
+                current_secret = tvla["secret"]
 
-        pc_counts = Counter()
-        for line in trace_hw:
-            # Check if the state is cleared
-            if line.startswith("==="):
-                pc_counts.clear()
-                continue
+            share0, share1 = generate_shares(
+                tvla["mode"], current_secret, tvla["size"], tvla["modulus"]
+            )
+            trace_dict[tvla["symbols"][0]] = share0.to_bytes(
+                tvla["size"], "little"
+            ).hex()
+            if share1 is not None and len(tvla["symbols"]) > 1:
+                trace_dict[tvla["symbols"][1]] = share1.to_bytes(
+                    tvla["size"], "little"
+                ).hex()
 
-            parts = line.strip().split()
-            if not parts:
-                continue
+        # Fixed background (value is always the same)
+        for bg in cfg["fixed_bg_secrets"]:
+            bg_share0, bg_share1 = generate_shares(
+                bg["mode"], bg["secret"], bg["size"], bg["modulus"]
+            )
+            trace_dict[bg["symbols"][0]] = bg_share0.to_bytes(
+                bg["size"], "little"
+            ).hex()
+            if bg_share1 is not None and len(bg["symbols"]) > 1:
+                trace_dict[bg["symbols"][1]] = bg_share1.to_bytes(
+                    bg["size"], "little"
+                ).hex()
 
-            pc = int(parts[0], 16)
-            hws = [int(x) for x in parts[1:]]
+        # Random background (value is randomized on every trace)
+        for bg in cfg["random_bg_secrets"]:
+            bit_len = bg["size"] * 8
+            rnd_sec = random.getrandbits(bit_len)
+            if bg["modulus"]:
+                rnd_sec = rnd_sec % bg["modulus"]
 
-            occ = pc_counts[pc]
+            bg_share0, bg_share1 = generate_shares(
+                bg["mode"], rnd_sec, bg["size"], bg["modulus"]
+            )
+            trace_dict[bg["symbols"][0]] = bg_share0.to_bytes(
+                bg["size"], "little"
+            ).hex()
+            if bg_share1 is not None and len(bg["symbols"]) > 1:
+                trace_dict[bg["symbols"][1]] = bg_share1.to_bytes(
+                    bg["size"], "little"
+                ).hex()
 
-            if (pc, occ) not in local_stats:
-                # [count, sums_array, sum_sqs_array]
-                local_stats[(pc, occ)] = [0, [0.0] * NUM_MODELS, [0.0] * NUM_MODELS]
+        batch_dmem.append(trace_dict)
 
-            stats = local_stats[(pc, occ)]
-            stats[0] += 1
-            for i in range(NUM_MODELS):
-                stats[1][i] += hws[i]
-                stats[2][i] += hws[i] ** 2
+    parsed_batch_dmem = []
+    for dmem_dict in batch_dmem:
+        parsed_dict = {k: bytes.fromhex(v) for k, v in dmem_dict.items()}
+        parsed_batch_dmem.append(parsed_dict)
 
-            pc_counts[pc] += 1
+    sim = worker.template.fork()
+    assert isinstance(sim, TVLASim)
+    sim.leakage = LeakageSums(2 * worker.max_order)
 
-        if not local_stats:
-            print(f"\nBatch {batch_num} produced an empty trace file.", flush=True)
+    sim.run_batch(
+        verbose=False, batch_size=batch_size, dmem_batch_data=parsed_batch_dmem
+    )
 
-    except Exception as e:
-        print(f"\nBatch {batch_num} python exception: {e}", flush=True)
-    finally:
-        trace_hw.close()
-        if os.path.exists(trace_path):
-            os.remove(trace_path)
+    if not sim.leakage.rows:
+        print(f"\nBatch {batch_num} produced no leakage samples.", flush=True)
 
-    return batch_num, set_idx, local_stats
+    return sim.leakage
 
 
 def generate_reference_trace(
@@ -620,6 +737,24 @@ def main() -> int:
         default=[],
         help="Format: sym0,sym1:mode:size:hex_secret[:hex_modulus]",
     )
+    parser.add_argument(
+        "--max-order",
+        type=int,
+        choices=[1, 2, 3],
+        default=1,
+        help="Run univariate t-tests of each order up to this one",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of worker processes (default: number of CPUs minus 2)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Save results to this file as they arrive. If it exists, resume "
+        "the campaign that it holds.",
+    )
 
     args = parser.parse_args()
 
@@ -651,58 +786,57 @@ def main() -> int:
     # Generate the reference trace
     generate_reference_trace(args.simulator, args.elf, dwarf_map, gen_config)
 
-    accumulator = TVLAAccumulator()
-    max_threads = max(1, multiprocessing.cpu_count() - 2)
+    accumulator = TVLAAccumulator(args.max_order)
 
     BATCH_SIZE = 100
     num_fixed_batches = (args.num_experiments // 2) // BATCH_SIZE
     num_random_batches = (args.num_experiments // 2) // BATCH_SIZE
 
+    runner = CampaignRunner(
+        TVLAWorker,
+        (args.elf, BATCH_SIZE, gen_config, args.max_order),
+        run_experiment,
+        jobs=args.jobs,
+        checkpoint=args.checkpoint,
+        label=f"batches of {BATCH_SIZE} traces",
+    )
+
     print(
-        f"--- Starting Batched TVLA ({args.num_experiments} traces on {max_threads} cores) ---",
+        f"--- Starting Batched TVLA ({args.num_experiments} traces on {runner.jobs} cores) ---",
         flush=True,
     )
 
     batches = [0] * num_fixed_batches + [1] * num_random_batches
     random.shuffle(batches)
 
-    tasks = [
-        (args.simulator, args.elf, set_idx, i, BATCH_SIZE, gen_config)
-        for i, set_idx in enumerate(batches)
-    ]
+    tasks = [(i, set_idx) for i, set_idx in enumerate(batches)]
 
-    completed_traces = 0
+    def on_result(task: Tuple[int, int], sums: LeakageSums) -> None:
+        _, set_idx = task
+        accumulator.add_batch(set_idx, sums)
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_threads) as executor:
-        future_to_task = {executor.submit(run_experiment, task): task for task in tasks}
+    def on_error(task: Tuple[int, int], err: str) -> None:
+        print(f"\nBatch {task[0]} python exception: {err}", flush=True)
 
-        for future in concurrent.futures.as_completed(future_to_task):
-            completed_traces += BATCH_SIZE
-            print(
-                f"Completed {completed_traces}/{args.num_experiments} traces",
-                flush=True,
-            )
-
-            try:
-                batch_num, set_idx, local_stats = future.result()
-
-                for (pc, occ), (count, sums, sqs) in local_stats.items():
-                    accumulator.counts[pc][occ][set_idx] += count
-                    for i in range(NUM_MODELS):
-                        accumulator.sums[pc][occ][set_idx][i] += sums[i]
-                        accumulator.sum_sqs[pc][occ][set_idx][i] += sqs[i]
-
-            except Exception as e:
-                print(f"Process crashed: {e}", flush=True)
+    # The checkpoint holds the shuffled list of batches, so a resumed
+    # campaign runs the same mix of fixed and random batches. The key only
+    # covers the ELF and the arguments that change the accumulated sums, so
+    # a campaign can be resumed with a different --jobs or --t-threshold.
+    key = campaign_key(
+        [args.num_experiments, BATCH_SIZE, gen_config, args.max_order],
+        [args.elf],
+    )
+    runner.run(key, tasks, on_result, on_error)
 
     print("\n--- Analyzing T-Test Statistics ---", flush=True)
 
     n0, n1 = 0, 0
 
-    if accumulator.counts:
-        first_pc = sorted(accumulator.counts.keys())[0]
-        n0 = accumulator.counts[first_pc][0][0]
-        n1 = accumulator.counts[first_pc][0][1]
+    points = accumulator.points()
+    if points:
+        first_pc = points[0][0]
+        n0 = accumulator.count(first_pc, 0, 0)
+        n1 = accumulator.count(first_pc, 0, 1)
         print(
             f"Engine loaded {n0} fixed traces and {n1} random traces.",
             flush=True,
@@ -711,10 +845,10 @@ def main() -> int:
     leakages_found = 0
     max_t_score = 0.0
 
-    for pc in sorted(accumulator.counts.keys()):
-        for occ in accumulator.counts[pc].keys():
+    for pc, occ in points:
+        for order in range(1, args.max_order + 1):
             for model_idx in range(NUM_MODELS):
-                t_val = accumulator.compute_t_test(pc, occ, model_idx)
+                t_val = accumulator.compute_t_test(pc, occ, model_idx, order)
                 abs_t = abs(t_val)
 
                 if abs_t > max_t_score:
@@ -728,8 +862,9 @@ def main() -> int:
                         filepath, lineno = dwarf_map[pc]
                         dwarf_str = f"{os.path.basename(filepath)}:{lineno}"
 
+                    order_str = f"Order: {order} | " if args.max_order > 1 else ""
                     print(
-                        f"Leakage | PC: {hex(pc):<6} | Occ: {occ} | "
+                        f"Leakage | PC: {hex(pc):<6} | Occ: {occ} | {order_str}"
                         f"Model: {model_name:<8} | t-value: {t_val:>7.2f} | "
                         f"Source: {dwarf_str}",
                         flush=True,
@@ -0,0 +1,198 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''A persistent store of analysis results for OTBN programs
+
+The OTBN checkers (check_const_time, check_call_stack, check_loop and
+get_instruction_count_range) all decode an ELF file, build control graphs and
+then analyse them. An AnalysisDB keeps those results in a cache directory, so
+that the checkers can share them within a run and between runs:
+
+  - Decoded programs are keyed by a hash of the ELF file and the subroutines
+    that are replaced with NOPs.
+
+  - Control graphs are keyed by the program and the start symbol.
+
+  - Per-function results (instruction count ranges and information flow) are
+    keyed by a hash of the code that the function's control graph can reach
+    (see ControlGraph.fingerprint), so changing a routine only means that the
+    functions that reach it are analysed again.
+
+  - Whole-program check results are keyed by the program and the source of
+    the check.
+
+Every key also includes a hash of the analysis code and of the instruction
+database. The cache directory is $OTBN_ANALYSIS_DB_DIR if that is set (an
+empty value disables the cache) and otherwise "opentitan/otbn-analysis" in
+the user's cache directory.
+
+'''
+
+import hashlib
+import inspect
+import os
+import sys
+from functools import lru_cache
+from typing import (Callable, Dict, Optional, Sequence, Tuple, TypeVar,
+                    cast)
+
+from .check import CheckResult
+from .control_flow import (ControlGraph, program_control_graph,
+                           subroutine_control_graph)
+from .decode import OTBNProgram, decode_elf
+from .disk_cache import (hash_files, read_pickle, shared_fingerprint,
+                         user_cache_dir, write_pickle)
+from .information_flow_analysis import (ProgramIFlow, SubroutineIFlow,
+                                        get_program_iflow,
+                                        get_subroutine_iflow)
+from .insn_yaml import insns_fingerprint
+from .instruction_count_range import (program_insn_count_range,
+                                      subroutine_insn_count_range)
+
+CACHE_DIR_ENV = 'OTBN_ANALYSIS_DB_DIR'
+
+# Bump this if the format of a cache entry changes
+_CACHE_VERSION = 1
+
+T = TypeVar('T')
+
+
+def default_cache_dir() -> Optional[str]:
+    '''Return the cache directory to use if none is given (or None)'''
+    return user_cache_dir(CACHE_DIR_ENV, 'otbn-analysis')
+
+
+@lru_cache(maxsize=None)
+def _code_fingerprint() -> str:
+    '''A hash of the analysis code and the instruction database'''
+    key = (_CACHE_VERSION, sys.version, shared_fingerprint(),
+           insns_fingerprint())
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _source_fingerprint(path: str) -> str:
+    h = hashlib.sha256()
+    hash_files(h, [path])
+    return h.hexdigest()
+
+
+class ProgramAnalysis:
+    '''The analysis results for a decoded program
+
+    Objects of this class are made by AnalysisDB.open. Each method returns
+    the result of an analysis, loading it from the database if possible.
+
+    '''
+    def __init__(self, db: 'AnalysisDB', program: OTBNProgram,
+                 key: str) -> None:
+        self.db = db
+        self.program = program
+        self.key = key
+        self._graphs: Dict[Optional[str], ControlGraph] = {}
+
+    def control_graph(self, subroutine: Optional[str]) -> ControlGraph:
+        '''The control graph for subroutine (or the whole program if None)'''
+        graph = self._graphs.get(subroutine)
+        if graph is None:
+            if subroutine is None:
+                graph = self.db.get(
+                    'graph', (self.key, None),
+                    lambda: program_control_graph(self.program))
+            else:
+                name = subroutine
+                graph = self.db.get(
+                    'graph', (self.key, name),
+                    lambda: subroutine_control_graph(self.program, name))
+            self._graphs[subroutine] = graph
+        return graph
+
+    def insn_count_range(self,
+                         subroutine: Optional[str]) -> Tuple[int,
+                                                             Optional[int]]:
+        '''The instruction count range for subroutine (or the program)'''
+        graph = self.control_graph(subroutine)
+        key = (subroutine is None, graph.fingerprint(self.program))
+        if subroutine is None:
+            return self.db.get(
+                'count', key,
+                lambda: program_insn_count_range(self.program, graph))
+        name = subroutine
+        return self.db.get(
+            'count', key,
+            lambda: subroutine_insn_count_range(self.program, name, graph))
+
+    def subroutine_iflow(self, subroutine: str,
+                         constants: Dict[str, int]) -> SubroutineIFlow:
+        '''The information flow for subroutine (see get_subroutine_iflow)'''
+        return get_subroutine_iflow(self.program,
+                                    self.control_graph(subroutine),
+                                    subroutine, constants, self.db.cache_dir)
+
+    def program_iflow(self) -> ProgramIFlow:
+        '''The information flow for the program (see get_program_iflow)'''
+        return get_program_iflow(self.program, self.control_graph(None),
+                                 self.db.cache_dir)
+
+    def check(self,
+              checker: Callable[[OTBNProgram], CheckResult]) -> CheckResult:
+        '''The result of running checker on the whole program
+
+        The key for the result includes the source file that defines
+        checker, so editing the check invalidates its cached results.
+
+        '''
+        source = inspect.getsourcefile(checker)
+        key = (self.key, checker.__module__, checker.__qualname__,
+               _source_fingerprint(source) if source is not None else None)
+        return self.db.get('check', key, lambda: checker(self.program))
+
+
+class AnalysisDB:
+    '''A store of analysis results, in a cache directory if there is one'''
+
+    def __init__(self, cache_dir: Optional[str]) -> None:
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def from_env() -> 'AnalysisDB':
+        '''Make a database that uses the default directory (see above)'''
+        return AnalysisDB(default_cache_dir())
+
+    def get(self, kind: str, key: object, compute: Callable[[], T]) -> T:
+        '''Load the result for key, or compute and store it
+
+        The kind is used as a prefix for the name of the cache file. The
+        result of compute must be picklable and must not be None.
+
+        '''
+        if self.cache_dir is None:
+            return compute()
+
+        h = hashlib.sha256()
+        h.update(repr((_code_fingerprint(), kind, key)).encode('utf-8'))
+        path = os.path.join(self.cache_dir,
+                            '{}-{}.pickle'.format(kind, h.hexdigest()))
+
+        cached = read_pickle(path)
+        if cached is not None:
+            return cast(T, cached)
+
+        result = compute()
+        write_pickle(path, result)
+        return result
+
+    def open(self, elf_path: str,
+             nop_subfuncs: Sequence[str] = ()) -> ProgramAnalysis:
+        '''Decode the ELF file at elf_path (see decode_elf)'''
+        with open(elf_path, 'rb') as f:
+            elf_data = f.read()
+        h = hashlib.sha256()
+        h.update(repr(list(nop_subfuncs)).encode('utf-8') + b'\0')
+        h.update(elf_data)
+        key = h.hexdigest()
+
+        program = self.get('program', key,
+                           lambda: decode_elf(elf_path, list(nop_subfuncs)))
+        return ProgramAnalysis(self, program, key)
@@ -0,0 +1,288 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''A runner for simulation campaigns that are split into many tasks.
+
+This is used by the fault injection and TVLA campaigns. Each campaign
+provides a setup function, which is run once in each worker process (to load
+and decode the ELF file, for example), and a work function, which is given
+the result of the setup function and a task descriptor. Results are sent back
+to the parent process over the worker pool's pipes.
+
+If a checkpoint file is given, each result is appended to it as soon as it
+arrives. Running the campaign again with the same checkpoint file skips the
+tasks that have already been done, so a campaign that gets killed can carry
+on where it stopped.
+'''
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+import random
+import time
+import traceback
+from typing import (Any, BinaryIO, Callable, Dict, Generic, Iterable, List,
+                    Optional, Sequence, Tuple, TypeVar)
+
+S = TypeVar('S')  # Per-worker state, returned by the setup function.
+T = TypeVar('T')  # Task descriptor.
+R = TypeVar('R')  # Task result.
+
+# The state of a worker process, set up by _init_worker.
+_WORKER_STATE: Any = None
+_WORKER_FN: Optional[Callable[[Any, Any], Any]] = None
+
+
+def _init_worker(setup: Callable[..., Any],
+                 setup_args: Tuple[Any, ...],
+                 work: Callable[[Any, Any], Any]) -> None:
+    global _WORKER_STATE, _WORKER_FN
+    # Worker processes might be forked from the parent, in which case they
+    # would all start with the same random state.
+    random.seed()
+    _WORKER_STATE = setup(*setup_args)
+    _WORKER_FN = work
+
+
+def _run_task(item: Tuple[int, Any]) -> Tuple[int, bool, Any]:
+    '''Run a task in a worker process.
+
+    Returns (idx, ok, value). If ok is false, the task raised an exception
+    and value is the formatted traceback.
+
+    '''
+    idx, task = item
+    assert _WORKER_FN is not None
+    try:
+        return (idx, True, _WORKER_FN(_WORKER_STATE, task))
+    except Exception:
+        return (idx, False, traceback.format_exc())
+
+
+def campaign_key(parts: Iterable[Any], paths: Iterable[str] = ()) -> str:
+    '''Make a key that identifies a campaign for a checkpoint file.
+
+    parts should be the configuration of the campaign (anything with a
+    stable repr) and paths should be the input files (which are hashed).
+
+    '''
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(repr(part).encode('utf-8'))
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class Checkpoint:
+    '''The completed results of a campaign, saved to a file as it runs.
+
+    The file starts with a header that holds a key for the campaign (so that
+    we don't resume a different campaign by accident) and the list of tasks.
+    This is followed by a (task index, result) record for each completed
+    task. Everything is pickled and each record is flushed as it is written,
+    so a campaign that gets killed loses at most the record that it was
+    writing.
+
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[BinaryIO] = None
+        self._good_len = 0
+
+    def load(self, key: str) -> Optional[Tuple[List[Any], Dict[int, Any]]]:
+        '''Load a checkpoint file.
+
+        Returns None if there is no checkpoint (or it is too short to have a
+        complete header). Otherwise, returns (tasks, results), where results
+        maps task index to result. Raises a ValueError if the checkpoint is
+        for a different campaign.
+
+        '''
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        with f:
+            try:
+                header = pickle.load(f)
+            except Exception:
+                return None
+
+            if not isinstance(header, dict) or header.get('key') != key:
+                raise ValueError(f'Checkpoint file {self.path} is for a '
+                                 'different campaign. Delete it or pass a '
+                                 'different path to start a new campaign.')
+
+            tasks = header['tasks']
+            results = {}
+            self._good_len = f.tell()
+            while True:
+                # Stop at the end of the file or at a partly written record.
+                try:
+                    idx, result = pickle.load(f)
+                except Exception:
+                    break
+                results[idx] = result
+                self._good_len = f.tell()
+
+        return (tasks, results)
+
+    def open(self, key: str, tasks: List[Any], resume: bool) -> None:
+        '''Open the file for writing results.
+
+        If resume is true, the file was loaded with load() and we append
+        results to it, dropping any partly written record at the end.
+        Otherwise we start a new file.
+
+        '''
+        if resume:
+            self._file = open(self.path, 'r+b')
+            self._file.truncate(self._good_len)
+            self._file.seek(self._good_len)
+        else:
+            self._file = open(self.path, 'wb')
+            pickle.dump({'key': key, 'tasks': tasks}, self._file)
+        self._file.flush()
+
+    def add(self, idx: int, result: Any) -> None:
+        '''Record the result of a task'''
+        assert self._file is not None
+        pickle.dump((idx, result), self._file)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Progress:
+    '''Prints a progress line at most once every interval seconds'''
+    def __init__(self, label: str, total: int, done: int,
+                 interval: float) -> None:
+        self.label = label
+        self.total = total
+        self.done = done
+        self.interval = interval
+        self._start_done = done
+        self._start = time.monotonic()
+        self._last = self._start
+
+    def update(self) -> None:
+        self.done += 1
+        now = time.monotonic()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            self.report(now)
+
+    def report(self, now: float) -> None:
+        elapsed = now - self._start
+        msg = (f'Progress: {self.done}/{self.total} {self.label} '
+               f'({elapsed:.0f}s elapsed')
+        new_done = self.done - self._start_done
+        if new_done and self.done < self.total:
+            eta = elapsed * (self.total - self.done) / new_done
+            msg += f', about {eta:.0f}s left'
+        print(msg + ')', flush=True)
+
+
+class CampaignRunner(Generic[S, T, R]):
+    '''Runs the tasks of a campaign in a pool of worker processes.
+
+    setup(*setup_args) is called once in each worker and its result is
+    passed to each call of work(state, task) in that worker. Both functions
+    must be picklable (defined at module level). If jobs is 1, everything
+    runs in the current process, which can be easier to debug.
+
+    Tasks are sent to workers in groups of chunksize. If a task raises an
+    exception, the traceback is passed to on_error (and the task isn't
+    recorded in the checkpoint, so it will run again if the campaign is
+    resumed).
+
+    '''
+    def __init__(self,
+                 setup: Callable[..., S],
+                 setup_args: Tuple[Any, ...],
+                 work: Callable[[S, T], R],
+                 jobs: Optional[int] = None,
+                 chunksize: int = 1,
+                 checkpoint: Optional[str] = None,
+                 label: str = 'tasks',
+                 progress_interval: float = 10.0) -> None:
+        self.setup = setup
+        self.setup_args = setup_args
+        self.work = work
+        self.jobs = jobs or max(1, (os.cpu_count() or 1) - 2)
+        self.chunksize = chunksize
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+        self.label = label
+        self.progress_interval = progress_interval
+
+    def _iter_results(self,
+                      todo: List[Tuple[int, T]]) -> Iterable[Tuple[int, bool,
+                                                                   Any]]:
+        if self.jobs == 1:
+            _init_worker(self.setup, self.setup_args, self.work)
+            for item in todo:
+                yield _run_task(item)
+            return
+
+        with multiprocessing.Pool(self.jobs,
+                                  initializer=_init_worker,
+                                  initargs=(self.setup, self.setup_args,
+                                            self.work)) as pool:
+            yield from pool.imap_unordered(_run_task, todo, self.chunksize)
+
+    def run(self,
+            key: str,
+            tasks: Sequence[T],
+            on_result: Callable[[T, R], None],
+            on_error: Optional[Callable[[T, str], None]] = None) -> None:
+        '''Run the campaign, calling on_result for each completed task.
+
+        key identifies the campaign (see campaign_key). If we are resuming
+        from a checkpoint, the task list stored there replaces tasks, and
+        on_result is called for the saved results first.
+
+        '''
+        task_list = list(tasks)
+        done: Dict[int, R] = {}
+        resume = False
+        if self.checkpoint is not None:
+            loaded = self.checkpoint.load(key)
+            if loaded is not None:
+                task_list, done = loaded
+                resume = True
+                print(f'Resuming from {self.checkpoint.path}: '
+                      f'{len(done)}/{len(task_list)} {self.label} '
+                      'already done.', flush=True)
+            self.checkpoint.open(key, task_list, resume)
+
+        try:
+            for idx in sorted(done):
+                on_result(task_list[idx], done[idx])
+
+            todo = [(idx, task) for idx, task in enumerate(task_list)
+                    if idx not in done]
+            progress = _Progress(self.label, len(task_list), len(done),
+                                 self.progress_interval)
+            for idx, ok, value in self._iter_results(todo):
+                task = task_list[idx]
+                if ok:
+                    if self.checkpoint is not None:
+                        self.checkpoint.add(idx, value)
+                    on_result(task, value)
+                elif on_error is not None:
+                    on_error(task, value)
+                else:
+                    print(f'Task {idx} crashed unexpectedly:\n{value}',
+                          flush=True)
+                progress.update()
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
@@ -3,7 +3,6 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-from copy import deepcopy
 from typing import Any, Dict, Iterable, List, Optional
 
 from .insn_yaml import Insn
@@ -47,9 +46,14 @@ class ConstantContext:
     def __contains__(self, gpr: str) -> bool:
         return gpr in self.values
 
+    def copy(self) -> 'ConstantContext':
+        '''Returns a copy of the context.'''
+        # The values are ints, so copying the dictionary is enough.
+        return ConstantContext(self.values)
+
     def __deepcopy__(self, memo: Optional[Dict[int,
                                                Any]]) -> 'ConstantContext':
-        return ConstantContext(deepcopy(self.values, memo))
+        return self.copy()
 
     def includes(self, other: 'ConstantContext') -> bool:
         '''Returns true iff other is a restriction of self.'''
@@ -3,6 +3,7 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
 from typing import Dict, List, Set, Tuple
 
 from .decode import OTBNProgram
@@ -175,6 +176,24 @@ class ControlGraph:
                     out.add(edge.pc)
         return out
 
+    def fingerprint(self, program: OTBNProgram) -> str:
+        '''Returns a hash of the graph and the code in its sections.
+
+        Analyses that only look at the code reachable from `start` give the
+        same result for graphs with the same fingerprint, even if other parts
+        of the program have changed.
+        '''
+        h = hashlib.sha256()
+        h.update(repr(self.start).encode('utf-8'))
+        for pc in sorted(self.graph):
+            sec, edges = self.graph[pc]
+            code = [(insn_pc, program.get_insn(insn_pc).mnemonic,
+                     sorted(program.get_operands(insn_pc).items()))
+                    for insn_pc in sec]
+            h.update(repr((sec.start, sec.end, code,
+                           [edge.pretty() for edge in edges])).encode('utf-8'))
+        return h.hexdigest()
+
     def _pretty_lines(self,
                       program: OTBNProgram,
                       entry_pc: int,
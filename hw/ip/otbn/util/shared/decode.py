@@ -5,7 +5,7 @@
 
 import struct
 import sys
-from typing import Dict, List
+from typing import Any, Dict, List, Tuple
 
 from shared.elf import read_elf
 from shared.insn_yaml import Insn, load_insns_yaml
@@ -55,6 +55,9 @@ class OTBNProgram:
                     nop_ranges.append((start_addr, pc))
                     break
 
+        mnems = dict(zip(insns.keys(),
+                         INSNS_FILE.decode_many(insns.values())))
+
         self.insns = {}
         for pc, opcode in insns.items():
             # Check if PC lies within one of the NOP ranges (equal to or after
@@ -69,7 +72,7 @@ class OTBNProgram:
                 insn = INSNS_FILE.mnemonic_to_insn["addi"]
                 enc_vals = {'imm': 0, 'grs1': 0, 'grd': 0}
             else:
-                mnem = INSNS_FILE.mnem_for_word(opcode)
+                mnem = mnems[pc]
                 if mnem is None:
                     raise ValueError(f'No mnemonic for opcode {opcode:#08x}')
 
@@ -80,6 +83,20 @@ class OTBNProgram:
             op_vals = insn.enc_vals_to_op_vals(pc, enc_vals)
             self.insns[pc] = (insn, op_vals)
 
+    def __getstate__(self) -> Dict[str, object]:
+        # Pickle instructions by mnemonic, rather than pickling a copy of
+        # their descriptions from the instruction database.
+        state = self.__dict__.copy()
+        state['insns'] = {pc: (insn.mnemonic, op_vals)
+                          for pc, (insn, op_vals) in self.insns.items()}
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        by_mnem: Dict[int, Tuple[str, Dict[str, int]]] = state.pop('insns')
+        self.__dict__.update(state)
+        self.insns = {pc: (INSNS_FILE.mnemonic_to_insn[mnem], op_vals)
+                      for pc, (mnem, op_vals) in by_mnem.items()}
+
     def min_pc(self) -> int:
         return min(self.insns.keys())
 
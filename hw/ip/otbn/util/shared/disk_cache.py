@@ -0,0 +1,80 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''Helpers for the on-disk caches used by the OTBN tools
+
+Each cache is a directory of pickle files, named after a hash of everything
+that went into computing the object that they hold. Cache files are written
+atomically, so several tools can share a directory, and a file that can't be
+loaded is treated as missing.
+
+Finding the cache directory and writing files atomically use the helpers in
+util/basegen/cache.py, which the generators in util/ share. They are
+re-exported here, because this package is what puts util/ on the path for
+the OTBN tools.
+
+'''
+
+import hashlib
+import os
+import pickle
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+# Explicitly re-exported (see above)
+from basegen.cache import user_cache_dir as user_cache_dir  # noqa: F401
+from basegen.cache import write_atomic as write_atomic
+
+
+def hash_files(h: 'hashlib._Hash', paths: Iterable[str]) -> None:
+    '''Add the names and contents of the files at paths to h'''
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        h.update(os.path.basename(path).encode('utf-8') + b'\0')
+        h.update(hashlib.sha256(data).digest())
+
+
+def dir_files(dirname: str, suffix: str) -> List[str]:
+    '''Return the paths of the files in dirname with the given suffix'''
+    return [os.path.join(dirname, name)
+            for name in sorted(os.listdir(dirname))
+            if name.endswith(suffix)]
+
+
+@lru_cache(maxsize=None)
+def shared_fingerprint() -> str:
+    '''A hash of the Python sources in this directory
+
+    Cache keys should include this, so that changing the code that computes
+    a cached object invalidates the cache.
+
+    '''
+    h = hashlib.sha256()
+    hash_files(h, dir_files(os.path.dirname(os.path.abspath(__file__)),
+                            '.py'))
+    return h.hexdigest()
+
+
+def read_pickle(path: str) -> Optional[object]:
+    '''Load the object in the cache file at path
+
+    Returns None if the file doesn't exist or can't be loaded.
+
+    '''
+    try:
+        with open(path, 'rb') as f:
+            obj: object = pickle.load(f)
+    except Exception:
+        return None
+    return obj
+
+
+def write_pickle(path: str, obj: object) -> bool:
+    '''Write obj to a cache file at path, atomically (see write_atomic)'''
+    try:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return False
+    return write_atomic(path, data)
@@ -2,8 +2,8 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-from copy import deepcopy
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import (AbstractSet, Any, Dict, FrozenSet, Iterable, List, Mapping,
+                    Optional, Sequence, Set, Tuple)
 
 from serialize.parse_helpers import check_keys, check_list, check_str
 
@@ -26,9 +26,17 @@ class InformationFlowGraph:
     Note that it is possible for a sink node to be mapped to an empty set; that
     means the sink is overwritten with a constant value, and information is not
     flowing to it from any nodes (including its own previous value).
+
+    The source sets are frozensets, so graphs can share them. Operations that
+    change a graph replace its source sets rather than modifying them, which
+    means that copying a graph only needs to copy the `flow` dictionary.
     '''
-    def __init__(self, flow: Dict[str, Set[str]], exists: bool = True):
-        self.flow = flow
+    def __init__(self, flow: Mapping[str, AbstractSet[str]],
+                 exists: bool = True):
+        # Note that frozenset() of a frozenset doesn't make a copy.
+        self.flow: Dict[str, FrozenSet[str]] = {
+            sink: frozenset(sources) for sink, sources in flow.items()
+        }
 
         # Should not be modified directly. See the nonexistent() method
         # documentation for details of what this flag means.
@@ -66,7 +74,13 @@ class InformationFlowGraph:
         '''
         return InformationFlowGraph({}, False)
 
-    def sources(self, sink: str) -> Set[str]:
+    def copy(self) -> 'InformationFlowGraph':
+        '''Returns a copy of the graph (sharing the source sets).'''
+        out = InformationFlowGraph({}, self.exists)
+        out.flow = self.flow.copy()
+        return out
+
+    def sources(self, sink: str) -> AbstractSet[str]:
         '''Returns all sources for the given sink.'''
         # if the sink does not appear, it is unmodified, meaning its only
         # source is itself
@@ -107,8 +121,9 @@ class InformationFlowGraph:
 
         If the node is not a source in the graph, does nothing.
         '''
-        for sources in self.flow.values():
-            sources.discard(node)
+        for sink, sources in self.flow.items():
+            if node in sources:
+                self.flow[sink] = sources - {node}
 
     def remove_sink(self, node: str) -> None:
         '''Removes the node from the graph anywhere it appears as a sink.
@@ -144,17 +159,19 @@ class InformationFlowGraph:
             # Updating a nonexistent graph with another graph should return the
             # other graph; since we need to modify self, we change this graph's
             # flow to match other's.
-            self.flow = deepcopy(other.flow)
+            self.flow = other.flow.copy()
             self.exists = other.exists
             return
 
         for sink, sources in other.flow.items():
-            if sink not in self.flow:
+            old_sources = self.flow.get(sink)
+            if old_sources is None:
                 # implicitly, a non-updated value depends only on itself (NOT
                 # an empty set, which would indicate a value that is
                 # overwritten with a constant)
-                self.flow[sink] = {sink}
-            self.flow[sink].update(sources)
+                self.flow[sink] = sources | {sink}
+            elif not sources <= old_sources:
+                self.flow[sink] = old_sources | sources
 
         return
 
@@ -176,7 +193,7 @@ class InformationFlowGraph:
             f     -> d
             a,b,d -> c
 
-        Defensively copies all source sets for the new graph.
+        The new graph shares source sets with self and other where it can.
         '''
         if not self.exists or not other.exists:
             # If either this or the other graph is nonexistent, then the
@@ -185,27 +202,30 @@ class InformationFlowGraph:
 
         flow = {}
         for sink, sources in other.flow.items():
-            new_sources = set()
+            if not any(source in self.flow for source in sources):
+                # None of the sources is a sink in self's flow, so they all
+                # stay constant.
+                flow[sink] = sources
+                continue
+            new_sources: Set[str] = set()
             for source in sources:
-                if source in self.flow:
-                    new_sources.update(self.flow[source])
-                else:
-                    # source is not a sink in self's flow; assume it stays
-                    # constant
-                    new_sources.add(source)
-            flow[sink] = new_sources
+                # If source is not a sink in self's flow, it stays constant.
+                new_sources.update(self.flow.get(source, (source,)))
+            flow[sink] = frozenset(new_sources)
 
         for sink, sources in self.flow.items():
             if sink not in flow:
                 # sink is not updated in other's flow
-                flow[sink] = sources.copy()
+                flow[sink] = sources
 
-        return InformationFlowGraph(flow)
+        out = InformationFlowGraph({})
+        out.flow = flow
+        return out
 
     def __deepcopy__(self,
                      memo: Optional[Dict[int, Any]]) -> 'InformationFlowGraph':
-        flow = deepcopy(self.flow, memo)
-        return InformationFlowGraph(flow, self.exists)
+        # The source sets are immutable, so they can be shared.
+        return self.copy()
 
     def loop(self, max_iterations: int = 1000) -> 'InformationFlowGraph':
         '''Returns graph representing all possible repetitions of seq() of this
@@ -236,7 +256,7 @@ class InformationFlowGraph:
         graph = InformationFlowGraph.empty()
         ctr = 0
         while (max_iterations is None or ctr < max_iterations):
-            old = deepcopy(graph)
+            old = graph.copy()
             graph.update(graph.seq(self))
             if (old == graph):
                 # Graph has stabilized; further iterations will not change it.
@@ -3,16 +3,18 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-from copy import deepcopy
+import hashlib
+import os
+import sys
 from typing import Dict, List, Optional, Set, Tuple
 
-from .cache import Cache, CacheEntry
+from . import disk_cache
 from .constants import ConstantContext, get_op_val_str
 from .control_flow import (ControlLoc, ControlGraph, Cycle, Ecall,
                            ImemEnd, LoopStart, Ret)
 from .decode import OTBNProgram
 from .information_flow import InformationFlowGraph
-from .insn_yaml import Insn
+from .insn_yaml import Insn, insns_fingerprint
 
 # Calls to _get_iflow return results in the form of a tuple with entries:
 #   used constants: a set containing the names of input constants the
@@ -39,28 +41,57 @@ IFlowResult = Tuple[Set[str], InformationFlowGraph, InformationFlowGraph,
                     Dict[str, Set[int]]]
 
 
-class IFlowCacheEntry(CacheEntry[ConstantContext, IFlowResult]):
-    '''Represents an entry in the cache for _get_iflow.
-
-    The key for the cache entry is the values of certain constants in the input
-    `constants` dictionary for the _get_iflow call that produced the cached
-    result. Only constants that were actually used in the process of computing
-    the result are stored in the key; if another call to _get_iflow has the
-    same values for those constants but different values for others, the result
-    should not change.
-    '''
-    def is_match(self, constants: ConstantContext) -> bool:
-        return constants.includes(self.key)
-
-
-class IFlowCache(Cache[int, ConstantContext, IFlowResult]):
+class IFlowCache:
     '''Represents the cache for _get_iflow.
 
-    The index of the cache is the start PC for the call to _get_iflow. If this
-    index and the values of the constants used in the call match a new call,
-    the cached result is returned.
+    The index of the cache is the start PC for the call to _get_iflow. The key
+    for each entry is the values of certain constants in the input `constants`
+    dictionary for the _get_iflow call that produced the cached result. Only
+    constants that were actually used in the process of computing the result
+    are stored in the key; if another call to _get_iflow has the same start PC
+    and the same values for those constants but different values for others,
+    the result should not change.
+
+    For each PC, entries are grouped by the names of the constants in their
+    keys. Each group is a dictionary keyed by the constants' values, so a
+    lookup needs one dictionary lookup per group, rather than a comparison
+    with every entry for the PC.
     '''
-    pass
+    def __init__(self) -> None:
+        # PC -> constant names -> constant values -> (entry number, result).
+        # The entry number is used to return the oldest matching entry if
+        # there is more than one.
+        self.entries: Dict[int,
+                           Dict[Tuple[str, ...],
+                                Dict[Tuple[int, ...],
+                                     Tuple[int, IFlowResult]]]] = {}
+        self._num_entries = 0
+
+    def lookup(self, pc: int,
+               constants: ConstantContext) -> Optional[IFlowResult]:
+        best = None
+        for names, by_values in self.entries.get(pc, {}).items():
+            values = []
+            for name in names:
+                value = constants.get(name)
+                if value is None:
+                    break
+                values.append(value)
+            else:
+                entry = by_values.get(tuple(values))
+                if entry is not None and (best is None or entry[0] < best[0]):
+                    best = entry
+        return None if best is None else best[1]
+
+    def add(self, pc: int, key: ConstantContext, result: IFlowResult) -> None:
+        # Only add if there's no matching entry already
+        if self.lookup(pc, key) is not None:
+            return
+        names = tuple(sorted(key.values))
+        values = tuple(key.values[name] for name in names)
+        by_values = self.entries.setdefault(pc, {}).setdefault(names, {})
+        by_values[values] = (self._num_entries, result)
+        self._num_entries += 1
 
 
 # The information flow of a subroutine is represented as a tuple whose entries
@@ -74,6 +105,13 @@ SubroutineIFlow = Tuple[InformationFlowGraph, InformationFlowGraph,
 # at the start, we're not expecting any return paths!
 ProgramIFlow = Tuple[InformationFlowGraph, Dict[str, Set[int]]]
 
+# Subroutine and program information flow can be stored in a cache directory,
+# in a file named after a hash of the code that the control graph can reach
+# (see _iflow_cache_path).
+
+# Bump this if the format of a cache file changes
+_IFLOW_CACHE_VERSION = 1
+
 
 def _build_iflow_insn(
         insn: Insn, op_vals: Dict[str, int], pc: int,
@@ -198,7 +236,7 @@ def _get_iflow_cache_update(pc: int, constants: ConstantContext,
         assert value is not None
         used_constant_values.set(name, value)
 
-    cache.add(pc, IFlowCacheEntry(used_constant_values, result))
+    cache.add(pc, used_constant_values, result)
 
     return
 
@@ -290,7 +328,7 @@ def _get_iflow(program: OTBNProgram, graph: ControlGraph, start_pc: int,
     if cached is not None:
         return cached
 
-    constants = deepcopy(start_constants)
+    constants = start_constants.copy()
 
     # The combined information flow for all paths leading to the end of the
     # subroutine (i.e. a RET, not counting RETS that happen after jumps within
@@ -439,7 +477,7 @@ def _get_iflow(program: OTBNProgram, graph: ControlGraph, start_pc: int,
                                 cache)
 
             # Defensively copy constants so they don't cross between branches
-            local_constants = deepcopy(constants)
+            local_constants = constants.copy()
             rec_return_iflow = _get_iflow_update_state(result, iflow,
                                                        program_end_iflow,
                                                        used_constants,
@@ -529,10 +567,31 @@ def _get_iflow(program: OTBNProgram, graph: ControlGraph, start_pc: int,
     return out
 
 
+def _iflow_cache_path(cache_dir: str, program: OTBNProgram,
+                      graph: ControlGraph, start_pc: int,
+                      start_constants: Dict[str, int]) -> str:
+    '''Return the path of the cache file for information flow from start_pc.
+
+    The information flow only depends on the instructions that the control
+    graph can reach (and the start PC and constants), so the hash covers
+    those rather than the whole program. Changing a subroutine doesn't
+    invalidate the cached results for subroutines that don't call it. The
+    information flow of each instruction comes from the instruction database,
+    so the hash also covers that.
+    '''
+    h = hashlib.sha256()
+    h.update(repr((_IFLOW_CACHE_VERSION, sys.version,
+                   disk_cache.shared_fingerprint(), insns_fingerprint(),
+                   start_pc, sorted(start_constants.items()),
+                   graph.fingerprint(program))).encode('utf-8'))
+    return os.path.join(cache_dir, 'iflow-{}.pickle'.format(h.hexdigest()))
+
+
 def get_subroutine_iflow(program: OTBNProgram,
                          graph: ControlGraph,
                          subroutine_name: str,
-                         start_constants: Dict[str, int]) -> SubroutineIFlow:
+                         start_constants: Dict[str, int],
+                         cache_dir: Optional[str] = None) -> SubroutineIFlow:
     '''Gets the information-flow graphs for the subroutine.
 
     Returns three items:
@@ -543,13 +602,35 @@ def get_subroutine_iflow(program: OTBNProgram,
        paths)
     3. The information-flow nodes whose values at the start of the subroutine
        influence its control flow.
+
+    If cache_dir is not None, the result is loaded from (or stored in) a cache
+    file in that directory.
     '''
     if 'x0' in start_constants and start_constants['x0'] != 0:
         raise ValueError('The x0 register is always 0; cannot require '
                          f'x0={start_constants["x0"]}')
     start_constants['x0'] = 0
-    constants = ConstantContext(start_constants)
     start_pc = program.get_pc_at_symbol(subroutine_name)
+
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = _iflow_cache_path(cache_dir, program, graph, start_pc,
+                                       start_constants)
+        cached = disk_cache.read_pickle(cache_path)
+        if isinstance(cached, tuple) and len(cached) == 3:
+            return cached
+
+    result = _get_subroutine_iflow(program, graph, start_pc, start_constants)
+    if cache_path is not None:
+        disk_cache.write_pickle(cache_path, result)
+    return result
+
+
+def _get_subroutine_iflow(program: OTBNProgram,
+                          graph: ControlGraph,
+                          start_pc: int,
+                          start_constants: Dict[str, int]) -> SubroutineIFlow:
+    constants = ConstantContext(start_constants)
     _, ret_iflow, end_iflow, _, cycles, control_deps = _get_iflow(
         program, graph, start_pc, constants, None, IFlowCache())
     if cycles:
@@ -565,7 +646,8 @@ def get_subroutine_iflow(program: OTBNProgram,
 
 
 def get_program_iflow(program: OTBNProgram,
-                      graph: ControlGraph) -> ProgramIFlow:
+                      graph: ControlGraph,
+                      cache_dir: Optional[str] = None) -> ProgramIFlow:
     '''Gets the information-flow graph for the whole program.
 
     Returns two items:
@@ -573,7 +655,26 @@ def get_program_iflow(program: OTBNProgram,
        program (e.g. ECALL or the end of IMEM)
     2. The information-flow nodes whose values at the start of the subroutine
        influence its control flow.
+
+    If cache_dir is not None, the result is loaded from (or stored in) a cache
+    file in that directory.
     '''
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = _iflow_cache_path(cache_dir, program, graph,
+                                       program.min_pc(), {})
+        cached = disk_cache.read_pickle(cache_path)
+        if isinstance(cached, tuple) and len(cached) == 2:
+            return cached
+
+    result = _get_program_iflow(program, graph)
+    if cache_path is not None:
+        disk_cache.write_pickle(cache_path, result)
+    return result
+
+
+def _get_program_iflow(program: OTBNProgram,
+                       graph: ControlGraph) -> ProgramIFlow:
     _, ret_iflow, end_iflow, _, cycles, control_deps = _get_iflow(
         program, graph, program.min_pc(), ConstantContext.empty(), None,
         IFlowCache())
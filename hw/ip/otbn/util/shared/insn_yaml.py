@@ -7,12 +7,13 @@
 import itertools
 import os
 import re
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple, cast
 
 from serialize.parse_helpers import (check_keys, check_str, check_bool,
                                      check_list, index_list, get_optional_str,
                                      load_yaml)
 
+from . import disk_cache, insns_cache
 from .encoding import Encoding
 from .encoding_scheme import EncSchemes
 from .information_flow import InsnInformationFlow
@@ -110,8 +111,11 @@ class Insn:
             self.syntax = InsnSyntax.from_list([op.name
                                                 for op in self.operands])
 
+        # The regex is only needed by the assembler, so it is compiled on
+        # first use (see the asm_pattern property).
         pattern, op_to_grp = self.syntax.asm_pattern()
-        self.asm_pattern = re.compile(pattern)
+        self.asm_pattern_str = pattern
+        self._asm_pattern: Optional[Pattern[str]] = None
         self.pattern_op_to_grp = op_to_grp
 
         # Make sure we have exactly the operands we expect.
@@ -170,6 +174,20 @@ class Insn:
         self.iflow = InsnInformationFlow.from_yaml(yd.get('iflow', None),
                                                    iflow_what, self.operands)
 
+    @property
+    def asm_pattern(self) -> Pattern[str]:
+        '''The compiled regex that matches this instruction's operands'''
+        if self._asm_pattern is None:
+            self._asm_pattern = re.compile(self.asm_pattern_str)
+        return self._asm_pattern
+
+    def __getstate__(self) -> Dict[str, object]:
+        # Don't pickle the compiled regex: unpickling recompiles it, which
+        # would make loading an InsnsFile from a cache much slower.
+        state = self.__dict__.copy()
+        state['_asm_pattern'] = None
+        return state
+
     def enc_vals_to_op_vals(self,
                             cur_pc: int,
                             enc_vals: Dict[str, int]) -> Dict[str, int]:
@@ -316,36 +334,44 @@ class InsnsFile:
         self.mnemonic_to_insn = index_list('insns', self.insns,
                                            lambda insn: insn.mnemonic.lower())
 
-        masks_exc, ambiguities = self._get_masks()
-        if ambiguities:
-            raise ValueError('Ambiguous instruction encodings: ' +
-                             ', '.join(ambiguities))
-
-        self._masks = masks_exc
+        self._masks = self._get_masks()
+        self._decoder = _DecodeNode.build(
+            [(mnem, m0, m1) for mnem, (m0, m1) in self._masks.items()], 0)
 
     def grouped_insns(self) -> List[Tuple[InsnGroup, List[Insn]]]:
         '''Return the instructions in groups'''
         return [(grp, grp.insns) for grp in self.groups.groups]
 
-    def _get_masks(self) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
-        '''Generate a list of zeros/ones masks and do ambiguity checks
+    def _get_masks(self) -> Dict[str, Tuple[int, int]]:
+        '''Generate a dictionary of zeros/ones masks
 
-        Returns a pair (masks, ambiguities). Masks is keyed by instruction
-        mnemonic. Its elements are pairs (m0, m1) where m0 is the bits that are
-        always zero for this instruction's in the encoding and m1 is the bits
-        that are always one. (Bits that can be either are not set in m0 or m1).
-
-        ambiguities is a list of error messages describing ambiguities in the
-        encoding. Unless something has gone wrong, it should be empty.
+        The result is keyed by instruction mnemonic. Its elements are pairs
+        (m0, m1) where m0 is the bits that are always zero for this
+        instruction's in the encoding and m1 is the bits that are always one.
+        (Bits that can be either are not set in m0 or m1).
 
         '''
-        masks_inc = {}
         masks_exc = {}
         for insn in self.insns:
             if insn.encoding is not None:
                 m0, m1 = insn.encoding.get_masks()
-                masks_inc[insn.mnemonic] = (m0, m1)
                 masks_exc[insn.mnemonic] = (m0 & ~m1, m1 & ~m0)
+        return masks_exc
+
+    def find_ambiguities(self) -> List[str]:
+        '''Check every pair of instructions for ambiguous encodings
+
+        Returns a list of error messages describing ambiguities in the
+        encoding. Unless something has gone wrong, it should be empty. This
+        is a comparison of every pair of instructions, so it isn't run when
+        loading the file. Instead, it is checked by build_insns_cache.py and
+        by the tests.
+
+        '''
+        masks_inc = {}
+        for insn in self.insns:
+            if insn.encoding is not None:
+                masks_inc[insn.mnemonic] = insn.encoding.get_masks()
 
         ambiguities = []
         for mnem0, mnem1 in itertools.combinations(masks_inc.keys(), 2):
@@ -366,7 +392,7 @@ class InsnsFile:
                                    'both match bit pattern {:#010x}'
                                    .format(mnem0, mnem1, m1 & ~m0))
 
-        return (masks_exc, ambiguities)
+        return ambiguities
 
     def mnem_for_word(self, word: int) -> Optional[str]:
         '''Find the instruction that could be encoded as word
@@ -375,7 +401,7 @@ class InsnsFile:
 
         '''
         ret = None
-        for mnem, (m0, m1) in self._masks.items():
+        for mnem, m0, m1 in self._decoder.candidates(word):
             # If any bit is set that should be zero or if any bit is clear that
             # should be one, ignore this instruction.
             if word & m0 or (~ word) & m1:
@@ -387,6 +413,72 @@ class InsnsFile:
 
         return ret
 
+    def decode_many(self, words: Iterable[int]) -> List[Optional[str]]:
+        '''Find the instruction for each of words
+
+        This is equivalent to calling mnem_for_word on each word, but only
+        decodes each distinct word once.
+
+        '''
+        seen: Dict[int, Optional[str]] = {}
+        ret = []
+        for word in words:
+            if word in seen:
+                mnem = seen[word]
+            else:
+                mnem = self.mnem_for_word(word)
+                seen[word] = mnem
+            ret.append(mnem)
+        return ret
+
+
+class _DecodeNode:
+    '''A node in the decision tree that InsnsFile uses to decode words
+
+    An inner node looks at the bits of the word in mask (which are fixed in
+    the encoding of every instruction below the node) and picks a child from
+    their value. The root looks at the major opcode, and its children then
+    look at the funct fields (or whatever else is left to tell instructions
+    apart). A leaf has a short list of (mnemonic, m0, m1) triples for
+    instructions that still need checking against the full masks.
+
+    '''
+    def __init__(self,
+                 mask: int,
+                 children: Dict[int, '_DecodeNode'],
+                 leaf: List[Tuple[str, int, int]]) -> None:
+        self.mask = mask
+        self.children = children
+        self.leaf = leaf
+
+    @staticmethod
+    def build(insns: List[Tuple[str, int, int]], used: int) -> '_DecodeNode':
+        '''Build a tree for insns, given that the bits in used are known'''
+        mask = ((1 << 32) - 1) & ~used
+        for _, m0, m1 in insns:
+            mask &= m0 | m1
+
+        if len(insns) <= 1 or not mask:
+            return _DecodeNode(0, {}, insns)
+
+        groups: Dict[int, List[Tuple[str, int, int]]] = {}
+        for insn in insns:
+            groups.setdefault(insn[2] & mask, []).append(insn)
+
+        children = {value: _DecodeNode.build(grp, used | mask)
+                    for value, grp in groups.items()}
+        return _DecodeNode(mask, children, [])
+
+    def candidates(self, word: int) -> List[Tuple[str, int, int]]:
+        '''Return the instructions that might be encoded as word'''
+        node = self
+        while node.children:
+            child = node.children.get(word & node.mask)
+            if child is None:
+                return []
+            node = child
+        return node.leaf
+
 
 def load_file(path: str, isrs: Optional[IsrMaps]) -> InsnsFile:
     '''Load the YAML file at path.
@@ -420,23 +512,95 @@ def make_isr_dict(path: str) -> IsrMap:
 _DEFAULT_INSNS_FILE: Optional[InsnsFile] = None
 
 
-def load_insns_yaml() -> InsnsFile:
+def _data_path() -> str:
+    dirname = os.path.dirname(__file__)
+    return os.path.normpath(os.path.join(dirname, '..', '..', 'data'))
+
+
+def _parse_insns_yaml(data_path: str) -> InsnsFile:
+    csrs = make_isr_dict(os.path.join(data_path, 'csr.yml'))
+    wsrs = make_isr_dict(os.path.join(data_path, 'wsr.yml'))
+    return load_file(os.path.join(data_path, 'insns.yml'),
+                     IsrMaps(csrs, wsrs))
+
+
+def load_insns_yaml(cache_dir: Optional[str] = None) -> InsnsFile:
     '''Load the insns.yml file from its default location.
 
     Caches its result. Raises a RuntimeError on syntax or schema error.
 
+    The parsed file is also saved to (or loaded from) a cache directory, which
+    is cache_dir if that is not None and otherwise the default from
+    insns_cache.default_cache_dir.
+
     '''
     global _DEFAULT_INSNS_FILE
     if _DEFAULT_INSNS_FILE is not None:
         return _DEFAULT_INSNS_FILE
 
-    dirname = os.path.dirname(__file__)
-    data_path = os.path.normpath(os.path.join(dirname, '..', '..', 'data'))
+    data_path = _data_path()
+    if cache_dir is None:
+        cache_dir = insns_cache.default_cache_dir()
+    entry_path = (insns_cache.cache_path(cache_dir, data_path)
+                  if cache_dir is not None else None)
 
-    csrs = make_isr_dict(os.path.join(data_path, 'csr.yml'))
-    wsrs = make_isr_dict(os.path.join(data_path, 'wsr.yml'))
+    if entry_path is not None:
+        cached = disk_cache.read_pickle(entry_path)
+        if isinstance(cached, InsnsFile):
+            _DEFAULT_INSNS_FILE = cached
+            return cached
 
-    _DEFAULT_INSNS_FILE = load_file(os.path.join(data_path, 'insns.yml'),
-                                    IsrMaps(csrs, wsrs))
+    _DEFAULT_INSNS_FILE = _parse_insns_yaml(data_path)
+    if entry_path is not None:
+        disk_cache.write_pickle(entry_path, _DEFAULT_INSNS_FILE)
 
     return _DEFAULT_INSNS_FILE
+
+
+def insns_fingerprint() -> str:
+    '''Return a hash of the sources of the instruction database
+
+    See insns_cache.fingerprint.
+
+    '''
+    return insns_cache.fingerprint(_data_path())
+
+
+def check_insns_cache(cache_dir: str) -> List[str]:
+    '''Compare the cached instruction database with a fresh load
+
+    Returns a list of problems. This is empty if there is a cache file in
+    cache_dir for the current YAML files and it matches what we get from
+    parsing them again.
+
+    '''
+    data_path = _data_path()
+    entry_path = insns_cache.cache_path(cache_dir, data_path)
+    cached = disk_cache.read_pickle(entry_path)
+    if cached is None:
+        return ['No readable cache file at {!r}.'.format(entry_path)]
+    if not isinstance(cached, InsnsFile):
+        return ['Cache file at {!r} holds a {}, not an InsnsFile.'
+                .format(entry_path, type(cached).__name__)]
+
+    fresh = _parse_insns_yaml(data_path)
+    problems = []
+    for name in sorted(set(vars(fresh)) | set(vars(cached))):
+        if name == 'insns':
+            continue
+        if (insns_cache.describe(getattr(fresh, name, None)) !=
+                insns_cache.describe(getattr(cached, name, None))):
+            problems.append('{} differs.'.format(name))
+
+    # Report instructions by mnemonic, which is more useful than just saying
+    # that the list differs.
+    fresh_insns = {insn.mnemonic: insn for insn in fresh.insns}
+    cached_insns = {insn.mnemonic: insn for insn in cached.insns}
+    for mnem in sorted(set(fresh_insns) | set(cached_insns)):
+        if (insns_cache.describe(fresh_insns.get(mnem)) !=
+                insns_cache.describe(cached_insns.get(mnem))):
+            problems.append('Instruction {} differs.'.format(mnem))
+    if [i.mnemonic for i in fresh.insns] != [i.mnemonic for i in cached.insns]:
+        problems.append('Instruction order differs.')
+
+    return problems
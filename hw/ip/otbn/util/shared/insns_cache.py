@@ -0,0 +1,103 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''An on-disk cache of the parsed instruction database
+
+Parsing and checking insns.yml (with the encoding schemes and the CSR and WSR
+lists) happens every time an OTBN tool starts. To avoid that, the parsed
+InsnsFile object can be pickled to a cache directory. The name of the cache
+file is a hash of:
+
+  - the YAML files in the data directory
+  - the Python code that parses them (in this directory and in serialize)
+  - the Python version
+
+so a change to any of these just means that the cache file isn't found. The
+cache directory is $OTBN_INSNS_CACHE_DIR if that is set (an empty value
+disables the cache) and otherwise "opentitan/otbn-insns" in the user's cache
+directory.
+
+'''
+
+import hashlib
+import os
+import sys
+from functools import lru_cache
+from typing import Dict, Optional, Set
+
+import serialize.parse_helpers
+
+from .disk_cache import (dir_files, hash_files, shared_fingerprint,
+                         user_cache_dir)
+
+CACHE_DIR_ENV = 'OTBN_INSNS_CACHE_DIR'
+
+# Bump this if the format of a cache file changes
+_CACHE_VERSION = 1
+
+
+def default_cache_dir() -> Optional[str]:
+    '''Return the cache directory to use if none is given (or None)'''
+    return user_cache_dir(CACHE_DIR_ENV, 'otbn-insns')
+
+
+@lru_cache(maxsize=None)
+def fingerprint(data_dir: str) -> str:
+    '''Return a hash of the YAML files in data_dir and the code to parse them
+
+    This changes whenever the parsed instruction database might, so other
+    caches that depend on the instruction encodings can use it in their keys.
+
+    '''
+    h = hashlib.sha256()
+    h.update(repr((_CACHE_VERSION, sys.version,
+                   shared_fingerprint())).encode('utf-8'))
+    hash_files(h, dir_files(data_dir, '.yml'))
+    hash_files(h, [serialize.parse_helpers.__file__])
+    return h.hexdigest()
+
+
+def cache_path(cache_dir: str, data_dir: str) -> str:
+    '''Return the path of the cache file for the YAML files in data_dir'''
+    return os.path.join(cache_dir,
+                        'insns-{}.pickle'.format(fingerprint(data_dir)))
+
+
+def describe(obj: object) -> object:
+    '''Return a structural description of obj, for comparing loaded objects
+
+    Two objects have equal descriptions if they have the same types and the
+    same attributes, recursively. Sets are sorted, so the description doesn't
+    depend on string hashing.
+
+    '''
+    return _describe(obj, set())
+
+
+def _describe(obj: object, active: Set[int]) -> object:
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        return obj
+
+    if id(obj) in active:
+        return ('<cycle>', type(obj).__qualname__)
+    active.add(id(obj))
+    try:
+        if isinstance(obj, (list, tuple)):
+            return (type(obj).__qualname__,
+                    [_describe(x, active) for x in obj])
+        if isinstance(obj, (set, frozenset)):
+            return (type(obj).__qualname__,
+                    sorted((_describe(x, active) for x in obj), key=repr))
+        if isinstance(obj, dict):
+            return ('dict',
+                    [(_describe(k, active), _describe(v, active))
+                     for k, v in obj.items()])
+        if hasattr(obj, '__dict__'):
+            attrs: Dict[str, object] = vars(obj)
+            return (type(obj).__qualname__,
+                    [(k, _describe(v, active))
+                     for k, v in sorted(attrs.items())])
+        return (type(obj).__qualname__, repr(obj))
+    finally:
+        active.discard(id(obj))
@@ -124,14 +124,17 @@ def _get_insn_count_range(program: OTBNProgram, graph: ControlGraph,
 
 
 def program_insn_count_range(
-        program: OTBNProgram) -> Tuple[int, Optional[int]]:
+        program: OTBNProgram,
+        graph: Optional[ControlGraph] = None) -> Tuple[int, Optional[int]]:
     '''Return minimum and maximum instruction counts for the program.
 
     Wrapper for `_get_insn_count_range` that works on the full program; it
     starts at graph.start and returns the instruction counts for all paths that
-    lead to the end of the program.
+    lead to the end of the program. If graph is None, it is computed with
+    program_control_graph.
     '''
-    graph = program_control_graph(program)
+    if graph is None:
+        graph = program_control_graph(program)
     min_count, max_count = _get_insn_count_range(program, graph, graph.start,
                                                  StopPoint.ECALL)
     if max_count == inf:
@@ -139,16 +142,20 @@ def program_insn_count_range(
     return min_count, max_count
 
 
-def subroutine_insn_count_range(program: OTBNProgram,
-                                subroutine: str) -> Tuple[int, Optional[int]]:
+def subroutine_insn_count_range(
+        program: OTBNProgram,
+        subroutine: str,
+        graph: Optional[ControlGraph] = None) -> Tuple[int, Optional[int]]:
     '''Return minimum and maximum instruction counts for the subroutine.
 
     Wrapper for `_get_insn_count_range` that works on a subroutine; it starts
     at graph.start and returns the instruction counts for all paths that lead
     to a return to the original caller. If a path leads to the program ending
-    (i.e. an `ecall` instruction), then there will be an error.
+    (i.e. an `ecall` instruction), then there will be an error. If graph is
+    None, it is computed with subroutine_control_graph.
     '''
-    graph = subroutine_control_graph(program, subroutine)
+    if graph is None:
+        graph = subroutine_control_graph(program, subroutine)
     min_count, max_count = _get_insn_count_range(program, graph, graph.start,
                                                  StopPoint.RET)
     if max_count == inf:
@@ -16,6 +16,7 @@ Typical usage:
 '''
 
 import argparse
+import os
 import sys
 import math
 import re
@@ -200,9 +201,15 @@ def main() -> int:
     logger.setLevel(logging.INFO)
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('infile', type=argparse.FileType('rb'))
+    parser.add_argument('infile', type=argparse.FileType('r'))
     parser.add_argument('outfile', type=argparse.FileType('w'))
     parser.add_argument('--swap-nibbles', dest='swap_nibbles', action='store_true')
+    parser.add_argument('--vmem-cache-dir',
+                        default=os.environ.get('VMEM_CACHE_DIR'),
+                        help=('Directory for caching the parsed input VMEM '
+                              'file, so that later runs on the same file can '
+                              'skip parsing it (default: $VMEM_CACHE_DIR, or '
+                              'no caching)'))
 
     args = parser.parse_args()
 
@@ -215,7 +222,7 @@ def main() -> int:
         width = int(match.group(1))
 
     # Load the input vmem file.
-    vmem = MemFile.load_vmem(width, args.infile)
+    vmem = MemFile.load_vmem(width, args.infile, args.vmem_cache_dir)
 
     # OpenTitan vmem files should always contain one single contiguous chunk.
     assert len(vmem.chunks) == 1
@@ -3,7 +3,12 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from typing import List
 
 from gen_vivado_mem_image import (UpdatememSimulator,
                                   otp_words_to_updatemem_pieces, swap_bytes)
@@ -125,5 +130,39 @@ class TestOtpWordsToUpdatememPieces(unittest.TestCase):
             self.assertListEqual(init_lines[2:], all_zero_init_lines[2:])
 
 
+class TestMain(unittest.TestCase):
+
+    def _run(self, args: List[str]) -> bytes:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'gen_vivado_mem_image.py')
+        top = os.path.normpath(os.path.join(os.path.dirname(script),
+                                            '../../../..'))
+        env = dict(os.environ, PYTHONPATH=top)
+        env.pop('VMEM_CACHE_DIR', None)
+        subprocess.run([sys.executable, script] + args, env=env, check=True,
+                       stderr=subprocess.DEVNULL)
+        with open(args[-1], 'rb') as f:
+            return f.read()
+
+    def test_vmem_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            infile = os.path.join(tmpdir, 'rom.32.vmem')
+            with open(infile, 'w') as f:
+                f.write('// A comment\n@0 ' +
+                        ' '.join(f'{i * 0x01010101:08x}' for i in range(40)) +
+                        '\n')
+            cache_dir = os.path.join(tmpdir, 'cache')
+
+            expected = self._run([infile, os.path.join(tmpdir, 'a.mem')])
+            self.assertTrue(expected)
+
+            # The first run fills the cache and the second reads from it
+            for name in ['b.mem', 'c.mem']:
+                out = self._run(['--vmem-cache-dir', cache_dir, infile,
+                                 os.path.join(tmpdir, name)])
+                self.assertEqual(out, expected)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,12 +3,11 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-import re
-import subprocess
-import tempfile
-from typing import Any, BinaryIO, Dict, IO, List, Optional, TextIO, Tuple
+import os
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, TextIO, Tuple
 
 from elftools.elf.elffile import ELFFile  # type: ignore
+from util.design.lib import vmem  # type: ignore
 from util.design.secded_gen import ecc_encode_some, load_secded_config  # type: ignore
 
 
@@ -32,20 +31,7 @@ class MemChunk:
         width is the maximum width of a word in bits.
 
         '''
-        addr_chars = max(8, (self.next_addr().bit_length() + 3) // 4)
-        word_chars = (width + 3) // 4
-
-        # Try to wrap at 79 characters. To do this, pick a number of words so
-        # that addr_chars + num_words * (word_chars + 1) fits (note that we
-        # gain a character by adding a @ on the front of the address, but lose
-        # it again by omitting the trailing space after the last word).
-        nwords_on_line = max(1, (79 - addr_chars) // (1 + word_chars))
-        for start_idx in range(0, len(self.words), nwords_on_line):
-            line_addr = self.base_addr + start_idx
-            toks = [f'@{line_addr:0{addr_chars}X}']
-            for word in self.words[start_idx:start_idx + nwords_on_line]:
-                toks.append(f'{word:0{word_chars}X}')
-            outfile.write(' '.join(toks) + '\n')
+        vmem.write_vmem(outfile, width, self.base_addr, self.words)
 
     def add_ecc32(self, config: Dict[str, Any]) -> None:
         '''Add ECC32 integrity bits
@@ -68,55 +54,11 @@ class MemFile:
                 .format(self.width, len(self.chunks)))
 
     @staticmethod
-    def _parse_line(width: int, line: str) -> Tuple[int, List[int]]:
-        '''Parse a line from a preprocessed vmem file
-
-        Returns a pair (addr, words) where addr is the address at the start of
-        the line and words is a list of the words that have been found, parsed
-        to unsigned numbers. Assumes that line has at least one non-whitespace
-        character. Each word is checked to make sure that it fits in width
-        bits.
-
-        '''
-        tokens = line.split()
-        assert tokens
-
-        addr_match = re.match(r'@([0-9a-fA-F]+)$', tokens[0])
-        if addr_match is None:
-            raise ValueError('Bad line format: first token is {!r}, '
-                             'which is not in the right format for an address.'
-                             .format(tokens[0]))
-        addr = int(addr_match.group(1), 16)
-
-        words = []
-        for idx, word_tok in enumerate(tokens[1:]):
-            try:
-                word = int(word_tok, 16)
-            except ValueError:
-                raise ValueError('Word {} of the line is invalid: '
-                                 '{!r} is not a hex number.'
-                                 .format(idx + 1, word_tok)) from None
-
-            if word < 0 or word >> width:
-                raise ValueError('Word {} of the line is {!r}, which '
-                                 'does not fit in an unsigned {}-bit number.'
-                                 .format(idx + 1, word_tok, width))
-            words.append(word)
-
-        return (addr, words)
-
-    @staticmethod
-    def _load_preproc(width: int, infile: IO[str]) -> 'MemFile':
-        '''Load a pre-processed file'''
+    def _from_lines(width: int, lines: Iterable[Tuple[int, List[int]]]) -> 'MemFile':
+        '''Make a MemFile from the (addr, words) lines of a vmem file'''
         chunks = []
         next_chunk: Optional[MemChunk] = None
-        for line in infile:
-            # If the line is empty or whitespace, skip it.
-            if not line or line.isspace():
-                continue
-
-            line_addr, line_words = MemFile._parse_line(width, line)
-
+        for line_addr, line_words in lines:
             # If there aren't actually any words on the line, skip it.
             if not line_words:
                 continue
@@ -147,20 +89,20 @@ class MemFile:
         return MemFile(width, chunks)
 
     @staticmethod
-    def load_vmem(width: int, infile: TextIO) -> 'MemFile':
+    def load_vmem(width: int, infile: TextIO,
+                  cache_dir: Optional[str] = None) -> 'MemFile':
         '''Read a VMEM file
 
-        This assumes that all words fit in the given width.
+        This assumes that all words fit in the given width. The file is
+        parsed a line at a time. If cache_dir is given and infile is a file on
+        disk, the parsed words are cached there (see util/design/lib/vmem.py).
 
         '''
-        with tempfile.TemporaryFile('w+') as tmp:
-            # First, run cpp as a subprocess to strip out any comments. These
-            # are allowed by the vmem format as described in srec_vmem(5) and
-            # tokenising them is hard: get the C preprocessor to do the work
-            # for us! The -P argument tells cpp not to generate linemarkers
-            subprocess.run(['cpp', '-P'], stdin=infile, stdout=tmp, check=True)
-            tmp.seek(0)
-            return MemFile._load_preproc(width, tmp)
+        path = getattr(infile, 'name', None)
+        if cache_dir is not None and isinstance(path, str) and os.path.isfile(path):
+            return MemFile._from_lines(width, vmem.load_vmem(path, width, cache_dir))
+
+        return MemFile._from_lines(width, vmem.read_vmem(infile, width))
 
     @staticmethod
     def load_elf32(infile: BinaryIO, base_addr: int) -> 'MemFile':
@@ -5,15 +5,21 @@
 '''Script for scrambling a ROM image'''
 
 import argparse
+from array import array
 from enum import Enum
+from functools import lru_cache
+import hashlib
+import multiprocessing
+import os
 import sys
-from typing import Dict, IO, Optional, Tuple
+from typing import Any, Dict, IO, List, Optional, Tuple, cast
 
 import hjson  # type: ignore
 from Crypto.Hash import cSHAKE256
 
 from mem import MemChunk, MemFile
-from util.design.prince import prince, sbox  # type: ignore
+from util.basegen.cache import write_atomic  # type: ignore
+from util.design.prince import get_prince, sbox  # type: ignore
 from util.design.secded_gen import ecc_encode_some  # type: ignore
 from util.design.secded_gen import load_secded_config
 
@@ -220,8 +226,13 @@ PRESENT_SBOX4_INV = [
 ]
 
 
-def subst_perm_enc(data: int, key: int, width: int, num_rounds: int) -> int:
-    '''A model of prim_subst_perm in encrypt mode'''
+def _subst_perm_enc_bitwise(data: int, key: int, width: int,
+                            num_rounds: int) -> int:
+    '''A model of prim_subst_perm in encrypt mode, one bit at a time
+
+    This is the reference for subst_perm_enc.
+
+    '''
     assert 0 <= width
     assert 0 <= data < (1 << width)
     assert 0 <= key < (1 << width)
@@ -256,8 +267,13 @@ def subst_perm_enc(data: int, key: int, width: int, num_rounds: int) -> int:
     return data ^ key
 
 
-def subst_perm_dec(data: int, key: int, width: int, num_rounds: int) -> int:
-    '''A model of prim_subst_perm in decrypt mode'''
+def _subst_perm_dec_bitwise(data: int, key: int, width: int,
+                            num_rounds: int) -> int:
+    '''A model of prim_subst_perm in decrypt mode, one bit at a time
+
+    This is the reference for subst_perm_dec.
+
+    '''
     assert 0 <= width
     assert 0 <= data < (1 << width)
     assert 0 <= key < (1 << width)
@@ -290,6 +306,119 @@ def subst_perm_dec(data: int, key: int, width: int, num_rounds: int) -> int:
     return data ^ key
 
 
+_SubstPermTables = Tuple[List[List[int]], List[List[int]], List[List[int]]]
+
+
+@lru_cache(maxsize=None)
+def _subst_perm_tables(width: int) -> _SubstPermTables:
+    '''Byte tables for the rounds of prim_subst_perm at the given width
+
+    Returns (enc, dec_perm, dec_sbox). Each is a list of tables, one for each
+    byte of the data, and a layer is the OR of the entries for the bytes of its
+    input (see _lookup). The S-box works on nibbles and the reversal and
+    butterfly just move bits, so no output bit depends on more than one byte.
+
+    enc[i][b] is the S-box, reversal and butterfly of an encryption round
+    applied to the value b in byte i. dec_perm undoes the reversal and
+    butterfly and dec_sbox is the inverse S-box layer.
+
+    '''
+    half = width // 2
+
+    # Where the reversal and butterfly send each bit
+    perm = []
+    for i in range(width):
+        rev = width - 1 - i
+        if rev < 2 * half:
+            perm.append(rev // 2 + (half if rev & 1 else 0))
+        else:
+            perm.append(rev)
+    inv_perm = [0] * width
+    for i, j in enumerate(perm):
+        inv_perm[j] = i
+
+    def permute(data: int, dests: List[int]) -> int:
+        ret = 0
+        for i, dest in enumerate(dests):
+            ret |= ((data >> i) & 1) << dest
+        return ret
+
+    enc = []
+    dec_perm = []
+    dec_sbox = []
+    for byte_idx in range((width + 7) // 8):
+        shift = 8 * byte_idx
+        mask = 0xff << shift
+        values = [b for b in range(256) if (b << shift) >> width == 0]
+        # The S-box of zero isn't zero, so mask out the other bytes
+        enc.append([permute(sbox(b << shift, width, PRESENT_SBOX4) & mask,
+                            perm)
+                    for b in values])
+        dec_perm.append([permute(b << shift, inv_perm) for b in values])
+        dec_sbox.append([sbox(b << shift, width, PRESENT_SBOX4_INV) & mask
+                         for b in values])
+    return (enc, dec_perm, dec_sbox)
+
+
+def _lookup(tables: List[List[int]], data: int) -> int:
+    ret = 0
+    for table in tables:
+        ret |= table[data & 0xff]
+        data >>= 8
+    return ret
+
+
+def subst_perm_enc(data: int, key: int, width: int, num_rounds: int) -> int:
+    '''A model of prim_subst_perm in encrypt mode'''
+    assert 0 <= width
+    assert 0 <= data < (1 << width)
+    assert 0 <= key < (1 << width)
+
+    enc, _, _ = _subst_perm_tables(width)
+    for rnd in range(num_rounds):
+        data = _lookup(enc, data ^ key)
+
+    return data ^ key
+
+
+def subst_perm_dec(data: int, key: int, width: int, num_rounds: int) -> int:
+    '''A model of prim_subst_perm in decrypt mode'''
+    assert 0 <= width
+    assert 0 <= data < (1 << width)
+    assert 0 <= key < (1 << width)
+
+    _, dec_perm, dec_sbox = _subst_perm_tables(width)
+    for rnd in range(num_rounds):
+        data = _lookup(dec_sbox, _lookup(dec_perm, data ^ key))
+
+    return data ^ key
+
+
+# Bump this if a change to the scrambling code changes the keystream or the
+# address permutation, to avoid using tables cached by an older version.
+_TABLE_CACHE_VERSION = 1
+_TABLE_CACHE_MAGIC = b'ROMSCRT' + bytes([_TABLE_CACHE_VERSION])
+
+# The smallest number of addresses that is worth sending to a worker process
+_MIN_ADDRS_PER_JOB = 1024
+
+
+_Tables = Tuple[List[int], List[int], List[int]]
+
+
+def _compute_tables(job: Tuple['Scrambler', int, int]) -> _Tables:
+    '''Compute the tables for a range of addresses
+
+    This is run in worker processes by Scrambler._get_tables.
+
+    '''
+    scrambler, start, stop = job
+    addrs = range(start, stop)
+    return (scrambler._calc_keystreams(addrs),
+            [scrambler.addr_sp_dec(phy_addr) for phy_addr in addrs],
+            [scrambler.addr_sp_enc(log_addr) for log_addr in addrs])
+
+
 class Scrambler:
     subst_perm_rounds = 2
     num_rounds_half = 3
@@ -297,7 +426,9 @@ class Scrambler:
     def __init__(self, disable: bool, nonce: int, nonce_width: int,
                  key: int, key_width: int,
                  rom_base: int, rom_size_words: int,
-                 hash_file: IO[str]):
+                 hash_file: IO[str],
+                 cache_dir: Optional[str] = None,
+                 jobs: int = 1):
         assert nonce_width > 0
         assert key_width > 0
         assert 0 <= nonce < (1 << nonce_width)
@@ -317,18 +448,37 @@ class Scrambler:
 
         self._addr_width = (rom_size_words - 1).bit_length()
 
+        # The full 64-bit keystream for each logical address and the results
+        # of addr_sp_dec and addr_sp_enc for each address. These only depend
+        # on the key and nonce, not the ROM contents, so are computed (for the whole ROM at
+        # once) on first use. If cache_dir is set, they are also saved there
+        # to be reused by later runs with the same parameters. If they need
+        # computing, this is split across up to jobs processes.
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self._tables: Optional[_Tables] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes in _get_tables only need the scrambling
+        # parameters, not the hash file or any tables.
+        state = self.__dict__.copy()
+        state['hash_file'] = None
+        state['_tables'] = None
+        return state
+
     def is_disabled(self) -> bool:
         return self.disable
 
     @staticmethod
-    def from_hjson_path(top_cfg_path: str, secrets_path: str, mode: str, hash_file: IO[str]) \
-            -> 'Scrambler':
+    def from_hjson_path(top_cfg_path: str, secrets_path: str, mode: str, hash_file: IO[str],
+                        cache_dir: Optional[str] = None, jobs: int = 1) -> 'Scrambler':
         mem_ctrl = MemoryController.from_hjson_path(top_cfg_path, secrets_path, mode)
         assert mem_ctrl is not None
 
         return Scrambler(mem_ctrl.scrambling_disabled, mem_ctrl.nonce, mem_ctrl.nonce_width,
                          mem_ctrl.scr_key, mem_ctrl.scr_key_width,
-                         mem_ctrl.base, mem_ctrl.size_words, hash_file)
+                         mem_ctrl.base, mem_ctrl.size_words, hash_file,
+                         cache_dir, jobs)
 
     def flatten(self, mem: MemFile) -> MemFile:
         '''Flatten and pad mem up to the correct size
@@ -352,18 +502,119 @@ class Scrambler:
 
         return flattened
 
+    def _calc_keystreams(self, log_addrs: range) -> List[int]:
+        data_nonce_width = 64 - self._addr_width
+        data_scr_nonce = self.nonce & ((1 << data_nonce_width) - 1)
+        nonce_bits = data_scr_nonce << self._addr_width
+        cipher = get_prince(self.key, self.num_rounds_half)
+        return cast(List[int],
+                    cipher.encrypt_many(nonce_bits | log_addr
+                                        for log_addr in log_addrs))
+
+    def _table_cache_path(self) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        # Name the file with a hash of the parameters, rather than the
+        # parameters themselves, to avoid writing the key in the file name.
+        params = (self.nonce, self.nonce_width, self.key, self.key_width,
+                  self.rom_size_words, self.num_rounds_half,
+                  self.subst_perm_rounds)
+        digest = hashlib.sha256(repr(params).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir,
+                            f'rom-scramble-v{_TABLE_CACHE_VERSION}-{digest}.bin')
+
+    def _load_tables(self, path: str) -> Optional[_Tables]:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        arrays = [array('Q'), array('I'), array('I')]
+        pos = len(_TABLE_CACHE_MAGIC)
+        sizes = [arr.itemsize * self.rom_size_words for arr in arrays]
+        if (data[:pos] != _TABLE_CACHE_MAGIC or
+                len(data) != pos + sum(sizes)):
+            return None
+
+        for arr, size in zip(arrays, sizes):
+            arr.frombytes(data[pos:pos + size])
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            pos += size
+        keystreams, log_addrs, phy_addrs = arrays
+        return (keystreams.tolist(), log_addrs.tolist(), phy_addrs.tolist())
+
+    def _save_tables(self, path: str, tables: _Tables) -> None:
+        keystreams, log_addrs, phy_addrs = tables
+        arrays = [array('Q', keystreams),
+                  array('I', log_addrs), array('I', phy_addrs)]
+        if sys.byteorder != 'little':
+            for arr in arrays:
+                arr.byteswap()
+
+        # write_atomic writes to a temporary file and then renames it, so
+        # builds running in parallel never see a partly written file. A cache
+        # that can't be written (for example, because the directory is
+        # read-only) just means that the next run has to compute the tables
+        # again.
+        write_atomic(path, _TABLE_CACHE_MAGIC +
+                     b''.join(arr.tobytes() for arr in arrays))
+
+    def _get_tables(self) -> _Tables:
+        '''Return the keystream and address tables
+
+        The first list gives the 64-bit keystream for each logical address.
+        The second gives addr_sp_dec of each address and the third gives
+        addr_sp_enc of each address.
+
+        '''
+        if self._tables is not None:
+            return self._tables
+
+        cache_path = self._table_cache_path()
+        tables = self._load_tables(cache_path) if cache_path else None
+        if tables is None:
+            num_jobs = min(self.jobs,
+                           self.rom_size_words // _MIN_ADDRS_PER_JOB)
+            if num_jobs > 1:
+                step = -(-self.rom_size_words // num_jobs)
+                ranges = [(self, start,
+                           min(start + step, self.rom_size_words))
+                          for start in range(0, self.rom_size_words, step)]
+                with multiprocessing.Pool(num_jobs) as pool:
+                    results = pool.map(_compute_tables, ranges)
+            else:
+                results = [_compute_tables((self, 0, self.rom_size_words))]
+
+            tables = ([ks for res in results for ks in res[0]],
+                      [addr for res in results for addr in res[1]],
+                      [addr for res in results for addr in res[2]])
+            if cache_path is not None:
+                self._save_tables(cache_path, tables)
+
+        self._tables = tables
+        return tables
+
     def get_keystream(self, log_addr: int, width: int) -> int:
         assert (log_addr >> self._addr_width) == 0
         assert 0 < width <= 64
 
-        data_nonce_width = 64 - self._addr_width
-        data_scr_nonce = self.nonce & ((1 << data_nonce_width) - 1)
-        to_scramble = (data_scr_nonce << self._addr_width) | log_addr
-        full_keystream = int(
-            prince(to_scramble, self.key, self.num_rounds_half))
-
+        if log_addr < self.rom_size_words:
+            full_keystream = self._get_tables()[0][log_addr]
+        else:
+            full_keystream = self._calc_keystreams(range(log_addr,
+                                                         log_addr + 1))[0]
         return full_keystream & ((1 << width) - 1)
 
+    def _get_log_addrs(self) -> List[int]:
+        '''Return addr_sp_dec of each physical address'''
+        return self._get_tables()[1]
+
+    def _get_phy_addrs(self) -> List[int]:
+        '''Return addr_sp_enc of each logical address'''
+        return self._get_tables()[2]
+
     def addr_sp_enc(self, log_addr: int) -> int:
         assert self._addr_width < self.nonce_width
         data_nonce_width = self.nonce_width - self._addr_width
@@ -475,8 +726,7 @@ class Scrambler:
         assert width <= 64
 
         scrambled = []
-        for phy_addr in range(self.rom_size_words):
-            log_addr = self.addr_sp_dec(phy_addr)
+        for log_addr in self._get_log_addrs():
             assert 0 <= log_addr < self.rom_size_words
 
             clr_data = mem.chunks[0].words[log_addr]
@@ -506,9 +756,10 @@ class Scrambler:
         num_digest_words = 256 // 32
 
         # Read out the scrambled data in logical address order
-        to_hash = b''
+        to_hash = bytearray()
+        phy_addrs = self._get_phy_addrs()
         for log_addr in range(self.rom_size_words - num_digest_words):
-            phy_addr = self.addr_sp_enc(log_addr)
+            phy_addr = phy_addrs[log_addr]
             scr_word = scr_chunk.words[phy_addr]
             # Note that a scrambled word with ECC amounts to 39bit. The
             # expression (39 + 7) // 8 calculates the amount of bytes that are
@@ -551,7 +802,7 @@ class Scrambler:
             # should have given us an invalid checksum.
             assert found_mismatch
 
-            phy_addr = self.addr_sp_enc(log_addr)
+            phy_addr = phy_addrs[log_addr]
             scr_chunk.words[phy_addr] = w32
             print(f'  {w32:#08x},', file = self.hash_file)
         print('};', file = self.hash_file)
@@ -565,10 +816,20 @@ def main() -> int:
     parser.add_argument('infile', type=argparse.FileType('rb'))
     parser.add_argument('outfile', type=argparse.FileType('w'))
     parser.add_argument('hashfile', type=argparse.FileType('w'))
+    parser.add_argument('--cache-dir',
+                        default=os.environ.get('ROM_SCRAMBLE_CACHE_DIR'),
+                        help=('Directory for caching the keystream and '
+                              'address permutation between runs (default: '
+                              '$ROM_SCRAMBLE_CACHE_DIR, or no caching)'))
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help=('Number of processes to use when computing the '
+                              'keystream and address permutation (default: '
+                              '1)'))
 
     args = parser.parse_args()
     scrambler = Scrambler.from_hjson_path(args.top_hjson, args.secrets_hjson,
-                                          args.mode, args.hashfile)
+                                          args.mode, args.hashfile,
+                                          args.cache_dir, args.jobs)
 
     # Load the input ELF file
     clr_mem = MemFile.load_elf32(args.infile, scrambler.rom_base)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import io
+import os
+import random
+import tempfile
+import unittest
+from typing import Optional
+
+from Crypto.Hash import cSHAKE256
+
+from mem import MemChunk, MemFile
+import scramble_image
+from scramble_image import Scrambler
+
+
+class TestSubstPerm(unittest.TestCase):
+
+    def test_matches_bitwise(self) -> None:
+        rnd = random.Random(1)
+        for width in range(1, 21):
+            key = rnd.getrandbits(width)
+            if width <= 10:
+                values = list(range(1 << width))
+            else:
+                values = [rnd.getrandbits(width) for _ in range(1000)]
+            for data in values:
+                enc = scramble_image.subst_perm_enc(data, key, width, 2)
+                self.assertEqual(
+                    enc,
+                    scramble_image._subst_perm_enc_bitwise(data, key,
+                                                           width, 2))
+                self.assertEqual(
+                    scramble_image.subst_perm_dec(data, key, width, 2),
+                    scramble_image._subst_perm_dec_bitwise(data, key,
+                                                           width, 2))
+                self.assertEqual(
+                    scramble_image.subst_perm_dec(enc, key, width, 2), data)
+
+
+class TestScramblerAddrs(unittest.TestCase):
+
+    def _scrambler(self, size_words: int) -> Scrambler:
+        # With this key and nonce, inverting the addr_sp_dec table for a
+        # 3072-word ROM doesn't give the addr_sp_enc table.
+        rnd = random.Random(1)
+        return Scrambler(False, rnd.getrandbits(64), 64, rnd.getrandbits(128),
+                         128, 0x8000, size_words, io.StringIO())
+
+    def test_addr_tables(self) -> None:
+        # addr_sp_enc and addr_sp_dec are only inverses if the ROM size is a
+        # power of two, so check a size that isn't as well.
+        for size in [2048, 3072]:
+            scrambler = self._scrambler(size)
+            self.assertEqual(scrambler._get_log_addrs(),
+                             [scrambler.addr_sp_dec(a) for a in range(size)])
+            self.assertEqual(scrambler._get_phy_addrs(),
+                             [scrambler.addr_sp_enc(a) for a in range(size)])
+
+    def test_add_hash(self) -> None:
+        size = 3072
+        num_digest_words = 8
+        scrambler = self._scrambler(size)
+        rnd = random.Random(1)
+        words = [rnd.getrandbits(39) for _ in range(size)]
+        scr_mem = MemFile(39, [MemChunk(0, list(words))])
+        scrambler.add_hash(scr_mem)
+
+        # Hash the words in logical order, using addr_sp_enc for each one
+        to_hash = b''.join(words[scrambler.addr_sp_enc(a)].to_bytes(5, 'little')
+                           for a in range(size - num_digest_words))
+        digest = cSHAKE256.new(data=to_hash, custom=b'ROM_CTRL').read(32)
+        for idx in range(num_digest_words):
+            phy_addr = scrambler.addr_sp_enc(size - num_digest_words + idx)
+            exp = int.from_bytes(digest[4 * idx:4 * idx + 4], 'little')
+            self.assertEqual(scr_mem.chunks[0].words[phy_addr], exp)
+
+
+class TestScramblerTables(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rnd = random.Random(1)
+        self.key = rnd.getrandbits(128)
+        self.nonce = rnd.getrandbits(64)
+
+    def _scrambler(self, size_words: int, cache_dir: Optional[str] = None,
+                   jobs: int = 1) -> Scrambler:
+        return Scrambler(False, self.nonce, 64, self.key, 128, 0x8000,
+                         size_words, io.StringIO(), cache_dir, jobs)
+
+    def _check_tables(self, scrambler: Scrambler) -> None:
+        size = scrambler.rom_size_words
+        keystreams, log_addrs, phy_addrs = scrambler._get_tables()
+        self.assertEqual(keystreams,
+                         scrambler._calc_keystreams(range(size)))
+        self.assertEqual(log_addrs,
+                         [scrambler.addr_sp_dec(a) for a in range(size)])
+        self.assertEqual(phy_addrs,
+                         [scrambler.addr_sp_enc(a) for a in range(size)])
+
+    def test_parallel_tables(self) -> None:
+        # A power of two size and one that isn't
+        for size in [4096, 3072]:
+            self._check_tables(self._scrambler(size, jobs=3))
+
+    def test_cached_tables(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = self._scrambler(2048, cache_dir=cache_dir)
+            tables = first._get_tables()
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            second = self._scrambler(2048, cache_dir=cache_dir)
+            self.assertEqual(second._get_tables(), tables)
+
+            # Different parameters mustn't pick up the cached file
+            third = self._scrambler(1024, cache_dir=cache_dir)
+            self._check_tables(third)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_unwritable_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # The cache directory can't be created under a regular file
+            not_a_dir = os.path.join(tmp_dir, 'file')
+            with open(not_a_dir, 'w'):
+                pass
+            cache_dir = os.path.join(not_a_dir, 'cache')
+            self._check_tables(self._scrambler(2048, cache_dir=cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+"""Helpers for the on-disk caches used by the generators in util/."""
+
+import os
+import tempfile
+from typing import Optional
+
+
+def user_cache_dir(env_var: str, name: str) -> Optional[str]:
+    """Return a writable cache directory, or None if caching is disabled.
+
+    If env_var is set in the environment, its value is the directory to use
+    (and an empty value disables the cache). Otherwise, the directory is
+    "opentitan/<name>" in the user's cache directory. Returns None if the
+    directory can't be created or written.
+    """
+    path = os.environ.get(env_var)
+    if path is None:
+        base = (os.environ.get("XDG_CACHE_HOME") or
+                os.path.join(os.path.expanduser("~"), ".cache"))
+        path = os.path.join(base, "opentitan", name)
+    elif not path:
+        return None
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path if os.access(path, os.W_OK) else None
+
+
+def write_atomic(path: str, data: bytes) -> bool:
+    """Write data to a file at path, replacing it atomically.
+
+    The parent directory is created if necessary. Returns False (rather than
+    raising an exception) if the file couldn't be written: a cache that can't
+    be updated should just be slower.
+    """
+    dir_name = os.path.dirname(path)
+    try:
+        os.makedirs(dir_name, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name)
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
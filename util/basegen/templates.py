@@ -0,0 +1,132 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+"""Shared loading of Mako templates for the generators in util/.
+
+Compiling a Mako template to Python is a noticeable part of the run time of
+tools like regtool and topgen, which render the same large templates over
+and over again. This module avoids repeating that work in two ways:
+
+  - Templates and lookups are memoized in-process, so asking for the same
+    template twice returns the same compiled object.
+
+  - The compiled Python module for each template is written to a cache
+    directory, named after a hash of the template's contents (and of the
+    options it was compiled with), so later runs can load it directly.
+
+The cache directory is $OT_MAKO_CACHE_DIR if that is set (an empty value
+disables the on-disk cache) and otherwise "opentitan/mako" in the user's
+cache directory. If the directory can't be created or written, templates are
+still memoized in-process but nothing is written to disk.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import mako  # type: ignore
+from mako.lookup import TemplateLookup  # type: ignore
+from mako.template import Template  # type: ignore
+
+from basegen.cache import user_cache_dir
+
+CACHE_DIR_ENV = "OT_MAKO_CACHE_DIR"
+
+# Bump this to invalidate every module in the cache directory.
+_CACHE_VERSION = 1
+
+_TEMPLATES: Dict[Tuple[object, ...], Template] = {}
+_LOOKUPS: Dict[Tuple[object, ...], TemplateLookup] = {}
+
+
+@lru_cache(maxsize=None)
+def cache_dir() -> Optional[str]:
+    """Return the directory for compiled template modules (or None)."""
+    return user_cache_dir(CACHE_DIR_ENV, "mako")
+
+
+def _option_key(options: Dict[str, Any]) -> str:
+    """A stable representation of the options used to compile a template.
+
+    Callables (like preprocessors) are represented by their name, rather
+    than by their repr, which would include an address.
+    """
+    items = []
+    for name, value in sorted(options.items()):
+        if callable(value):
+            value = (f"{getattr(value, '__module__', '')}."
+                     f"{getattr(value, '__qualname__', repr(value))}")
+        items.append((name, value))
+    return repr(items)
+
+
+def _module_filename(filename: str, uri: str,
+                     options: Dict[str, Any]) -> Optional[str]:
+    """Return the path in the cache directory for a compiled template."""
+    mod_dir = cache_dir()
+    if mod_dir is None:
+        return None
+    try:
+        with open(filename, "rb") as f:
+            contents = f.read()
+    except OSError:
+        return None
+
+    h = hashlib.sha256()
+    # The compiled module embeds the filename and URI of the template, so
+    # these are part of the key as well as the template contents.
+    key = (_CACHE_VERSION, mako.__version__, os.path.abspath(filename), uri,
+           _option_key(options))
+    h.update(repr(key).encode("utf-8"))
+    h.update(contents)
+    return os.path.join(mod_dir, h.hexdigest() + ".py")
+
+
+def _stat_key(filename: str) -> Tuple[int, int]:
+    st = os.stat(filename)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_template(filename: str,
+                 lookup: Optional[TemplateLookup] = None,
+                 **options: Any) -> Template:
+    """Return the compiled Template for the file at filename.
+
+    The optional lookup and any other options are passed to the Template
+    constructor. Asking for the same file with the same lookup and options
+    returns the same Template object, unless the file has changed.
+    """
+    filename = str(filename)
+    key = (os.path.abspath(filename), _stat_key(filename), lookup,
+           _option_key(options))
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = Template(filename=filename,
+                            lookup=lookup,
+                            module_filename=_module_filename(
+                                filename, filename, options),
+                            **options)
+        _TEMPLATES[key] = template
+    return template
+
+
+def get_lookup(directories: Iterable[str], **options: Any) -> TemplateLookup:
+    """Return a TemplateLookup that searches directories.
+
+    Options are passed to the TemplateLookup constructor (and then on to
+    each template that it compiles). Lookups are shared between callers that
+    ask for the same directories and options, and the templates that they
+    load are compiled through the cache directory.
+    """
+    dirs = tuple(str(d) for d in directories)
+    key = (dirs, _option_key(options))
+    lookup = _LOOKUPS.get(key)
+    if lookup is None:
+        lookup = TemplateLookup(
+            directories=list(dirs),
+            modulename_callable=lambda filename, uri: _module_filename(
+                filename, uri, options),
+            **options)
+        _LOOKUPS[key] = lookup
+    return lookup
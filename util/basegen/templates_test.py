@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from basegen import templates
+
+
+class TestTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tpl_dir = os.path.join(self._tmpdir.name, "tpl")
+        self.cache_dir = os.path.join(self._tmpdir.name, "cache")
+        os.mkdir(self.tpl_dir)
+        env = mock.patch.dict(os.environ,
+                              {templates.CACHE_DIR_ENV: self.cache_dir})
+        env.start()
+        self.addCleanup(env.stop)
+        templates.cache_dir.cache_clear()
+        self.addCleanup(templates.cache_dir.cache_clear)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _write(self, name: str, text: str) -> str:
+        path = os.path.join(self.tpl_dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        # Make sure that a rewrite is seen as a change to the file, even on
+        # filesystems with a coarse timestamp.
+        os.utime(path, ns=(0, len(text) * 10**9))
+        return path
+
+    def _modules(self):
+        return sorted(f for f in os.listdir(self.cache_dir)
+                      if f.endswith(".py"))
+
+    def test_get_template(self):
+        path = self._write("a.tpl", "a=${a}")
+        tpl = templates.get_template(path)
+        self.assertEqual(tpl.render(a=1), "a=1")
+        self.assertIs(templates.get_template(path), tpl)
+        self.assertEqual(len(self._modules()), 1)
+
+        # Changing the template gives a new compiled module
+        self._write("a.tpl", "a is ${a}")
+        tpl = templates.get_template(path)
+        self.assertEqual(tpl.render(a=1), "a is 1")
+        self.assertEqual(len(self._modules()), 2)
+
+        # Compiling with different options gives a separate module too
+        tpl = templates.get_template(path, strict_undefined=True)
+        self.assertEqual(tpl.render(a=2), "a is 2")
+        self.assertEqual(len(self._modules()), 3)
+
+    def test_get_lookup(self):
+        self._write("inc.tpl", "<%def name='f(x)'>[${x}]</%def>")
+        self._write("top.tpl", "<%namespace file='inc.tpl' import='f'/>${f(3)}")
+        lookup = templates.get_lookup([self.tpl_dir], strict_undefined=True)
+        self.assertIs(templates.get_lookup([self.tpl_dir],
+                                           strict_undefined=True), lookup)
+        self.assertEqual(lookup.get_template("top.tpl").render(), "[3]")
+        self.assertEqual(len(self._modules()), 2)
+
+    def test_no_cache_dir(self):
+        os.environ[templates.CACHE_DIR_ENV] = ""
+        templates.cache_dir.cache_clear()
+        path = self._write("b.tpl", "b=${b}")
+        self.assertEqual(templates.get_template(path).render(b=2), "b=2")
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
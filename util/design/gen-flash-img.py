@@ -11,12 +11,13 @@ r"""Takes a compiled VMEM image and processes it for loading into flash.
 """
 
 import argparse
+import os
 import re
 import sys
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional
 
 import hjson
 from pyfinite import ffield
@@ -25,6 +26,7 @@ from lib.common import (check_int,
                         validate_data_perm_option,
                         vmem_permutation_string)
 from lib.Present import Present
+from lib import vmem
 
 import prince
 import secded_gen
@@ -84,10 +86,9 @@ FLASH_GF_2_64 = ffield.FField(64,
                               gen=((0x1 << 64) | (0x1 << 4) | (0x1 << 3) |
                                    (0x1 << 1) | 0x1))
 
-# Format string for generating new VMEM file.
+# Word size for generating new VMEM file.
 FLASH_VMEM_WORD_SIZE = (FLASH_WORD_SIZE + FLASH_INTEGRITY_ECC_SIZE +
                         FLASH_RELIABILITY_ECC_SIZE)
-VMEM_FORMAT_STR = " {:0" + f"{FLASH_VMEM_WORD_SIZE // 4}" + "X}"
 # ------------------------------------------------------------------------------
 
 
@@ -124,8 +125,8 @@ def _xex_scramble(data: int, word_addr: int, flash_addr_key: int,
     operand_b = flash_addr_key & FLASH_GF_OPERAND_B_MASK
     mask = FLASH_GF_2_64.Multiply(operand_a, operand_b)
     masked_data = data ^ mask
-    return prince.prince(masked_data, flash_data_key,
-                         FLASH_PRINCE_NUM_HALF_ROUNDS) ^ mask
+    cipher = prince.get_prince(flash_data_key, FLASH_PRINCE_NUM_HALF_ROUNDS)
+    return cipher.encrypt(masked_data) ^ mask
 
 
 def _convert_array_2_int(data_array: List[int],
@@ -274,59 +275,43 @@ def _compute_flash_scrambling_keys(
 
 def _reformat_flash_vmem(
         flash_vmem_file: str,
-        scrambling_configs: FlashScramblingConfigs) -> List[str]:
-    # Open (raw) flash VMEM file and read into memory, skipping comment lines.
-    try:
-        flash_vmem = Path(flash_vmem_file).read_text()
-    except IOError:
+        scrambling_configs: FlashScramblingConfigs,
+        cache_dir: Optional[str] = None) -> Iterator[str]:
+    # Read the (raw) flash VMEM file a line at a time, skipping comments.
+    if not os.path.isfile(flash_vmem_file):
         raise Exception(f"Unable to open {flash_vmem_file}")
-    flash_vmem_lines = re.findall(r"^@.*$", flash_vmem, flags=re.MULTILINE)
+    flash_vmem_lines = vmem.load_vmem(flash_vmem_file, FLASH_WORD_SIZE,
+                                      cache_dir)
 
     # Load project SECDED configuration.
     ecc_configs = secded_gen.load_secded_config()
 
     # Add integrity/reliability ECC, and potentially scramble, each flash word.
-    reformatted_vmem_lines = []
-    for line in flash_vmem_lines:
-        line_items = line.split()
-        reformatted_line = ""
-        address = None
-        address_offset = 0
-        data = None
-        for item in line_items:
-            # Process the address first.
-            if re.match(r"^@", item):
-                reformatted_line += item
-                address = int(item.lstrip("@"), 16)
-                address_offset = 0
-            # Process the data words.
-            else:
-                data = int(item, 16)
-                # `data_w_intg_ecc` will be in format {ECC bits, data bits}.
-                data_w_intg_ecc, _ = secded_gen.ecc_encode(
-                    ecc_configs, "hamming", FLASH_WORD_SIZE, data)
-                # Due to storage constraints the first nibble of ECC is dropped.
-                data_w_intg_ecc &= 0xF_FFFF_FFFF_FFFF_FFFF
-                if scrambling_configs.scrambling_enabled:
-                    intg_ecc = data_w_intg_ecc & (0xF << FLASH_WORD_SIZE)
-                    data = _xex_scramble(data, address + address_offset,
-                                         scrambling_configs.addr_key,
-                                         scrambling_configs.data_key)
-                    data_w_intg_ecc = intg_ecc | data
-                # `data_w_full_ecc` will be in format {reliability ECC bits,
-                # integrity ECC bits, data bits}.
-                data_w_full_ecc, _ = secded_gen.ecc_encode(
-                    ecc_configs, "hamming",
-                    FLASH_WORD_SIZE + FLASH_INTEGRITY_ECC_SIZE,
-                    data_w_intg_ecc)
-                reformatted_line += str.format(VMEM_FORMAT_STR,
-                                               data_w_full_ecc)
-                address_offset += 1
-
-        # Append reformatted line to what will be the new output VMEM file.
-        reformatted_vmem_lines.append(reformatted_line)
-
-    return reformatted_vmem_lines
+    # The ECC is computed for a line of words at a time.
+    for address, words in flash_vmem_lines:
+        # `intg_ecc_words` will be in format {ECC bits, data bits}.
+        intg_ecc_words, _ = secded_gen.ecc_encode_some(
+            ecc_configs, "hamming", FLASH_WORD_SIZE, words)
+        for address_offset, data in enumerate(words):
+            # Due to storage constraints the first nibble of ECC is dropped.
+            data_w_intg_ecc = intg_ecc_words[address_offset] & 0xF_FFFF_FFFF_FFFF_FFFF
+            if scrambling_configs.scrambling_enabled:
+                intg_ecc = data_w_intg_ecc & (0xF << FLASH_WORD_SIZE)
+                data = _xex_scramble(data, address + address_offset,
+                                     scrambling_configs.addr_key,
+                                     scrambling_configs.data_key)
+                data_w_intg_ecc = intg_ecc | data
+            intg_ecc_words[address_offset] = data_w_intg_ecc
+        # `reformatted_words` will be in format {reliability ECC bits,
+        # integrity ECC bits, data bits}.
+        reformatted_words, _ = secded_gen.ecc_encode_some(
+            ecc_configs, "hamming",
+            FLASH_WORD_SIZE + FLASH_INTEGRITY_ECC_SIZE,
+            intg_ecc_words)
+
+        # Yield the reformatted line of the new output VMEM file.
+        yield vmem.format_line(address, reformatted_words, 8,
+                               FLASH_VMEM_WORD_SIZE // 4)
 
 
 def main(argv: List[str]):
@@ -347,6 +332,15 @@ def main(argv: List[str]):
                         Path to the top secret configuration in Hjson format.
                         ''')
     parser.add_argument("--out-flash-vmem", type=str, help="Output VMEM file.")
+    parser.add_argument("--vmem-cache-dir",
+                        type=str,
+                        default=os.environ.get("VMEM_CACHE_DIR"),
+                        help="""
+                        Directory in which to cache the parsed input flash
+                        VMEM file, so that later runs on the same file can
+                        skip parsing it (default: $VMEM_CACHE_DIR, or no
+                        caching).
+                        """)
     parser.add_argument("--otp-data-perm",
                         type=vmem_permutation_string,
                         metavar="<map>",
@@ -387,12 +381,16 @@ def main(argv: List[str]):
 
     # Reformat flash VMEM file to add integrity/reliability ECC and scrambling.
     reformatted_vmem_lines = _reformat_flash_vmem(args.in_flash_vmem,
-                                                  scrambling_configs)
+                                                  scrambling_configs,
+                                                  args.vmem_cache_dir)
 
-    # Write re-formatted output file. Use binary mode and a large buffer size
-    # to improve performance.
+    # Write re-formatted output file as the lines are generated. Use binary
+    # mode and a large buffer size to improve performance.
     with open(args.out_flash_vmem, "wb", buffering=2097152) as of:
-        of.write("\n".join(reformatted_vmem_lines).encode('utf-8'))
+        for idx, line in enumerate(reformatted_vmem_lines):
+            if idx:
+                of.write(b"\n")
+            of.write(line.encode('utf-8'))
 
 
 if __name__ == "__main__":
@@ -5,6 +5,7 @@
 # Version 1.0: Original Version from https://github.com/doegox/python-cryptoplus
 # Version 1.1: Minor modifications to run with Python >= 3.5
 # Version 1.2: Remove string to int conversions
+# Version 1.3: Use byte lookup tables for the S-box and permutation layers
 #
 # =============================================================================
 # Copyright (c) 2008 Christophe Oosterlynck <christophe.oosterlynck_AT_gmail.com>
@@ -93,8 +94,7 @@ class Present:
         state = block
         for i in range(self.rounds - 1):
             state = addRoundKey(state, self.roundkeys[i])
-            state = sBoxLayer(state)
-            state = pLayer(state)
+            state = _spLayer(state)
         cipher = addRoundKey(state, self.roundkeys[-1])
         return cipher
 
@@ -181,6 +181,28 @@ def addRoundKey(state, roundkey):
     return state ^ roundkey
 
 
+def _byteTables(perm):
+    """Byte lookup tables for a bit permutation
+
+        tables[i][b] is the result of permuting byte b at index i"""
+    tables = []
+    for i in range(8):
+        table = [0]
+        for j in range(8):
+            bit = 1 << perm[8 * i + j]
+            table += [entry | bit for entry in table]
+        tables.append(table)
+    return tables
+
+
+Sbox8 = [(Sbox[b >> 4] << 4) | Sbox[b & 0xF] for b in range(256)]
+Sbox8_inv = [(Sbox_inv[b >> 4] << 4) | Sbox_inv[b & 0xF] for b in range(256)]
+PBox8 = _byteTables(PBox)
+PBox8_inv = _byteTables(PBox_inv)
+# The S-box layer followed by the permutation layer
+SPBox8 = [[table[Sbox8[b]] for b in range(256)] for table in PBox8]
+
+
 def sBoxLayer(state):
     """SBox function for encryption
 
@@ -188,8 +210,8 @@ def sBoxLayer(state):
         Output: 64-bit integer"""
 
     output = 0
-    for i in range(16):
-        output += Sbox[(state >> (i * 4)) & 0xF] << (i * 4)
+    for i in range(0, 64, 8):
+        output |= Sbox8[(state >> i) & 0xFF] << i
     return output
 
 
@@ -199,8 +221,8 @@ def sBoxLayer_dec(state):
         Input:  64-bit integer
         Output: 64-bit integer"""
     output = 0
-    for i in range(16):
-        output += Sbox_inv[(state >> (i * 4)) & 0xF] << (i * 4)
+    for i in range(0, 64, 8):
+        output |= Sbox8_inv[(state >> i) & 0xFF] << i
     return output
 
 
@@ -210,8 +232,9 @@ def pLayer(state):
         Input:  64-bit integer
         Output: 64-bit integer"""
     output = 0
-    for i in range(64):
-        output += ((state >> i) & 0x01) << PBox[i]
+    for table in PBox8:
+        output |= table[state & 0xFF]
+        state >>= 8
     return output
 
 
@@ -221,8 +244,21 @@ def pLayer_dec(state):
         Input:  64-bit integer
         Output: 64-bit integer"""
     output = 0
-    for i in range(64):
-        output += ((state >> i) & 0x01) << PBox_inv[i]
+    for table in PBox8_inv:
+        output |= table[state & 0xFF]
+        state >>= 8
+    return output
+
+
+def _spLayer(state):
+    """SBox function followed by permutation layer for encryption
+
+        Input:  64-bit integer
+        Output: 64-bit integer"""
+    output = 0
+    for table in SPBox8:
+        output |= table[state & 0xFF]
+        state >>= 8
     return output
 
 
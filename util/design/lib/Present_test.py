@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+import unittest
+
+import Present
+
+
+def _bitwise_sbox(state, sbox):
+    output = 0
+    for i in range(16):
+        output += sbox[(state >> (i * 4)) & 0xF] << (i * 4)
+    return output
+
+
+def _bitwise_perm(state, pbox):
+    output = 0
+    for i in range(64):
+        output += ((state >> i) & 0x01) << pbox[i]
+    return output
+
+
+class TestPresent(unittest.TestCase):
+
+    def test_known_answers(self):
+        # Test vectors from the PRESENT paper (80-bit keys)
+        vectors = [
+            (0x00000000000000000000, 0x0000000000000000, 0x5579c1387b228445),
+            (0xffffffffffffffffffff, 0x0000000000000000, 0xe72c46c0f5945049),
+            (0x00000000000000000000, 0xffffffffffffffff, 0xa112ffc72f68417b),
+            (0xffffffffffffffffffff, 0xffffffffffffffff, 0x3333dcd3213210d2),
+        ]
+        for key, plain, cipher in vectors:
+            present = Present.Present(key, keylen=80)
+            self.assertEqual(present.encrypt(plain), cipher)
+            self.assertEqual(present.decrypt(cipher), plain)
+
+    def test_layers_match_reference(self):
+        rnd = random.Random(1)
+        for _ in range(100):
+            state = rnd.getrandbits(64)
+            self.assertEqual(Present.sBoxLayer(state),
+                             _bitwise_sbox(state, Present.Sbox))
+            self.assertEqual(Present.sBoxLayer_dec(state),
+                             _bitwise_sbox(state, Present.Sbox_inv))
+            self.assertEqual(Present.pLayer(state),
+                             _bitwise_perm(state, Present.PBox))
+            self.assertEqual(Present.pLayer_dec(state),
+                             _bitwise_perm(state, Present.PBox_inv))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -204,22 +204,36 @@ def is_valid_codeword(config, codeword):
     return sum(syndrome) == 0
 
 
+# Bitmasks for each ECC matrix that ecc_encode has seen
+_ECC_MASKS = {}
+
+
+def _ecc_fanin_masks(ecc_matrix):
+    '''Convert the fanin lists of an ECC matrix to integer bitmasks.'''
+    key = tuple(tuple(fanin) for fanin in ecc_matrix)
+    masks = _ECC_MASKS.get(key)
+    if masks is None:
+        masks = [sum(1 << k for k in fanin) for fanin in key]
+        _ECC_MASKS[key] = masks
+    return masks
+
+
 def ecc_encode(config, dataword):
     '''Calculate and prepend ECC bits.'''
-    if len(dataword) != config['secded']['data_width']:
+    data_width = config['secded']['data_width']
+    if len(dataword) != data_width:
         raise RuntimeError("Invalid codeword length {}".format(len(dataword)))
 
     # Note that certain codes like the Hamming code refer to previously
     # calculated parity bits. Hence, we incrementally build the codeword
     # and extend it such that previously calculated bits can be referenced.
-    codeword = dataword
-    for j, fanin in enumerate(config['secded']['ecc_matrix']):
-        bit = 0
-        for k in fanin:
-            bit ^= int(codeword[config['secded']['data_width'] + j - 1 - k])
-        codeword = str(bit) + codeword
+    masks = _ecc_fanin_masks(config['secded']['ecc_matrix'])
+    codeword = int(dataword, 2)
+    for j, mask in enumerate(masks):
+        bit = (codeword & mask).bit_count() & 1
+        codeword |= bit << (data_width + j)
 
-    return codeword
+    return format(codeword, '0{}b'.format(data_width + len(masks)))
 
 
 def scatter_bits(mask, bits):
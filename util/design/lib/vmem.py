@@ -0,0 +1,241 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""Streaming reader and writer for VMEM files.
+
+A VMEM file (see srec_vmem(5)) is a sequence of lines, each holding an
+address (like @0000a0) and then zero or more hex words. Comments are either
+C-style (/* ... */, which may span lines) or C++-style (// to the end of the
+line).
+
+The reader works a line at a time, so the whole file is never held in memory
+as text. For files that get read over and over again (like flash images that
+are spliced into several bitstreams), load_vmem can keep a binary copy of the
+parsed words in a cache directory. This is keyed by the path, size and
+modification time of the VMEM file, so a later run can skip the hex parsing.
+"""
+
+import hashlib
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+
+from basegen.cache import write_atomic  # noqa : E402
+
+# An address and the words that start there
+VmemLine = Tuple[int, List[int]]
+
+_ADDR_RE = re.compile(r'@([0-9a-fA-F]+)$')
+
+# Bump this if the format of cache files changes
+_CACHE_VERSION = 1
+_CACHE_MAGIC = b'OTVMEM' + bytes([_CACHE_VERSION, 0])
+# Each line in a cache file starts with its address and the number of words.
+_CACHE_LINE_HDR = struct.Struct('<QQ')
+
+
+def strip_comments(lines: Iterable[str]) -> Iterator[str]:
+    '''Remove comments from each of lines
+
+    Yields each line with any comments replaced by a space. This tracks
+    C-style comments that span several lines.
+
+    '''
+    in_comment = False
+    for line in lines:
+        if not in_comment and '/' not in line:
+            yield line
+            continue
+
+        out = []
+        pos = 0
+        while pos < len(line):
+            if in_comment:
+                end = line.find('*/', pos)
+                if end < 0:
+                    pos = len(line)
+                else:
+                    in_comment = False
+                    out.append(' ')
+                    pos = end + 2
+                continue
+
+            start = line.find('/', pos)
+            if start < 0:
+                out.append(line[pos:])
+                break
+            out.append(line[pos:start])
+            nxt = line[start + 1:start + 2]
+            if nxt == '/':
+                break
+            if nxt == '*':
+                in_comment = True
+                pos = start + 2
+            else:
+                out.append('/')
+                pos = start + 1
+
+        yield ''.join(out)
+
+
+def parse_line(width: Optional[int], line: str) -> Optional[VmemLine]:
+    '''Parse a line from a VMEM file with comments removed
+
+    Returns None if the line is blank. Otherwise, returns a pair (addr, words)
+    where addr is the address at the start of the line and words is a list of
+    the words that have been found, parsed to unsigned numbers. If width is
+    not None, each word is checked to make sure that it fits in width bits.
+
+    '''
+    tokens = line.split()
+    if not tokens:
+        return None
+
+    addr_match = _ADDR_RE.match(tokens[0])
+    if addr_match is None:
+        raise ValueError('Bad line format: first token is {!r}, '
+                         'which is not in the right format for an address.'
+                         .format(tokens[0]))
+    addr = int(addr_match.group(1), 16)
+
+    words = []
+    for idx, word_tok in enumerate(tokens[1:]):
+        try:
+            word = int(word_tok, 16)
+        except ValueError:
+            raise ValueError('Word {} of the line is invalid: '
+                             '{!r} is not a hex number.'
+                             .format(idx + 1, word_tok)) from None
+
+        if word < 0 or (width is not None and word >> width):
+            raise ValueError('Word {} of the line is {!r}, which '
+                             'does not fit in an unsigned {}-bit number.'
+                             .format(idx + 1, word_tok, width))
+        words.append(word)
+
+    return (addr, words)
+
+
+def read_vmem(infile: Iterable[str],
+              width: Optional[int] = None) -> Iterator[VmemLine]:
+    '''Read the lines of a VMEM file, one at a time
+
+    Yields a pair (addr, words) for each line that has an address (see
+    parse_line). Blank lines and comments are skipped.
+
+    '''
+    for line in strip_comments(infile):
+        parsed = parse_line(width, line)
+        if parsed is not None:
+            yield parsed
+
+
+def _cache_path(cache_dir: str, path: str, width: int) -> str:
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, width,
+           _CACHE_VERSION)
+    digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'vmem-{digest}.bin')
+
+
+def _read_cache(f: BinaryIO) -> Iterator[VmemLine]:
+    while True:
+        hdr = f.read(_CACHE_LINE_HDR.size)
+        if not hdr:
+            return
+        if len(hdr) != _CACHE_LINE_HDR.size:
+            raise ValueError('Truncated VMEM cache file.')
+        addr, num_words = _CACHE_LINE_HDR.unpack(hdr)
+        words = array('Q')
+        data = f.read(words.itemsize * num_words)
+        if len(data) != words.itemsize * num_words:
+            raise ValueError('Truncated VMEM cache file.')
+        words.frombytes(data)
+        if sys.byteorder != 'little':
+            words.byteswap()
+        yield (addr, words.tolist())
+
+
+def _write_cache(lines: Iterator[VmemLine],
+                 cache_file: str) -> Iterator[VmemLine]:
+    '''Pass through lines, then write them all to cache_file
+
+    The file only appears (atomically) once all the lines have been read. A
+    cache file that can't be written is skipped.
+
+    '''
+    chunks = [_CACHE_MAGIC]
+    for addr, words in lines:
+        words_arr = array('Q', words)
+        if sys.byteorder != 'little':
+            words_arr.byteswap()
+        chunks.append(_CACHE_LINE_HDR.pack(addr, len(words)))
+        chunks.append(words_arr.tobytes())
+        yield (addr, words)
+    write_atomic(cache_file, b''.join(chunks))
+
+
+def load_vmem(path: str,
+              width: Optional[int] = None,
+              cache_dir: Optional[str] = None) -> Iterator[VmemLine]:
+    '''Read the lines of the VMEM file at path, one at a time
+
+    This works like read_vmem. If cache_dir is not None and the words fit in
+    64 bits, the parsed lines are also saved to (or loaded from) a binary
+    cache file in cache_dir.
+
+    '''
+    use_cache = cache_dir is not None and width is not None and width <= 64
+    if not use_cache:
+        with open(path) as infile:
+            yield from read_vmem(infile, width)
+        return
+
+    assert cache_dir is not None and width is not None
+    cache_file = _cache_path(cache_dir, path, width)
+    try:
+        cached = open(cache_file, 'rb')
+    except OSError:
+        pass
+    else:
+        with cached:
+            if cached.read(len(_CACHE_MAGIC)) == _CACHE_MAGIC:
+                yield from _read_cache(cached)
+                return
+
+    with open(path) as infile:
+        yield from _write_cache(read_vmem(infile, width), cache_file)
+
+
+def format_line(addr: int, words: Iterable[int],
+                addr_chars: int, word_chars: int) -> str:
+    '''Format a line of a VMEM file (without a trailing newline)'''
+    return ' '.join([f'@{addr:0{addr_chars}X}'] +
+                    [f'{word:0{word_chars}X}' for word in words])
+
+
+def write_vmem(outfile: TextIO, width: int,
+               base_addr: int, words: List[int]) -> None:
+    '''Write a contiguous list of words as one or more lines to outfile
+
+    width is the maximum width of a word in bits.
+
+    '''
+    next_addr = base_addr + len(words)
+    addr_chars = max(8, (next_addr.bit_length() + 3) // 4)
+    word_chars = (width + 3) // 4
+
+    # Try to wrap at 79 characters. To do this, pick a number of words so
+    # that addr_chars + num_words * (word_chars + 1) fits (note that we
+    # gain a character by adding a @ on the front of the address, but lose
+    # it again by omitting the trailing space after the last word).
+    nwords_on_line = max(1, (79 - addr_chars) // (1 + word_chars))
+    for start_idx in range(0, len(words), nwords_on_line):
+        line_words = words[start_idx:start_idx + nwords_on_line]
+        outfile.write(format_line(base_addr + start_idx, line_words,
+                                  addr_chars, word_chars) + '\n')
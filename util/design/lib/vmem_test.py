@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import io
+import os
+import tempfile
+import unittest
+
+import vmem
+
+_VMEM = '''\
+// A comment on its own line
+@00000000 0123 4567 /* an inline comment */ 89ab
+/* A comment that
+   spans lines */ @00000003 cdef
+
+@10 ffff // a trailing comment
+'''
+
+
+class TestReadVmem(unittest.TestCase):
+
+    def test_comments(self):
+        lines = list(vmem.read_vmem(io.StringIO(_VMEM), 16))
+        self.assertEqual(lines, [(0, [0x0123, 0x4567, 0x89ab]),
+                                 (3, [0xcdef]),
+                                 (0x10, [0xffff])])
+
+    def test_bad_lines(self):
+        with self.assertRaisesRegex(ValueError, 'format for an address'):
+            list(vmem.read_vmem(io.StringIO('0123 4567\n')))
+        with self.assertRaisesRegex(ValueError, 'not a hex number'):
+            list(vmem.read_vmem(io.StringIO('@0 0123 xyz\n')))
+        with self.assertRaisesRegex(ValueError, 'unsigned 8-bit'):
+            list(vmem.read_vmem(io.StringIO('@0 0123\n'), 8))
+
+    def test_write_and_read(self):
+        words = list(range(0, 0x10000, 0x111))
+        out = io.StringIO()
+        vmem.write_vmem(out, 16, 0x20, words)
+        self.assertTrue(all(len(line) <= 79
+                            for line in out.getvalue().splitlines()))
+
+        lines = list(vmem.read_vmem(io.StringIO(out.getvalue()), 16))
+        read_words = []
+        for addr, line_words in lines:
+            self.assertEqual(addr, 0x20 + len(read_words))
+            read_words += line_words
+        self.assertEqual(read_words, words)
+
+
+class TestLoadVmem(unittest.TestCase):
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'test.vmem')
+            cache_dir = os.path.join(tmpdir, 'cache')
+            with open(path, 'w') as f:
+                f.write(_VMEM)
+
+            expected = list(vmem.read_vmem(io.StringIO(_VMEM), 16))
+            self.assertEqual(list(vmem.load_vmem(path, 16, cache_dir)),
+                             expected)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # The second load comes from the cache
+            self.assertEqual(list(vmem.load_vmem(path, 16, cache_dir)),
+                             expected)
+
+            # Changing the file means that we don't use the cache.
+            with open(path, 'a') as f:
+                f.write('@20 1234\n')
+            lines = list(vmem.load_vmem(path, 16, cache_dir))
+            self.assertEqual(lines, expected + [(0x20, [0x1234])])
+
+    def test_unwritable_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'test.vmem')
+            with open(path, 'w') as f:
+                f.write(_VMEM)
+
+            # The cache directory can't be created under a regular file, so
+            # the lines are just read from the VMEM file.
+            cache_dir = os.path.join(path, 'cache')
+            expected = list(vmem.read_vmem(io.StringIO(_VMEM), 16))
+            self.assertEqual(list(vmem.load_vmem(path, 16, cache_dir)),
+                             expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
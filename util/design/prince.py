@@ -4,7 +4,8 @@
 # SPDX-License-Identifier: Apache-2.0
 '''Implementation of PRINCE cipher for use in ROM/FLASH scrambling scripts.'''
 
-from typing import List
+import functools
+from typing import Callable, Iterable, List
 
 PRINCE_SBOX4 = [
     0xb, 0xf, 0x3, 0x2,
@@ -173,3 +174,119 @@ def prince(data: int, key: int, num_rounds_half: int) -> int:
     data ^= k0_prime
 
     return data
+
+
+def _sbox_byte_table(coeffs: List[int]) -> List[int]:
+    '''Apply a 4-bit S-box to both nibbles of each possible byte'''
+    return [(coeffs[b >> 4] << 4) | coeffs[b & 0xf] for b in range(256)]
+
+
+def _linear_tables(fn: Callable[[int], int]) -> List[List[int]]:
+    '''Build byte-sliced tables for a function on 64-bit values
+
+    fn must be linear (over GF(2)), so fn(x) is the XOR of tables[i][b] for
+    each byte b of x at index i.
+
+    '''
+    tables = []
+    for i in range(8):
+        table = [0]
+        for j in range(8):
+            col = fn(1 << (8 * i + j))
+            table += [entry ^ col for entry in table]
+        tables.append(table)
+    return tables
+
+
+_SBOX8 = _sbox_byte_table(PRINCE_SBOX4)
+_SBOX8_INV = _sbox_byte_table(PRINCE_SBOX4_INV)
+
+# Tables for the linear layers of a forward round (M' then ShiftRows) and of an
+# inverse round (inverse ShiftRows then M'), and for M' on its own.
+_FWD_TABLES = _linear_tables(
+    lambda x: prince_shiftrows(prince_mult_prime(x), False))
+_INV_TABLES = _linear_tables(
+    lambda x: prince_mult_prime(prince_shiftrows(x, True)))
+_MID_TABLES = _linear_tables(prince_mult_prime)
+
+# The S-box acts on each byte separately, so we can fold it into the tables for
+# a linear layer that follows it.
+_FWD_SBOX_TABLES = [[table[_SBOX8[b]] for b in range(256)]
+                    for table in _FWD_TABLES]
+_MID_SBOX_TABLES = [[table[_SBOX8[b]] for b in range(256)]
+                    for table in _MID_TABLES]
+
+
+def _apply_tables(tables: List[List[int]], data: int) -> int:
+    ret = 0
+    for table in tables:
+        ret ^= table[data & 0xff]
+        data >>= 8
+    return ret
+
+
+def _apply_sbox8(table: List[int], data: int) -> int:
+    ret = 0
+    for i in range(0, 64, 8):
+        ret |= table[(data >> i) & 0xff] << i
+    return ret
+
+
+class Prince:
+    '''The PRINCE cipher with a fixed key, using lookup tables
+
+    This gives the same results as prince(), but does the per-key work once
+    and replaces the bit and nibble loops of each layer with byte lookups.
+    Use it when encrypting many blocks with the same key.
+
+    '''
+    def __init__(self, key: int, num_rounds_half: int) -> None:
+        assert 0 <= key < (1 << 128)
+        assert 0 <= num_rounds_half <= 5
+
+        k1 = key & ((1 << 64) - 1)
+        k0 = key >> 64
+        k0_rot1 = ((k0 & 1) << 63) | (k0 >> 1)
+        k0_prime = k0_rot1 ^ (k0 >> 63)
+
+        self.num_rounds_half = num_rounds_half
+        self._pre_whiten = k0 ^ k1 ^ PRINCE_ROUND_CONSTS[0]
+        self._post_whiten = PRINCE_ROUND_CONSTS[11] ^ k1 ^ k0_prime
+
+        # The round constant XOR'ed with the round key for each round
+        self._fwd_keys = []
+        for hri in range(num_rounds_half):
+            round_idx = 1 + hri
+            rk = k0 if round_idx & 1 else k1
+            self._fwd_keys.append(PRINCE_ROUND_CONSTS[round_idx] ^ rk)
+        self._inv_keys = []
+        for hri in range(num_rounds_half):
+            round_idx = 11 - num_rounds_half + hri
+            rk = k1 if round_idx & 1 else k0
+            self._inv_keys.append(PRINCE_ROUND_CONSTS[round_idx] ^ rk)
+
+    def encrypt(self, data: int) -> int:
+        assert 0 <= data < (1 << 64)
+
+        data ^= self._pre_whiten
+        for rk in self._fwd_keys:
+            data = _apply_tables(_FWD_SBOX_TABLES, data) ^ rk
+
+        data = _apply_sbox8(_SBOX8_INV,
+                            _apply_tables(_MID_SBOX_TABLES, data))
+
+        for rk in self._inv_keys:
+            data = _apply_sbox8(_SBOX8_INV,
+                                _apply_tables(_INV_TABLES, data ^ rk))
+
+        return data ^ self._post_whiten
+
+    def encrypt_many(self, blocks: Iterable[int]) -> List[int]:
+        '''Encrypt each of blocks, returning the results in order'''
+        return [self.encrypt(block) for block in blocks]
+
+
+@functools.lru_cache(maxsize=16)
+def get_prince(key: int, num_rounds_half: int) -> Prince:
+    '''Get a (cached) Prince object for the given key'''
+    return Prince(key, num_rounds_half)
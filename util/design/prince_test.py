@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+import unittest
+
+from prince import Prince, get_prince, prince
+
+
+class TestPrince(unittest.TestCase):
+
+    def test_known_answers(self):
+        # Test vectors from the PRINCE paper. With k0 = 0, the Dinur key
+        # schedule used here matches the original one.
+        vectors = [
+            (0x0000000000000000, 0, 0x818665aa0d02dfda),
+            (0xffffffffffffffff, 0, 0x604ae6ca03c20ada),
+        ]
+        for plain, key, cipher in vectors:
+            self.assertEqual(prince(plain, key, 5), cipher)
+            self.assertEqual(Prince(key, 5).encrypt(plain), cipher)
+
+    def test_tables_match_reference(self):
+        rnd = random.Random(1)
+        for num_rounds_half in range(6):
+            key = rnd.getrandbits(128)
+            blocks = [rnd.getrandbits(64) for _ in range(100)]
+            expected = [prince(b, key, num_rounds_half) for b in blocks]
+            cipher = get_prince(key, num_rounds_half)
+            self.assertEqual(cipher.encrypt_many(blocks), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
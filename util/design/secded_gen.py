@@ -21,7 +21,7 @@ import random
 import sys
 import hjson
 import subprocess
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 from pathlib import Path
 
 from mako.template import Template
@@ -566,73 +566,186 @@ def verify(cfgs):
 
 def _ecc_pick_code(config: Dict[str, Any], codetype: str, k: int) -> Tuple[int, List[int], int]:
     # first check to see if bit width is supported among configuration
-
-    codes = None
-    bitmasks = None
-    m = None
     for cfg in config['cfgs']:
         if cfg['k'] == k and cfg['code_type'] == codetype:
             m = cfg['m']
-            codes = gen_code(codetype, k, m)
-            bitmasks = calc_bitmasks(k, m, codes, False)
-            invert = 1 if codetype in ['inv_hsiao', 'inv_hamming'] else 0
-            return (m, bitmasks, invert)
+            return _ecc_code(codetype, k, m)
 
     # error if k not supported
     raise Exception(f'ECC for length {k} of type {codetype} unsupported')
 
 
 @functools.lru_cache(maxsize=None)
-def _ecc_encode(k: int,
-                m: int, bitmasks: List[int], invert: int,
-                dataword: int) -> int:
-    assert 0 <= dataword < (1 << k)
+def _ecc_code(codetype: str, k: int, m: int) -> Tuple[int, List[int], int]:
+    codes = gen_code(codetype, k, m)
+    bitmasks = calc_bitmasks(k, m, codes, False)
+    invert = 1 if codetype in ['inv_hsiao', 'inv_hamming'] else 0
+    return (m, bitmasks, invert)
+
 
-    # represent supplied dataword as a binary string
-    word_bin = format(dataword, '0' + str(k) + 'b')
+def _ecc_encode_bitwise(k: int,
+                        m: int, bitmasks: List[int], invert: int,
+                        dataword: int) -> int:
+    '''Calculate the ECC bits for dataword, one bit at a time
 
-    codeword = word_bin
-    for k, mask in enumerate(bitmasks):
-        bit = 0
-        log.debug(f'codeword: {codeword}')
-        log.debug(f'mask: {hex(mask)}')
-        mask = (format(mask, '0' + str(k + m) + 'b'))
+    This is the reference for the lookup tables built by _ecc_tables. The
+    bitmasks of some codes (like Hamming) refer to parity bits that have
+    already been calculated, so the codeword is built up incrementally.
 
-        # reverse codeword for index selection
-        # This is because the LSB is the farthest entry in the string
-        codeword_rev = codeword[::-1]
-        for idx, f in enumerate(mask[::-1]):
-            if int(f):
-                bit ^= int(codeword_rev[idx])
+    '''
+    assert 0 <= dataword < (1 << k)
 
+    codeword = dataword
+    for j, mask in enumerate(bitmasks):
+        bit = bin(codeword & mask).count('1') & 1
         # Add ECC bit inversion if needed (see print_enc function).
-        bit ^= (invert & k % 2)
-        codeword = str(bit) + codeword
+        bit ^= (invert & j % 2)
+        codeword |= bit << (k + j)
     return codeword
 
 
+@functools.lru_cache(maxsize=None)
+def _ecc_tables(k: int,
+                m: int, bitmasks: List[int],
+                invert: int) -> Tuple[int, List[List[int]]]:
+    '''Build byte-sliced lookup tables for a code
+
+    The ECC bits are an affine function of the data, so they can be
+    calculated as the ECC bits of a zero dataword XOR'ed with a contribution
+    from each byte of the data. Returns (ecc0, tables) where ecc0 is the ECC of
+    zero and tables[i][b] is the contribution from byte i having value b.
+
+    '''
+    ecc0 = _ecc_encode_bitwise(k, m, bitmasks, invert, 0) >> k
+    # The contribution of each data bit on its own
+    cols = [(_ecc_encode_bitwise(k, m, bitmasks, invert, 1 << i) >> k) ^ ecc0
+            for i in range(k)]
+
+    tables = []
+    for lsb in range(0, k, 8):
+        table = [0]
+        for i, col in enumerate(cols[lsb:lsb + 8]):
+            table += [entry ^ col for entry in table]
+        tables.append(table)
+    return ecc0, tables
+
+
+def _ecc_calc(ecc0: int, tables: List[List[int]], dataword: int) -> int:
+    '''Calculate the ECC bits of dataword with tables from _ecc_tables'''
+    ecc = ecc0
+    for table in tables:
+        ecc ^= table[dataword & 0xff]
+        dataword >>= 8
+    return ecc
+
+
+@functools.lru_cache(maxsize=None)
+def _ecc_syndromes(k: int,
+                   m: int, bitmasks: List[int],
+                   invert: int) -> Dict[int, int]:
+    '''Map the syndrome of each single bit error to the bit in error'''
+    ecc0, tables = _ecc_tables(k, m, bitmasks, invert)
+    syndromes = {}
+    for i in range(k):
+        syndromes[_ecc_calc(ecc0, tables, 1 << i) ^ ecc0] = i
+    for j in range(m):
+        syndromes[1 << j] = k + j
+    # A SECDED code gives each single bit error a different syndrome.
+    assert len(syndromes) == k + m
+    return syndromes
+
+
 def ecc_encode(config: Dict[str, Any], codetype: str, k: int, dataword: int) -> Tuple[int, int]:
-    log.info(f"Encoding ECC for {hex(dataword)}")
+    log.debug("Encoding ECC for %#x", dataword)
+    assert 0 <= dataword < (1 << k)
 
     m, bitmasks, invert = _ecc_pick_code(config, codetype, k)
-    codeword = _ecc_encode(k, m, bitmasks, invert, dataword)
-
-    # Debug printouts
-    log.debug(f'original hex: {hex(dataword)}')
-    log.debug(f'codeword hex: {hex(int(codeword,2))}')
-    return int(codeword, 2), m
+    ecc0, tables = _ecc_tables(k, m, bitmasks, invert)
+    codeword = dataword | (_ecc_calc(ecc0, tables, dataword) << k)
+    return codeword, m
 
 
 def ecc_encode_some(config: Dict[str, Any],
                     codetype: str,
                     k: int,
-                    datawords: int) -> Tuple[List[int], int]:
+                    datawords: Iterable[int]) -> Tuple[List[int], int]:
     m, bitmasks, invert = _ecc_pick_code(config, codetype, k)
-    codewords = [int(_ecc_encode(k, m, bitmasks, invert, w), 2)
-                 for w in datawords]
+    ecc0, tables = _ecc_tables(k, m, bitmasks, invert)
+    limit = 1 << k
+    codewords = []
+    for w in datawords:
+        assert 0 <= w < limit
+        ecc = ecc0
+        d = w
+        for table in tables:
+            ecc ^= table[d & 0xff]
+            d >>= 8
+        codewords.append(w | (ecc << k))
     return codewords, m
 
 
+def ecc_decode_some(config: Dict[str, Any],
+                    codetype: str,
+                    k: int,
+                    codewords: Iterable[int]) -> Tuple[List[int], List[int]]:
+    '''Check and correct some codewords
+
+    Returns (datawords, errors). errors has an entry for each codeword, which
+    is 0 if the codeword was good, 1 if there was a single bit error (which
+    has been corrected in the dataword) and 2 if there was an uncorrectable
+    error (in which case the dataword is passed through unchanged).
+
+    '''
+    m, bitmasks, invert = _ecc_pick_code(config, codetype, k)
+    ecc0, tables = _ecc_tables(k, m, bitmasks, invert)
+    syndromes = _ecc_syndromes(k, m, bitmasks, invert)
+    data_mask = (1 << k) - 1
+
+    datawords = []
+    errors = []
+    for w in codewords:
+        assert 0 <= w < (1 << (k + m))
+        data = w & data_mask
+        syndrome = _ecc_calc(ecc0, tables, data) ^ (w >> k)
+        err = 0
+        if syndrome:
+            bit = syndromes.get(syndrome)
+            if bit is None:
+                err = 2
+            else:
+                err = 1
+                if bit < k:
+                    data ^= 1 << bit
+        datawords.append(data)
+        errors.append(err)
+    return datawords, errors
+
+
+def ecc_check_tables(config: Dict[str, Any], num_words: int = 1000) -> int:
+    '''Check the lookup tables against the bit-at-a-time encoder
+
+    Encodes num_words random datawords (and some with a single bit set) for
+    each configured code with both encoders and logs any mismatches. Returns
+    the number of mismatches.
+
+    '''
+    rnd = random.Random(_RND_SEED)
+    errors = 0
+    for cfg in config['cfgs']:
+        codetype, k = cfg['code_type'], cfg['k']
+        m, bitmasks, invert = _ecc_pick_code(config, codetype, k)
+        words = [0, (1 << k) - 1] + [1 << i for i in range(k)]
+        words += [rnd.getrandbits(k) for _ in range(num_words)]
+        fast, _ = ecc_encode_some(config, codetype, k, words)
+        for word, got in zip(words, fast):
+            exp = _ecc_encode_bitwise(k, m, bitmasks, invert, word)
+            if got != exp:
+                errors += 1
+                log.error(f"{codetype} ({k + m}, {k}) mismatch for "
+                          f"{hex(word)}: {hex(got)} != {hex(exp)}")
+    return errors
+
+
 def gen_code(codetype, k, m):
     # The hsiao_code generator uses (pseudo)random values to pick good ECC
     # constants. Rather than exposing the seed, we pick a fixed one here to
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+import unittest
+
+import secded_gen
+
+# Codewords for each configuration in data/secded_cfg.hjson, as calculated by
+# the original string-based encoder. Entries are (codetype, k, [(dataword,
+# codeword), ...]).
+_KNOWN_CODEWORDS = [
+    ('hsiao', 16, [(0x5a5a, 0x175a5a), (0xc3c3, 0x3ac3c3)]),
+    ('hsiao', 22, [(0x1a5a5a, 0x11a5a5a), (0x3c3c3, 0x3c3c3)]),
+    ('hsiao', 32, [(0x5a5a5a5a, 0x6a5a5a5a5a), (0xc3c3c3c3, 0x17c3c3c3c3)]),
+    ('hsiao', 57,
+     [(0x5a5a5a5a5a5a5a, 0xf05a5a5a5a5a5a5a),
+      (0x1c3c3c3c3c3c3c3, 0x69c3c3c3c3c3c3c3)]),
+    ('hsiao', 64,
+     [(0x5a5a5a5a5a5a5a5a, 0x955a5a5a5a5a5a5a5a),
+      (0xc3c3c3c3c3c3c3c3, 0x60c3c3c3c3c3c3c3c3)]),
+    ('hamming', 16, [(0x5a5a, 0x395a5a), (0xc3c3, 0x3c3c3)]),
+    ('hamming', 32, [(0x5a5a5a5a, 0x6a5a5a5a5a), (0xc3c3c3c3, 0x41c3c3c3c3)]),
+    ('hamming', 64,
+     [(0x5a5a5a5a5a5a5a5a, 0x2e5a5a5a5a5a5a5a5a),
+      (0xc3c3c3c3c3c3c3c3, 0xe2c3c3c3c3c3c3c3c3)]),
+    ('hamming', 68,
+     [(0xa5a5a5a5a5a5a5a5a, 0xaca5a5a5a5a5a5a5a5a),
+      (0x3c3c3c3c3c3c3c3c3, 0x633c3c3c3c3c3c3c3c3)]),
+    ('inv_hsiao', 16, [(0x5a5a, 0x3d5a5a), (0xc3c3, 0x10c3c3)]),
+    ('inv_hsiao', 22, [(0x1a5a5a, 0xb9a5a5a), (0x3c3c3, 0xa83c3c3)]),
+    ('inv_hsiao', 32,
+     [(0x5a5a5a5a, 0x405a5a5a5a),
+      (0xc3c3c3c3, 0x3dc3c3c3c3)]),
+    ('inv_hsiao', 57,
+     [(0x5a5a5a5a5a5a5a, 0xa45a5a5a5a5a5a5a),
+      (0x1c3c3c3c3c3c3c3, 0x3dc3c3c3c3c3c3c3)]),
+    ('inv_hsiao', 64,
+     [(0x5a5a5a5a5a5a5a5a, 0x3f5a5a5a5a5a5a5a5a),
+      (0xc3c3c3c3c3c3c3c3, 0xcac3c3c3c3c3c3c3c3)]),
+    ('inv_hamming', 16, [(0x5a5a, 0x135a5a), (0xc3c3, 0x29c3c3)]),
+    ('inv_hamming', 32,
+     [(0x5a5a5a5a, 0x5a5a5a5a),
+      (0xc3c3c3c3, 0x2bc3c3c3c3)]),
+    ('inv_hamming', 64,
+     [(0x5a5a5a5a5a5a5a5a, 0x45a5a5a5a5a5a5a5a),
+      (0xc3c3c3c3c3c3c3c3, 0xc8c3c3c3c3c3c3c3c3)]),
+    ('inv_hamming', 68,
+     [(0xa5a5a5a5a5a5a5a5a, 0x86a5a5a5a5a5a5a5a5a),
+      (0x3c3c3c3c3c3c3c3c3, 0x493c3c3c3c3c3c3c3c3)]),
+]
+
+
+class TestEccTables(unittest.TestCase):
+
+    def setUp(self):
+        self.config = secded_gen.load_secded_config()
+        self.rnd = random.Random(1)
+
+    def test_tables_match_bitwise(self):
+        self.assertEqual(secded_gen.ecc_check_tables(self.config, 100), 0)
+
+    def test_known_codewords(self):
+        configs = {(cfg['code_type'], cfg['k']) for cfg in self.config['cfgs']}
+        self.assertEqual({(c, k) for c, k, _ in _KNOWN_CODEWORDS}, configs)
+
+        for codetype, k, pairs in _KNOWN_CODEWORDS:
+            datawords = [d for d, _ in pairs]
+            codewords = [c for _, c in pairs]
+            got, _ = secded_gen.ecc_encode_some(self.config, codetype, k,
+                                                datawords)
+            self.assertEqual(got, codewords, (codetype, k))
+            for dataword, codeword in pairs:
+                got_one, _ = secded_gen.ecc_encode(self.config, codetype, k,
+                                                   dataword)
+                self.assertEqual(got_one, codeword, (codetype, k))
+
+    def test_decode(self):
+        for cfg in self.config['cfgs']:
+            codetype, k, m = cfg['code_type'], cfg['k'], cfg['m']
+            datawords = [self.rnd.getrandbits(k) for _ in range(50)]
+            codewords, _ = secded_gen.ecc_encode_some(self.config, codetype,
+                                                      k, datawords)
+
+            decoded = secded_gen.ecc_decode_some(self.config, codetype, k,
+                                                 codewords)
+            self.assertEqual(decoded, (datawords, [0] * len(datawords)))
+
+            # Flip one bit of each codeword (which should be corrected)
+            flipped = [w ^ (1 << self.rnd.randrange(k + m))
+                       for w in codewords]
+            decoded = secded_gen.ecc_decode_some(self.config, codetype, k,
+                                                 flipped)
+            self.assertEqual(decoded, (datawords, [1] * len(datawords)))
+
+            # Flip two bits of each codeword (which should be detected)
+            flipped = []
+            for w in codewords:
+                i, j = self.rnd.sample(range(k + m), 2)
+                flipped.append(w ^ (1 << i) ^ (1 << j))
+            _, errors = secded_gen.ecc_decode_some(self.config, codetype, k,
+                                                   flipped)
+            self.assertEqual(errors, [2] * len(datawords))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ from pathlib import Path
 from typing import Dict, Optional, Union
 
 import reggen.gen_rtl
+from basegen.templates import get_lookup
 from mako import exceptions as mako_exceptions  # type: ignore
 from mako.lookup import TemplateLookup as MakoTemplateLookup  # type: ignore
 from reggen.countermeasure import CounterMeasure
@@ -94,8 +95,8 @@ class IpTemplateRendererBase:
             # this directory using relative paths.
             # Use strict_undefined to throw a NameError if undefined variables
             # are used within a template.
-            self._lookup = MakoTemplateLookup(
-                directories=[str(self.ip_template.template_path)],
+            self._lookup = get_lookup(
+                [str(self.ip_template.template_path)],
                 strict_undefined=True)
         return self._lookup
 
@@ -20,6 +20,8 @@ environment variables:
   RV32_TOOL_AS       path to RV32 as
   RV32_TOOL_AR       path to RV32 ar
   RV32_TOOL_OBJCOPY  path to RV32 objcopy
+  OTBN_AS_CACHE_DIR  cache directory for sources transformed by otbn_as.py
+                     (an empty value disables the cache)
 
   The RV32* environment variables are used by both this script and the OTBN
   wrappers (otbn_as.py and otbn_ld.py) to find tools in a RV32 toolchain.
@@ -41,6 +43,7 @@ import shlex
 import subprocess
 import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Optional, Tuple
 import re
@@ -267,6 +270,13 @@ def main() -> int:
         required=False,
         help="Use when input files have already been assembled into object "
         "files and only linking is required.")
+    parser.add_argument(
+        '--jobs',
+        '-j',
+        type=int,
+        default=1,
+        help="Number of source files to assemble in parallel "
+        "(default: %(default)s)")
     parser.add_argument('src_files', nargs='+', type=str, metavar='SRC_FILE')
     args = parser.parse_args()
 
@@ -294,8 +304,16 @@ def main() -> int:
 
     try:
         if not args.no_assembler:
-            for src_file, obj_file in zip(src_files, obj_files):
-                call_otbn_as(src_file, obj_file)
+            # Each source is assembled separately, so they can be assembled in
+            # parallel. Since otbn_as.py runs in-process, use worker processes
+            # rather than threads.
+            if args.jobs > 1 and len(src_files) > 1:
+                with ProcessPoolExecutor(min(args.jobs,
+                                             len(src_files))) as pool:
+                    list(pool.map(call_otbn_as, src_files, obj_files))
+            else:
+                for src_file, obj_file in zip(src_files, obj_files):
+                    call_otbn_as(src_file, obj_file)
 
         out_elf = out_dir / (app_name + '.elf')
         call_otbn_ld(obj_files, out_elf, linker_script=args.linker_script)
@@ -8,9 +8,9 @@ import os
 from typing import Dict, Optional, Tuple
 
 from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 import importlib.resources
 
+from basegen.templates import get_template
 from reggen.ip_block import IpBlock
 from reggen.lib import check_int
 from reggen.multi_register import MultiRegister
@@ -91,10 +91,10 @@ def get_reg_tx_type(block: IpBlock, reg: RegBase, hw2reg: bool) -> str:
 
 def gen_rtl(block: IpBlock, outdir: str) -> int:
     # Read Register templates
-    reg_top_tpl = Template(
-        filename=str(importlib.resources.files('reggen') / 'reg_top.sv.tpl'))
-    reg_pkg_tpl = Template(
-        filename=str(importlib.resources.files('reggen') / 'reg_pkg.sv.tpl'))
+    reg_top_tpl = get_template(
+        str(importlib.resources.files('reggen') / 'reg_top.sv.tpl'))
+    reg_pkg_tpl = get_template(
+        str(importlib.resources.files('reggen') / 'reg_pkg.sv.tpl'))
 
     # In case the generated package contains alias definitions, we add
     # the alias implementation identifier to the package name so that it
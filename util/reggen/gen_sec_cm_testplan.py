@@ -8,9 +8,9 @@ from pathlib import Path
 
 import hjson  # type: ignore
 from mako import exceptions  # type: ignore
-from mako.lookup import TemplateLookup  # type: ignore
 import importlib.resources
 
+from basegen.templates import get_lookup
 from reggen.ip_block import IpBlock
 
 
@@ -51,8 +51,7 @@ def gen_sec_cm_testplan(block: IpBlock, outdir: str) -> int:
 
         return 0
 
-    lookup = TemplateLookup(
-        directories=[str(importlib.resources.files('reggen'))])
+    lookup = get_lookup([str(importlib.resources.files('reggen'))])
     sec_cm_testplan_tpl = lookup.get_template('sec_cm_testplan.hjson.tpl')
     with open(outfile, 'w', encoding='UTF-8') as f:
         try:
@@ -0,0 +1,165 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''An on-disk cache of parsed and validated IpBlock objects
+
+Parsing an IP block's hjson and building the register model is the largest
+fixed cost of running regtool, and topgen does it for every block in every
+pass. An IpBlockCache keeps a pickled copy of each IpBlock that it builds,
+keyed by a hash of:
+
+  - the hjson text, the parameter defaults, the node and where
+  - the alias definitions (if any) applied to the block
+  - any vendor-specific optional fields that have been registered
+  - the reggen sources themselves (so changing reggen invalidates the cache)
+  - the Python version
+
+The cache directory is $REGGEN_CACHE_DIR if that is set (an empty value
+disables the cache) and otherwise "opentitan/reggen" in the user's cache
+directory. An entry that can't be loaded is ignored and rebuilt.
+
+'''
+
+import hashlib
+import logging as log
+import os
+import pickle
+import sys
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import hjson  # type: ignore
+from basegen.cache import user_cache_dir, write_atomic
+
+from reggen import field, ip_block, multi_register, register, window
+from reggen.ip_block import IpBlock
+
+CACHE_DIR_ENV = 'REGGEN_CACHE_DIR'
+
+# Bump this if the format of a cache entry changes
+_CACHE_VERSION = 1
+
+# An alias to apply to a block: (scrub, raw alias hjson, where)
+AliasT = Tuple[bool, object, str]
+
+
+@lru_cache(maxsize=None)
+def _reggen_fingerprint() -> str:
+    '''A hash of the Python sources of reggen'''
+    reggen_dir = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(reggen_dir)):
+        if not name.endswith('.py'):
+            continue
+        h.update(name.encode('utf-8') + b'\0')
+        with open(os.path.join(reggen_dir, name), 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def _vendor_fields() -> str:
+    '''The optional fields that are allowed (which vendors can extend)'''
+    return repr([sorted(mod.OPTIONAL_FIELDS.items())
+                 for mod in [ip_block, register, multi_register, field,
+                             window]])
+
+
+class IpBlockCache:
+    '''Loads IpBlock objects, using a cache directory if there is one'''
+
+    def __init__(self, cache_dir: Optional[str]) -> None:
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def from_env(enabled: bool = True) -> 'IpBlockCache':
+        '''Make a cache that uses the default directory (see above)
+
+        If enabled is false, the cache doesn't store anything.
+
+        '''
+        return IpBlockCache(user_cache_dir(CACHE_DIR_ENV, 'reggen')
+                            if enabled else None)
+
+    def _entry_path(self,
+                    txt: str,
+                    param_defaults: Sequence[Tuple[str, str]],
+                    where: str,
+                    node: str,
+                    alias: Optional[AliasT]) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+
+        alias_key = None
+        if alias is not None:
+            scrub, alias_raw, alias_where = alias
+            alias_key = (scrub,
+                         hjson.dumps(alias_raw,
+                                     sort_keys=True,
+                                     use_decimal=True),
+                         alias_where)
+        key = (_CACHE_VERSION, sys.version, _reggen_fingerprint(),
+               _vendor_fields(), list(param_defaults), where, node,
+               alias_key)
+
+        h = hashlib.sha256()
+        h.update(repr(key).encode('utf-8'))
+        h.update(txt.encode('utf-8'))
+        return os.path.join(self.cache_dir,
+                            'ip_block-{}.pickle'.format(h.hexdigest()))
+
+    @staticmethod
+    def _load(path: str) -> Optional[IpBlock]:
+        try:
+            with open(path, 'rb') as f:
+                block = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as err:
+            log.debug('Ignoring bad IpBlock cache entry at %s: %s',
+                      path, err)
+            return None
+        return block if isinstance(block, IpBlock) else None
+
+    def from_text(self,
+                  txt: str,
+                  param_defaults: Sequence[Tuple[str, str]],
+                  where: str,
+                  node: str = '',
+                  alias: Optional[AliasT] = None) -> IpBlock:
+        '''Load an IpBlock from an hjson description in txt
+
+        This works like IpBlock.from_text. If alias is not None, it is a
+        triple (scrub, raw, where) that is applied to the block with
+        IpBlock.alias_from_raw. Each call returns a new IpBlock object, so
+        the caller is free to modify it.
+
+        '''
+        path = self._entry_path(txt, param_defaults, where, node, alias)
+        if path is not None:
+            block = IpBlockCache._load(path)
+            if block is not None:
+                return block
+
+        block = IpBlock.from_text(txt, list(param_defaults), where, node)
+        if alias is not None:
+            block.alias_from_raw(*alias)
+
+        if path is not None:
+            try:
+                data = pickle.dumps(block, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as err:
+                log.debug('Cannot cache IpBlock from %s: %s', where, err)
+            else:
+                write_atomic(path, data)
+
+        return block
+
+    def from_path(self,
+                  path: str,
+                  param_defaults: Sequence[Tuple[str, str]],
+                  alias: Optional[AliasT] = None) -> IpBlock:
+        '''Load an IpBlock from an hjson description in a file at path'''
+        with open(path, 'r', encoding='utf-8') as handle:
+            return self.from_text(handle.read(), param_defaults,
+                                  'file at {!r}'.format(path),
+                                  alias=alias)
@@ -6,22 +6,37 @@ r"""Command-line tool to validate and convert register hjson
 
 """
 import argparse
+import json
 import logging as log
+import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
 
+import hjson  # type: ignore
 from reggen import (
     gen_cfg_md, gen_cheader, gen_dv, gen_fpv, gen_md, gen_html, gen_json, gen_rtl,
     gen_rust, gen_sec_cm_testplan, gen_selfdoc, systemrdl_exporter, gen_tock, version,
     vendor_specific
 )
 from reggen.ip_block import IpBlock
+from reggen.ip_block_cache import IpBlockCache
 
 import version_file
 
 DESC = """regtool, generate register info from Hjson source"""
 
+# The formats that can be used with --batch. The value is true if the format
+# writes to a directory, rather than a single file.
+BATCH_FORMATS = {
+    'hjson': False, 'json': False, 'compact': False, 'registers': False,
+    'interfaces': False, 'doc_html_old': False, 'cdh': False, 'rs': False,
+    'trs': False, 'systemrdl': False,
+    'rtl': True, 'dv': True, 'fpv': True, 'sec_cm_testplan': True
+}
+
 USAGE = '''
   regtool [options]
   regtool [options] <input>
@@ -30,6 +45,155 @@ USAGE = '''
 '''
 
 
+def _source_license(srcfull: str) -> Tuple[Optional[str], str]:
+    '''Find the license and copyright lines in the source hjson'''
+    src_lic = None
+    src_copy = ''
+    found_spdx = None
+    found_lunder = None
+    copy = re.compile(r'.*(copyright.*)|(.*\(c\).*)', re.IGNORECASE)
+    # REUSE-IgnoreStart
+    spdx = re.compile(r'.*(SPDX-License-Identifier:.+)')
+    # REUSE-IgnoreEnd
+    lunder = re.compile(r'.*(Licensed under.+)', re.IGNORECASE)
+    for line in srcfull.splitlines():
+        mat = copy.match(line)
+        if mat is not None:
+            src_copy += mat.group(1)
+        mat = spdx.match(line)
+        if mat is not None:
+            found_spdx = mat.group(1)
+        mat = lunder.match(line)
+        if mat is not None:
+            found_lunder = mat.group(1)
+    if found_lunder:
+        src_lic = found_lunder
+    if found_spdx:
+        src_lic += '\n' + found_spdx
+    return (src_lic, src_copy)
+
+
+def gen_output(obj: IpBlock, fmt: str, outfile: Optional[TextIO],
+               outdir: Optional[str], args: argparse.Namespace,
+               srcfull: str, version_stamp: version_file.VersionInformation) -> int:
+    '''Generate the output in format fmt for the (validated) block obj
+
+    If the format writes to a directory, this is outdir. Otherwise, the
+    output is written to outfile, which is closed afterwards.
+
+    '''
+    if fmt == 'rtl':
+        return gen_rtl.gen_rtl(obj, outdir)
+    if fmt == 'sec_cm_testplan':
+        return gen_sec_cm_testplan.gen_sec_cm_testplan(obj, outdir)
+    if fmt == 'dv':
+        return gen_dv.gen_dv(obj, args.dv_base_names, outdir)
+    if fmt == 'fpv':
+        return gen_fpv.gen_fpv(obj, outdir)
+
+    src_lic, src_copy = _source_license(srcfull)
+
+    with outfile:
+        if fmt == 'registers':
+            return gen_md.gen_md(obj, outfile)
+        elif fmt == 'interfaces':
+            # Assumes the registers will be in a file called `registers.md`
+            # and within the same location as the output's destination.
+            # Exposing this as an option would nice to do.
+            return gen_cfg_md.gen_cfg_md(obj, outfile, "registers.md")
+        elif fmt == 'doc_html_old':
+            return gen_html.gen_html(obj, outfile)
+        elif fmt == 'cdh':
+            return gen_cheader.gen_cdefines(obj, outfile, src_lic,
+                                            src_copy)
+        elif fmt == 'rs':
+            return gen_rust.gen_rust(obj, outfile, src_lic, src_copy)
+        elif fmt == 'trs':
+            return gen_tock.gen_tock(obj, outfile, args.input.name, src_lic,
+                                     src_copy, version_stamp)
+        elif fmt == 'systemrdl':
+            return systemrdl_exporter.SystemrdlExporter(obj).export(outfile)
+        else:
+            return gen_json.gen_json(obj, outfile, fmt)
+
+        outfile.write('\n')
+
+
+def _dir_snapshot(path: str) -> Dict[str, Tuple[int, int]]:
+    ret = {}
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            st = os.stat(file_path)
+            ret[file_path] = (st.st_mtime_ns, st.st_size)
+    return ret
+
+
+def run_batch(obj: IpBlock, outputs: List[Tuple[str, str, bool]],
+              jobs: int, manifest_path: Optional[str],
+              args: argparse.Namespace, srcfull: str,
+              version_stamp: version_file.VersionInformation) -> int:
+    '''Generate several outputs from a single parsed block
+
+    outputs is a list of triples (fmt, path, is_dir). If is_dir is true,
+    the format writes to a directory at path (which is created if
+    necessary). Otherwise, it writes to a file at path. With jobs > 1, the
+    outputs are generated in a pool of that many threads.
+
+    If manifest_path is not None, a JSON file is written there, listing the
+    exit status of each output and every file that the batch wrote.
+
+    Returns zero if every output was generated successfully.
+
+    '''
+    out_dirs = sorted({path for _, path, is_dir in outputs if is_dir})
+    for path in out_dirs:
+        os.makedirs(path, exist_ok=True)
+    before: Dict[str, Tuple[int, int]] = {}
+    for path in out_dirs:
+        before.update(_dir_snapshot(path))
+
+    def gen_one(fmt: str, path: str, is_dir: bool) -> int:
+        try:
+            if is_dir:
+                status = gen_output(obj, fmt, None, path, args, srcfull,
+                                    version_stamp)
+            else:
+                outfile = open(path, 'w', encoding='UTF-8')
+                status = gen_output(obj, fmt, outfile, None, args, srcfull,
+                                    version_stamp)
+        except Exception as err:
+            log.error('Failed to generate {} output at {}: {}'
+                      .format(fmt, path, err))
+            return 1
+        return 1 if status else 0
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(lambda out: gen_one(*out), outputs))
+    else:
+        results = [gen_one(*out) for out in outputs]
+
+    if manifest_path is not None:
+        after: Dict[str, Tuple[int, int]] = {}
+        for path in out_dirs:
+            after.update(_dir_snapshot(path))
+        files = {path for _, path, is_dir in outputs if not is_dir}
+        files.update(f for f, stamp in after.items() if before.get(f) != stamp)
+
+        manifest = {
+            'input': args.input.name,
+            'outputs': [{'format': fmt, 'path': path, 'status': status}
+                        for (fmt, path, _), status in zip(outputs, results)],
+            'files': sorted(files)
+        }
+        with open(manifest_path, 'w', encoding='UTF-8') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+
+    return 1 if any(results) else 0
+
+
 def main():
     verbose = 0
 
@@ -153,6 +317,30 @@ def main():
                         type=str,
                         default=None,
                         help='A hjson file describing vendor defined fields.')
+    parser.add_argument('--batch',
+                        action='append',
+                        metavar='FORMAT=PATH',
+                        help='Generate an output as part of a batch, which '
+                        'parses the input once. Give this once for each '
+                        'output. FORMAT is one of {}. The formats that '
+                        'write to a directory (rtl, dv, fpv, '
+                        'sec_cm_testplan) take a directory as PATH; the '
+                        'others take a file.'
+                        .format(', '.join(sorted(BATCH_FORMATS))))
+    parser.add_argument('--batch-jobs',
+                        type=int,
+                        default=1,
+                        help='Number of threads to use for --batch.')
+    parser.add_argument('--batch-manifest',
+                        type=str,
+                        default=None,
+                        help='With --batch, write a JSON manifest listing '
+                        'each output and the files it wrote to this path.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Don\'t use the on-disk cache of parsed IP '
+                        'blocks (stored in $REGGEN_CACHE_DIR, which defaults '
+                        'to ~/.cache/opentitan/reggen).')
 
     args = parser.parse_args()
 
@@ -194,6 +382,28 @@ def main():
                           'command line ({} and {}).'.format(fmt, spec[0]))
                 sys.exit(1)
             fmt, dirspec = spec
+
+    # Parse the list of outputs for --batch into triples (fmt, path, is_dir)
+    batch_outputs = []
+    if args.batch:
+        if fmt is not None or args.outdir is not None or \
+           args.outfile is not sys.stdout or args.novalidate:
+            log.error('--batch cannot be used with an output format, '
+                      '--outdir, --outfile or --novalidate.')
+            sys.exit(1)
+        for entry in args.batch:
+            batch_fmt, sep, path = entry.partition('=')
+            if not sep or not path or batch_fmt not in BATCH_FORMATS:
+                log.error('Bad --batch output {!r}: expected FORMAT=PATH, '
+                          'where FORMAT is one of {}.'
+                          .format(entry, ', '.join(sorted(BATCH_FORMATS))))
+                sys.exit(1)
+            batch_outputs.append((batch_fmt, path,
+                                  BATCH_FORMATS[batch_fmt]))
+    elif args.batch_manifest is not None:
+        log.error('--batch-manifest is only meaningful with --batch.')
+        sys.exit(1)
+
     if fmt is None:
         fmt = 'hjson'
 
@@ -250,87 +460,41 @@ def main():
 
     srcfull = infile.read()
 
-    try:
-        obj = IpBlock.from_text(srcfull, params, infile.name, args.node)
-    except ValueError as err:
-        log.error(str(err))
-        exit(1)
-
-    # Parse and validate alias register definitions (this ensures that the
-    # structure of the original register node and the alias register file is
-    # identical).
+    # Alias register definitions are parsed and validated along with the
+    # block (this ensures that the structure of the original register node
+    # and the alias register file is identical).
+    alias = None
     if args.alias is not None:
         try:
-            obj.alias_from_path(args.scrub, args.alias)
+            with open(args.alias, 'r', encoding='utf-8') as handle:
+                alias_raw = hjson.loads(handle.read(), use_decimal=True)
         except ValueError as err:
             log.error(str(err))
             exit(1)
-    else:
-        if args.scrub:
-            raise ValueError('The --scrub argument is only meaningful in '
-                             'combination with the --alias argument')
+        alias = (args.scrub, alias_raw,
+                 'alias file at {!r}'.format(args.alias))
+    elif args.scrub:
+        raise ValueError('The --scrub argument is only meaningful in '
+                         'combination with the --alias argument')
+
+    block_cache = IpBlockCache.from_env(not args.no_cache)
+    try:
+        obj = block_cache.from_text(srcfull, params, infile.name, args.node,
+                                    alias)
+    except ValueError as err:
+        log.error(str(err))
+        exit(1)
 
     if args.novalidate:
         with outfile:
             gen_json.gen_json(obj, outfile, fmt)
             outfile.write('\n')
+    elif batch_outputs:
+        return run_batch(obj, batch_outputs, args.batch_jobs,
+                         args.batch_manifest, args, srcfull, version_stamp)
     else:
-        if fmt == 'rtl':
-            return gen_rtl.gen_rtl(obj, outdir)
-        if fmt == 'sec_cm_testplan':
-            return gen_sec_cm_testplan.gen_sec_cm_testplan(obj, outdir)
-        if fmt == 'dv':
-            return gen_dv.gen_dv(obj, args.dv_base_names, outdir)
-        if fmt == 'fpv':
-            return gen_fpv.gen_fpv(obj, outdir)
-        src_lic = None
-        src_copy = ''
-        found_spdx = None
-        found_lunder = None
-        copy = re.compile(r'.*(copyright.*)|(.*\(c\).*)', re.IGNORECASE)
-        # REUSE-IgnoreStart
-        spdx = re.compile(r'.*(SPDX-License-Identifier:.+)')
-        # REUSE-IgnoreEnd
-        lunder = re.compile(r'.*(Licensed under.+)', re.IGNORECASE)
-        for line in srcfull.splitlines():
-            mat = copy.match(line)
-            if mat is not None:
-                src_copy += mat.group(1)
-            mat = spdx.match(line)
-            if mat is not None:
-                found_spdx = mat.group(1)
-            mat = lunder.match(line)
-            if mat is not None:
-                found_lunder = mat.group(1)
-        if found_lunder:
-            src_lic = found_lunder
-        if found_spdx:
-            src_lic += '\n' + found_spdx
-
-        with outfile:
-            if fmt == 'registers':
-                return gen_md.gen_md(obj, outfile)
-            elif fmt == 'interfaces':
-                # Assumes the registers will be in a file called `registers.md`
-                # and within the same location as the output's destination.
-                # Exposing this as an option would nice to do.
-                return gen_cfg_md.gen_cfg_md(obj, outfile, "registers.md")
-            elif fmt == 'doc_html_old':
-                return gen_html.gen_html(obj, outfile)
-            elif fmt == 'cdh':
-                return gen_cheader.gen_cdefines(obj, outfile, src_lic,
-                                                src_copy)
-            elif fmt == 'rs':
-                return gen_rust.gen_rust(obj, outfile, src_lic, src_copy)
-            elif fmt == 'trs':
-                return gen_tock.gen_tock(obj, outfile, infile.name, src_lic,
-                                         src_copy, version_stamp)
-            elif fmt == 'systemrdl':
-                return systemrdl_exporter.SystemrdlExporter(obj).export(outfile)
-            else:
-                return gen_json.gen_json(obj, outfile, fmt)
-
-            outfile.write('\n')
+        return gen_output(obj, fmt, outfile, outdir, args, srcfull,
+                          version_stamp)
 
 
 if __name__ == '__main__':
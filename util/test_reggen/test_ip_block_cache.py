@@ -0,0 +1,78 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+import unittest
+
+from reggen.ip_block_cache import IpBlockCache
+
+BLOCK = '''
+{
+  name: "foo",
+  cip_id: "99",
+  version: "1.0.0",
+  clocking: [{clock: "clk_i", reset: "rst_ni"}],
+  bus_interfaces: [{ protocol: "tlul", direction: "device" }],
+  regwidth: "32",
+  registers: [
+    { name: "CTRL",
+      desc: "Control register",
+      swaccess: "rw",
+      hwaccess: "hro",
+      fields: [{ bits: "%s", name: "EN", desc: "Enable" }]
+    }
+  ]
+}
+'''
+
+
+class TestIpBlockCache(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = self._tmpdir.name
+        self.cache = IpBlockCache(self.cache_dir)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _entries(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_hit(self):
+        block = self.cache.from_text(BLOCK % '0', [], 'test')
+        self.assertEqual(len(self._entries()), 1)
+
+        cached = self.cache.from_text(BLOCK % '0', [], 'test')
+        self.assertIsNot(cached, block)
+        self.assertEqual(cached.name, 'foo')
+        self.assertEqual(cached.reg_blocks[None].registers[0].name, 'CTRL')
+        self.assertEqual(len(self._entries()), 1)
+
+    def test_key(self):
+        self.cache.from_text(BLOCK % '0', [], 'test')
+        block = self.cache.from_text(BLOCK % '1', [], 'test')
+        self.assertEqual(block.reg_blocks[None].registers[0].fields[0].bits.lsb,
+                         1)
+        self.cache.from_text(BLOCK % '0', [], 'other')
+        self.assertEqual(len(self._entries()), 3)
+
+    def test_bad_entry(self):
+        self.cache.from_text(BLOCK % '0', [], 'test')
+        entry, = self._entries()
+        with open(os.path.join(self.cache_dir, entry), 'wb') as f:
+            f.write(b'not a pickle')
+
+        block = self.cache.from_text(BLOCK % '0', [], 'test')
+        self.assertEqual(block.name, 'foo')
+
+    def test_disabled(self):
+        block = IpBlockCache(None).from_text(BLOCK % '0', [], 'test')
+        self.assertEqual(block.name, 'foo')
+        self.assertEqual(self._entries(), [])
+
+    def test_error_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.cache.from_text(BLOCK % '40', [], 'test')
+        self.assertEqual(self._entries(), [])
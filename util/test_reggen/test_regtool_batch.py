@@ -0,0 +1,111 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import List
+
+UTIL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGTOOL = os.path.join(UTIL_DIR, 'regtool.py')
+UART_HJSON = os.path.join(os.path.dirname(UTIL_DIR),
+                          'hw', 'ip', 'uart', 'data', 'uart.hjson')
+
+# Single-file formats in a batch and the regtool flag that selects each one
+# on its own.
+FILE_FORMATS = [('json', '-j'), ('compact', '-c'), ('registers', '-d'),
+                ('cdh', '-D'), ('rs', '-R'), ('trs', '--tock'),
+                ('systemrdl', '--systemrdl')]
+
+
+def _regtool(args: List[str]) -> None:
+    subprocess.run([sys.executable, REGTOOL, '--no-cache'] + args,
+                   check=True)
+
+
+def _read_dir(path: str) -> dict:
+    ret = {}
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            with open(file_path, 'rb') as f:
+                ret[os.path.relpath(file_path, path)] = f.read()
+    return ret
+
+
+class TestRegtoolBatch(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmp = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _single_outputs(self) -> dict:
+        '''Generate each format with its own regtool run'''
+        ret = {}
+        for fmt, flag in FILE_FORMATS:
+            path = os.path.join(self.tmp, 'single.' + fmt)
+            _regtool([flag, '-o', path, UART_HJSON])
+            with open(path, 'rb') as f:
+                ret[fmt] = f.read()
+        rtl_dir = os.path.join(self.tmp, 'single_rtl')
+        os.mkdir(rtl_dir)
+        _regtool(['-r', '-t', rtl_dir, UART_HJSON])
+        ret['rtl'] = _read_dir(rtl_dir)
+        return ret
+
+    def _batch_outputs(self, name: str, extra: List[str]) -> dict:
+        '''Generate every format with one batch run'''
+        args = []
+        for fmt, _ in FILE_FORMATS:
+            args += ['--batch',
+                     '{}={}'.format(fmt, os.path.join(self.tmp, name + fmt))]
+        rtl_dir = os.path.join(self.tmp, name + 'rtl')
+        args += ['--batch', 'rtl=' + rtl_dir]
+
+        # The input file comes after the --batch options, to check that they
+        # don't swallow it.
+        _regtool(args + extra + [UART_HJSON])
+
+        ret = {}
+        for fmt, _ in FILE_FORMATS:
+            with open(os.path.join(self.tmp, name + fmt), 'rb') as f:
+                ret[fmt] = f.read()
+        ret['rtl'] = _read_dir(rtl_dir)
+        return ret
+
+    def test_batch_matches_single(self):
+        single = self._single_outputs()
+        self.assertTrue(single['rtl'])
+        self.assertEqual(self._batch_outputs('serial.', []), single)
+        self.assertEqual(self._batch_outputs('parallel.',
+                                             ['--batch-jobs', '4']),
+                         single)
+
+    def test_manifest(self):
+        manifest_path = os.path.join(self.tmp, 'manifest.json')
+        cdh_path = os.path.join(self.tmp, 'uart.h')
+        rtl_dir = os.path.join(self.tmp, 'rtl')
+        _regtool(['--batch', 'cdh=' + cdh_path, '--batch', 'rtl=' + rtl_dir,
+                  '--batch-manifest', manifest_path, UART_HJSON])
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['outputs'],
+                         [{'format': 'cdh', 'path': cdh_path, 'status': 0},
+                          {'format': 'rtl', 'path': rtl_dir, 'status': 0}])
+        rtl_files = [os.path.join(rtl_dir, name)
+                     for name in _read_dir(rtl_dir)]
+        self.assertEqual(manifest['files'], sorted([cdh_path] + rtl_files))
+
+    def test_bad_output(self):
+        proc = subprocess.run([sys.executable, REGTOOL, '--no-cache',
+                               '--batch', 'nonsense', UART_HJSON],
+                              stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertNotEqual(proc.returncode, 0)
+        self.assertIn("Bad --batch output 'nonsense'", proc.stderr)
@@ -8,9 +8,10 @@ import logging as log
 from typing import Any, List, Tuple
 
 from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 import importlib.resources
 
+from basegen.templates import get_template
+
 from .xbar import Xbar
 
 
@@ -20,14 +21,14 @@ def generate(xbar: Xbar, library_name: str = "ip") -> List[Tuple[str, Any]]:
     This assumes that the model has been elaborated already. Returns a list of
     pairs of files to write, each in the form (path, contents).
     """
-    xbar_rtl_tpl = Template(
-        filename=str(importlib.resources.files('tlgen') / 'xbar.rtl.sv.tpl'))
-    xbar_pkg_tpl = Template(
-        filename=str(importlib.resources.files('tlgen') / 'xbar.pkg.sv.tpl'))
-    xbar_core_tpl = Template(
-        filename=str(importlib.resources.files('tlgen') / 'xbar.core.tpl'))
-    xbar_hjson_tpl = Template(
-        filename=str(importlib.resources.files('tlgen') / 'xbar.hjson.tpl'))
+    xbar_rtl_tpl = get_template(
+        str(importlib.resources.files('tlgen') / 'xbar.rtl.sv.tpl'))
+    xbar_pkg_tpl = get_template(
+        str(importlib.resources.files('tlgen') / 'xbar.pkg.sv.tpl'))
+    xbar_core_tpl = get_template(
+        str(importlib.resources.files('tlgen') / 'xbar.core.tpl'))
+    xbar_hjson_tpl = get_template(
+        str(importlib.resources.files('tlgen') / 'xbar.hjson.tpl'))
     try:
         out_rtl = xbar_rtl_tpl.render(xbar=xbar)
         out_pkg = xbar_pkg_tpl.render(xbar=xbar)
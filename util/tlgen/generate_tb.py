@@ -8,9 +8,10 @@ import logging as log
 from pathlib import Path
 
 from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 import importlib.resources
 
+from basegen.templates import get_template
+
 from .xbar import Xbar
 
 
@@ -25,7 +26,7 @@ def generate_tb(xbar: Xbar,
     ]
 
     for fname in tb_files:
-        tpl = Template(filename=str(importlib.resources.files('tlgen') / (fname + '.tpl')))
+        tpl = get_template(str(importlib.resources.files('tlgen') / (fname + '.tpl')))
 
         # some files need to be renamed
         if fname == "xbar.sim.core":
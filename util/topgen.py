@@ -7,6 +7,7 @@ r"""Top Module Generator
 import argparse
 from dataclasses import dataclass
 import logging as log
+import multiprocessing
 import os
 import shutil
 import sys
@@ -19,6 +20,7 @@ from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 import hjson
 import tlgen
 import version_file
+from basegen.templates import get_lookup, get_template
 from basegen.typing import ConfigT, ParamsT
 from design.lib.OtpMemMap import OtpMemMap
 from design.lib.LcStEnc import LcStEnc
@@ -26,12 +28,11 @@ from ipgen import (IpBlockRenderer, IpConfig, IpDescriptionOnlyRenderer,
                    IpTemplate, TemplateRenderError)
 from ipgen.clkmgr_gen import get_clkmgr_params
 from mako import exceptions
-from mako.lookup import TemplateLookup
-from mako.template import Template
 from raclgen.lib import DEFAULT_RACL_CONFIG
 from reggen import access, gen_rtl, gen_sec_cm_testplan, params, reg_block, window, vendor_specific
 from reggen.countermeasure import CounterMeasure
 from reggen.ip_block import IpBlock
+from reggen.ip_block_cache import AliasT, IpBlockCache
 from topgen import get_hjsonobj_xbars
 from topgen import intermodule as im
 from topgen import lib as lib
@@ -41,6 +42,8 @@ from topgen.c_test import TopGenCTest
 from topgen.clocks import Clocks
 from topgen.gen_dv import gen_dv
 from topgen.gen_top_docs import gen_top_docs
+from topgen.incremental import (MANIFEST_NAME, GenManifest, fingerprint,
+                                hash_inputs, hash_tree, source_fingerprint)
 from topgen.lib import find_module, find_modules, load_cfg, write_file_secure, get_ipgen_params
 from topgen.merge import (
     amend_alert, amend_interrupt, amend_pinmux_io, amend_racl,
@@ -75,6 +78,12 @@ TOPGEN_TEMPLATE_PATH = SRCTREE_TOP / "util" / "topgen" / "templates"
 IP_RAW_PATH = SRCTREE_TOP / "hw" / "ip"
 IP_TEMPLATES_PATH = SRCTREE_TOP / "hw" / "ip_templates"
 
+# Generator sources. Any change to these invalidates the incremental
+# generation manifest (see --incremental).
+GENERATOR_PATHS = tuple(SRCTREE_TOP / "util" / d
+                        for d in ("basegen", "ipgen", "reggen", "tlgen",
+                                  "topgen", "topgen.py"))
+
 
 @dataclass
 class Seed:
@@ -102,6 +111,71 @@ class UniquifiedModules(object):
 
 uniquified_modules = UniquifiedModules()
 
+# Parsed IP blocks are cached on disk unless --no-reggen-cache is passed (see
+# main, which sets the cache directory).
+ip_block_cache = IpBlockCache(None)
+
+# Rendered ipgen hjson descriptions, keyed by a fingerprint of the template
+# and its parameters. Most blocks see the same parameters in every
+# generation pass, so they only need rendering once.
+ipgen_desc_cache: Dict[str, str] = {}
+
+
+# A render job returns an error message, or None on success.
+RenderJobT = Callable[..., Optional[str]]
+
+
+class RenderJobs:
+    """Runs independent render jobs, possibly in parallel.
+
+    With jobs <= 1, each job runs as soon as it is submitted. Otherwise,
+    jobs are queued and finish() runs them in a pool of worker processes.
+
+    Either way, the on_done callbacks run in this process, in the order that
+    the jobs were submitted. If any jobs fail, their errors are logged in
+    the order that the jobs were submitted and the program exits.
+    """
+
+    def __init__(self, jobs: int = 1) -> None:
+        self.jobs = jobs
+        self._queue: List[Tuple[RenderJobT, Tuple[object, ...],
+                                Optional[Callable[[], None]]]] = []
+
+    def submit(self, func: RenderJobT, args: Tuple[object, ...],
+               on_done: Optional[Callable[[], None]] = None) -> None:
+        self._queue.append((func, args, on_done))
+        if self.jobs <= 1:
+            self.finish()
+
+    @staticmethod
+    def _run(job: Tuple[RenderJobT, Tuple[object, ...]]) -> Optional[str]:
+        func, args = job
+        return func(*args)
+
+    def finish(self) -> None:
+        """Run any queued jobs and wait for them to complete."""
+        queue = self._queue
+        self._queue = []
+        if not queue:
+            return
+
+        jobs = [(func, args) for func, args, _ in queue]
+        if self.jobs <= 1 or len(queue) == 1:
+            errors = [RenderJobs._run(job) for job in jobs]
+        else:
+            with multiprocessing.Pool(min(self.jobs, len(queue))) as pool:
+                errors = pool.map(RenderJobs._run, jobs)
+
+        failed = False
+        for (_, _, on_done), error in zip(queue, errors):
+            if error is not None:
+                log.error(error)
+                failed = True
+            elif on_done is not None:
+                on_done()
+        if failed:
+            sys.exit(1)
+
 
 class IpAttrs(NamedTuple):
     """Hold IP block, and path to hjson."""
@@ -133,51 +207,91 @@ def _ipgen_render_prelude(template_name: str, topname: str,
 
 
 def ipgen_hjson_render(template_name: str, topname: str,
-                       params: ParamsT) -> IpBlock:
+                       params: ParamsT,
+                       alias: Optional[AliasT] = None) -> IpBlock:
     """ Render an IP hjson template for a specific toplevel using ipgen.
 
     Renders the hjson template as a string and returns an IpBlock
-    constructed from it.
+    constructed from it. If alias is not None, it is applied to the block
+    (see IpBlock.alias_from_raw). The rendered string is reused if the same
+    template has already been rendered with the same parameters.
 
     Aborts the program execution in case of an error.
     """
-    (_module_name, ip_template,
+    (module_name, ip_template,
      ip_config) = _ipgen_render_prelude(template_name, topname, params)
 
+    desc_key = fingerprint([template_name, ip_config.instance_name,
+                            ip_config.param_values])
+    ip_desc = ipgen_desc_cache.get(desc_key)
+    if ip_desc is None:
+        log.info(f"Rendering ipgen description for {module_name}")
+        try:
+            ip_desc = IpDescriptionOnlyRenderer(ip_template,
+                                                ip_config).render()
+        except TemplateRenderError as e:
+            log.error(e.verbose_str())
+            sys.exit(1)
+        ipgen_desc_cache[desc_key] = ip_desc
+    else:
+        log.debug(f"Parameters for {module_name} are unchanged, "
+                  "reusing its ipgen description")
+    return ip_block_cache.from_text(
+        ip_desc, [], f"ipgen description from {ip_template.template_path}",
+        alias=alias)
+
+
+def _ipgen_render_job(ip_template: IpTemplate, ip_config: IpConfig,
+                      ip_out_path: Path) -> Optional[str]:
     try:
-        ip_desc = IpDescriptionOnlyRenderer(ip_template, ip_config).render()
+        renderer = IpBlockRenderer(ip_template, ip_config)
+        renderer.render(ip_out_path, overwrite_output_dir=True)
     except TemplateRenderError as e:
-        log.error(e.verbose_str())
-        sys.exit(1)
-    return IpBlock.from_text(
-        ip_desc, [], f"ipgen description from {ip_template.template_path}")
+        return e.verbose_str()
+    return None
 
 
 def ipgen_render(template_name: str, topname: str, params: ParamsT,
-                 out_path: Path) -> None:
+                 out_path: Path,
+                 manifest: Optional[GenManifest] = None,
+                 jobs: Optional[RenderJobs] = None) -> None:
     """ Render an IP template for a specific toplevel using ipgen.
 
     The generated IP block is placed in the "ip_autogen" directory of the
-    toplevel.
+    toplevel. If manifest is not None, rendering is skipped if the template
+    and parameters are unchanged since the block was last rendered. If jobs
+    is not None, the render is submitted to it rather than run immediately.
 
     Aborts the program execution in case of an error.
     """
     (module_name, ip_template,
      ip_config) = _ipgen_render_prelude(template_name, topname, params)
+    ip_out_path = out_path / "ip_autogen" / module_name
+
+    if manifest is not None:
+        step = f"ipgen:{module_name}"
+        input_hash = hash_inputs(source_fingerprint(*GENERATOR_PATHS),
+                                 hash_tree(ip_template.template_path),
+                                 ip_config.instance_name,
+                                 ip_config.param_values)
+        if manifest.is_fresh(step, input_hash):
+            log.info(f"{module_name} is up to date, skipping ipgen")
+            return
 
-    try:
-        renderer = IpBlockRenderer(ip_template, ip_config)
-        renderer.render(out_path / "ip_autogen" / module_name,
-                        overwrite_output_dir=True)
-    except TemplateRenderError as e:
-        log.error(e.verbose_str())
-        sys.exit(1)
+    def on_done() -> None:
+        if manifest is not None:
+            manifest.record(step, input_hash, [ip_out_path])
+
+    if jobs is None:
+        jobs = RenderJobs()
+    jobs.submit(_ipgen_render_job, (ip_template, ip_config, ip_out_path),
+                on_done)
 
 
 def generate_top(top: ConfigT, name_to_block: IpBlocksT, tpl_filename: str,
                  **kwargs: Dict[str, object]) -> None:
-    top_tpl = Template(filename=tpl_filename,
-                       lookup=TemplateLookup([TOPGEN_TEMPLATE_PATH, "/"]))
+    top_tpl = get_template(tpl_filename,
+                           lookup=get_lookup([TOPGEN_TEMPLATE_PATH, "/"]))
 
     try:
         return top_tpl.render(top=top, name_to_block=name_to_block, **kwargs)
@@ -224,14 +338,28 @@ def configure_xbars(top: ConfigT) -> None:
         obj["inter_signal_list"] = inter_signal_list
 
 
-def generate_xbars(top: ConfigT, out_path: Path) -> None:
-    """Re-run validate and elaborate to generate the Xbar objects."""
+def generate_xbars(top: ConfigT, out_path: Path,
+                   manifest: Optional[GenManifest] = None) -> None:
+    """Re-run validate and elaborate to generate the Xbar objects.
+
+    If manifest is not None, an xbar is skipped if its configuration is
+    unchanged since it was last generated.
+    """
     top_name = "top_" + top["name"]
     gencmd = (f"// util/topgen.py -t hw/{top_name}/data/{top_name}.hjson "
               f"-o hw/{top_name}/\n\n")
 
     for obj in top["xbar"]:
         objname = obj["name"]
+        if manifest is not None:
+            step = f"xbar:{objname}"
+            input_hash = hash_inputs(source_fingerprint(*GENERATOR_PATHS),
+                                     top_name,
+                                     hjson.dumps(obj, for_json=True))
+            if manifest.is_fresh(step, input_hash):
+                log.info(f"xbar {objname} is up to date, skipping")
+                continue
+
         log.info(f"generating xbar {objname}")
         xbar_path = out_path / "ip" / f"xbar_{objname}" / "data" / "autogen"
         xbar_path.mkdir(parents=True, exist_ok=True)
@@ -265,9 +393,16 @@ def generate_xbars(top: ConfigT, out_path: Path) -> None:
         # generate testbench for xbar
         tlgen.generate_tb(xbar, dv_path, top_name)
 
+        if manifest is not None:
+            manifest.record(step, input_hash,
+                            [xbar_hjson_path, dv_path] +
+                            [ip_path / filename for filename, _ in results])
+
 
 def generate_ipgen(top: ConfigT, module: ConfigT, params: ParamsT,
-                   out_path: Path) -> None:
+                   out_path: Path,
+                   manifest: Optional[GenManifest] = None,
+                   jobs: Optional[RenderJobs] = None) -> None:
     topname = top["name"]
     template_name = module["template_type"]
     module_name = module["type"]
@@ -281,7 +416,8 @@ def generate_ipgen(top: ConfigT, module: ConfigT, params: ParamsT,
         raise ValueError(
             f"Unexpected uniquified name: expected {module_instance_name}, "
             f"got {uniq_name}")
-    ipgen_render(module["template_type"], topname, params, out_path)
+    ipgen_render(module["template_type"], topname, params, out_path,
+                 manifest, jobs)
 
 
 def _get_alert_handler_params(top: ConfigT, name: str) -> ParamsT:
@@ -441,10 +577,20 @@ def _get_rv_plic_params(top: ConfigT, name: str) -> ParamsT:
     return ipgen_params
 
 
+def _generate_regfile_job(hjson_path: Path,
+                          generated_rtl_path: Path) -> Optional[str]:
+    try:
+        generate_regfile_from_path(hjson_path, generated_rtl_path)
+    except SystemExit as e:
+        if e.code:
+            return f"Failed to generate registers from {hjson_path}"
+    return None
+
+
 def generate_regfile_from_path(hjson_path: Path,
                                generated_rtl_path: Path) -> None:
     """Generate RTL register file from path and check countermeasure labels"""
-    obj = IpBlock.from_path(str(hjson_path), [])
+    obj = ip_block_cache.from_path(str(hjson_path), [])
 
     # If this block has countermeasures, we grep for RTL annotations in
     # all .sv implementation files and check whether they match up
@@ -822,18 +968,22 @@ def _get_basic_ipgen_params(topcfg: Dict[str, object], template_type: str) -> Di
 
 
 def generate_top_only(top_only_dict: List[str], out_path: Path, top_name: str,
-                      alt_hjson_path: str) -> None:
+                      alt_hjson_path: str,
+                      jobs: Optional[RenderJobs] = None) -> None:
     """Generate the regfile for top_only IPs."""
     log.info("Generating top only modules")
+    if jobs is None:
+        jobs = RenderJobs()
 
-    for ip in top_only_dict:
+    for ip in sorted(top_only_dict):
         ip_out_path = out_path / "ip" / ip
         hjson_path = ip_out_path / "data" / f"{ip}.hjson"
         genrtl_dir = ip_out_path / "rtl"
         genrtl_dir.mkdir(parents=True, exist_ok=True)
         log.info(f"Generating registers for top module {ip}, hjson: "
                  f"{hjson_path}, output: {genrtl_dir}")
-        generate_regfile_from_path(hjson_path, genrtl_dir)
+        jobs.submit(_generate_regfile_job, (hjson_path, genrtl_dir))
+    jobs.finish()
 
 
 def generate_top_ral(topname: str, top: ConfigT, name_to_block: IpBlocksT,
@@ -1098,11 +1248,11 @@ def create_generic_ip_blocks(topcfg: ConfigT,
                 hjson_path = alt_path
         attrs = ip_attrs.get(ip_type)
         if attrs is None:
-            ip_block = IpBlock.from_path(str(hjson_path), [])
             alias = alias_cfgs.get(ip_type)
-            if alias is not None:
-                ip_block.alias_from_raw(
-                    False, alias, f"alias file for {ip_type}")
+            ip_block = ip_block_cache.from_path(
+                str(hjson_path), [],
+                alias=(None if alias is None else
+                       (False, alias, f"alias file for {ip_type}")))
             attrs = IpAttrs(ip_block=ip_block,
                             hjson_path=hjson_path,
                             top_only=top_only,
@@ -1134,11 +1284,11 @@ def create_generic_ip_blocks(topcfg: ConfigT,
 def create_ipgen_ip_block(topname: str, template_name: str, module_name: str,
                           params: ParamsT,
                           alias_cfgs: Dict[str, ConfigT]) -> IpBlock:
-    ip_block = ipgen_hjson_render(template_name, topname, params)
+    alias = None
     if module_name in alias_cfgs:
-        ip_block.alias_from_raw(False, alias_cfgs[module_name],
-                                f"alias file for {module_name}")
-    return ip_block
+        alias = (False, alias_cfgs[module_name],
+                 f"alias file for {module_name}")
+    return ipgen_hjson_render(template_name, topname, params, alias)
 
 
 def create_ipgen_blocks(topcfg: ConfigT, alias_cfgs: Dict[str, ConfigT],
@@ -1332,7 +1482,17 @@ def complete_topcfg(topcfg: ConfigT, name_to_block: IpBlocksT) -> None:
 def generate_full_ipgens(args: argparse.Namespace, topcfg: ConfigT,
                          name_to_block: Dict[str, ConfigT],
                          alias_cfgs: Dict[str, ConfigT], cfg_path: Path,
-                         out_path: Path) -> None:
+                         out_path: Path,
+                         manifest: Optional[GenManifest] = None,
+                         jobs: Optional[RenderJobs] = None) -> None:
+    """Generate all the ipgen blocks in topcfg.
+
+    The parameters for each block are computed in order (since they may use
+    the topgen RNG). If jobs is not None, the renders themselves are
+    submitted to it and run in parallel.
+    """
+    if jobs is None:
+        jobs = RenderJobs()
 
     # TODO, there are no interdependencies between ips so do them in any
     # order, which means could just iterate over all in the topcfg.
@@ -1350,7 +1510,7 @@ def generate_full_ipgens(args: argparse.Namespace, topcfg: ConfigT,
                 params = get_params(*args)
             else:
                 params = _get_basic_ipgen_params(topcfg, template_type)
-            generate_ipgen(topcfg, module, params, out_path)
+            generate_ipgen(topcfg, module, params, out_path, manifest, jobs)
 
     ipgens_by_template_type = defaultdict(list)
     for m in topcfg["module"]:
@@ -1364,6 +1524,7 @@ def generate_full_ipgens(args: argparse.Namespace, topcfg: ConfigT,
        not args.xbar_only:
         generate_modules("rv_plic", single_instance=False, get_params=_get_rv_plic_params)
     if args.plic_only:
+        jobs.finish()
         sys.exit()
 
     # Generate Alert Handler if there is an instance
@@ -1372,6 +1533,7 @@ def generate_full_ipgens(args: argparse.Namespace, topcfg: ConfigT,
                          single_instance=False,
                          get_params=_get_alert_handler_params)
     if args.alert_handler_only:
+        jobs.finish()
         sys.exit()
 
     # Generate outgoing alerts
@@ -1409,6 +1571,8 @@ def generate_full_ipgens(args: argparse.Namespace, topcfg: ConfigT,
     if "racl_config" in topcfg:
         generate_modules("racl_ctrl", single_instance=True, get_params=_get_racl_params)
 
+    jobs.finish()
+
 
 def _check_countermeasures(completecfg: ConfigT, name_to_block: IpBlocksT,
                            name_to_hjson: Dict[str, Path]) -> bool:
@@ -1437,8 +1601,11 @@ def dump_completecfg(cfg: ConfigT, out_path: Path) -> None:
     seed_mode = cfg['seed']['topgen_seed'].seed_mode
     secretgenhjson_path = cfg_dir / f"{top_name}.secrets.{seed_mode}.gen.hjson"
 
-    # Sanitize the top config and create separate files for secrets
-    dump_cfg = deepcopy(cfg)
+    # Sanitize the top config and create separate files for secrets. Only
+    # the top-level dict and the module dicts are modified below, so shallow
+    # copies of those are enough to leave cfg untouched.
+    dump_cfg = dict(cfg)
+    dump_cfg["module"] = [dict(module) for module in cfg["module"]]
 
     # Seed goes into the secrets file
     secret_cfg = {}
@@ -1448,7 +1615,7 @@ def dump_completecfg(cfg: ConfigT, out_path: Path) -> None:
     # Filter params list for secret params and move that to the secrets file
     for module in dump_cfg["module"]:
         secret_params = [p for p in module["param_list"] if p.get("randtype")]
-        module["param_list"][:] = [p for p in module["param_list"] if not p.get("randtype")]
+        module["param_list"] = [p for p in module["param_list"] if not p.get("randtype")]
 
         if secret_params:
             # Pass a minimal set of information of a module such that tools that
@@ -1477,6 +1644,38 @@ def dump_completecfg(cfg: ConfigT, out_path: Path) -> None:
     write_file_secure(secretgenhjson_path, secrets_content)
 
 
+def _cfg_fingerprints(cfg: ConfigT) -> List[Tuple[str, str]]:
+    """Fingerprint each part of a complete top config.
+
+    Returns a list of (part, fingerprint) pairs in the order of the config.
+    Each module is a part (named "module:<name>") and each other top-level
+    key is a part on its own.
+    """
+    fps = []
+    for key, value in cfg.items():
+        if key == "module":
+            fps += [(f"module:{module['name']}", fingerprint(module))
+                    for module in value]
+        else:
+            fps.append((key, fingerprint(value)))
+    return fps
+
+
+def _changed_cfg_parts(old_fps: List[Tuple[str, str]],
+                       new_fps: List[Tuple[str, str]]) -> List[str]:
+    """Return the names of the parts that differ between two fingerprints.
+
+    An empty list means that the configs match.
+    """
+    old_dict = dict(old_fps)
+    new_dict = dict(new_fps)
+    changed = [part for part, fp in new_fps if old_dict.get(part) != fp]
+    changed += [part for part, _ in old_fps if part not in new_dict]
+    if not changed and old_fps != new_fps:
+        changed = ["(ordering)"]
+    return changed
+
+
 def main():
     parser = argparse.ArgumentParser(prog="topgen")
     parser.add_argument("--topcfg",
@@ -1584,6 +1783,26 @@ def main():
                         action="store_true",
                         help="Only return the list of blocks and exit.")
 
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes to use for rendering ipgen blocks "
+        "and register files for top-only IPs. The output is the same as "
+        "with a single process (the default).")
+    parser.add_argument(
+        "--no-reggen-cache",
+        action="store_true",
+        help="Don't use the on-disk cache of parsed IP blocks (stored in "
+        "$REGGEN_CACHE_DIR, which defaults to ~/.cache/opentitan/reggen).")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip generation steps (ipgen blocks and xbars) whose inputs "
+        "and outputs are unchanged since the last run. The hashes of these "
+        f"are stored in {MANIFEST_NAME} in the output directory.")
+
     parser.add_argument('--vendor-specific-fields',
                         type=str,
                         default=None,
@@ -1630,6 +1849,10 @@ def main():
 
     out_path = Path(outdir)
     cfg_path = Path(args.topcfg).parents[1]
+    manifest = GenManifest(out_path) if args.incremental else None
+    ip_block_cache.cache_dir = IpBlockCache.from_env(
+        not args.no_reggen_cache).cache_dir
+    render_jobs = RenderJobs(args.jobs)
 
     topcfg = load_cfg(args.topcfg)
 
@@ -1711,7 +1934,7 @@ def main():
 
     topname = topcfg["name"]
     cfg_copy = deepcopy(topcfg)
-    cfg_last_dump = None
+    cfg_last_fps = None
     for pass_idx in range(maximum_passes):
         log.info("Generation pass {}".format(pass_idx + 1))
         # Use the same seed for each pass to have stable random constants.
@@ -1723,13 +1946,16 @@ def main():
             cfg_copy, args, cfg_path, out_path_gen, alias_cfgs)
         # Delete config path before dumping, not needed
         del completecfg["cfg_path"]
-        cfg_dump = hjson.dumps(completecfg, for_json=True, default=vars)
-        if pass_idx > 0 and cfg_dump == cfg_last_dump:
-            log.info("process_top converged after {} passes".format(pass_idx +
-                                                                    1))
-            break
-        else:
-            cfg_last_dump = cfg_dump
+        cfg_fps = _cfg_fingerprints(completecfg)
+        if cfg_last_fps is not None:
+            changed = _changed_cfg_parts(cfg_last_fps, cfg_fps)
+            if not changed:
+                log.info("process_top converged after {} passes".format(
+                    pass_idx + 1))
+                break
+            log.info("Pass {} changed {}".format(pass_idx + 1,
+                                                 ", ".join(changed)))
+        cfg_last_fps = cfg_fps
         cfg_copy = completecfg
     else:
         log.error("Too many process_top passes without convergence")
@@ -1769,12 +1995,13 @@ def main():
         m["type"]
         for m in completecfg["module"] if lib.is_top_reggen(m)
     }
-    generate_top_only(top_only_ips, out_path, top_name, args.hjson_path)
+    generate_top_only(top_only_ips, out_path, top_name, args.hjson_path,
+                      render_jobs)
     # Re-set the seed because generate_full_ipgens uses the same RNG again from the beginning
     SecurePrngFactory.create("topgen", topcfg["seed"]["topgen_seed"].value)
 
     generate_full_ipgens(args, completecfg, name_to_block, alias_cfgs,
-                         cfg_path, out_path)
+                         cfg_path, out_path, manifest, render_jobs)
 
     if args.get_blocks:
         print("\n".join(name_to_block.keys()))
@@ -1782,7 +2009,7 @@ def main():
 
     # Generate xbars
     if not args.no_xbar or args.xbar_only:
-        generate_xbars(completecfg, out_path)
+        generate_xbars(completecfg, out_path, manifest)
 
     # Generate Rust toplevel definitions
     if not args.no_rust:
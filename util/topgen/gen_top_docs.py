@@ -5,9 +5,10 @@
 r"""Top Module Documentation Generator
 """
 from tabulate import tabulate
-from mako.template import Template
 from pathlib import Path
 
+from basegen.templates import get_template
+
 from .lib import find_module
 
 TABLE_HEADER = '''<!--
@@ -223,7 +224,7 @@ def gen_memory_map_docs(top, c_helper, out_path):
               "-o hw/top_{topname}/".format(topname=top["name"]))
 
     template_path = Path(__file__).parent / "templates" / "memory_map.md.tpl"
-    template = Template(filename=str(template_path))
+    template = get_template(str(template_path))
 
     memory_map_content = template.render(
         top=top,
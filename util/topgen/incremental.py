@@ -0,0 +1,195 @@
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+"""Support for incremental generation in topgen.
+
+Each generation step (rendering an ipgen block, generating an xbar, ...) has
+a name and a hash of everything that goes into it. A manifest file in the
+output tree records, for each step, the input hash that was last used and
+a hash of each file that the step wrote. On the next run, a step whose input
+hash matches and whose outputs are all still present and unchanged can be
+skipped.
+"""
+
+import hashlib
+import json
+import logging as log
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import hjson
+
+# Bump this if the format of the manifest changes (or if the way that input
+# hashes are computed changes, which will cause every step to run again).
+MANIFEST_VERSION = 1
+MANIFEST_NAME = ".topgen_manifest.json"
+
+# File suffixes that are treated as generator sources by source_fingerprint
+_SOURCE_SUFFIXES = (".py", ".tpl")
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hash of the contents of a file, as hex."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _tree_files(path: Path) -> Iterable[Path]:
+    if path.is_file():
+        return [path]
+    return sorted(p for p in path.rglob("*")
+                  if p.is_file() and "__pycache__" not in p.parts)
+
+
+def hash_tree(path: Path,
+              suffixes: Optional[Iterable[str]] = None) -> str:
+    """Return a hash of the names and contents of the files under path.
+
+    If suffixes is not None, only files whose names end with one of the
+    suffixes are included.
+    """
+    sfx = tuple(suffixes) if suffixes is not None else None
+    h = hashlib.sha256()
+    for file_path in _tree_files(path):
+        if sfx is not None and not file_path.name.endswith(sfx):
+            continue
+        h.update(str(file_path.relative_to(path)).encode("utf-8") + b"\0")
+        h.update(hash_file(file_path).encode("ascii"))
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def source_fingerprint(*paths: Path) -> str:
+    """Return a hash of the Python sources and templates under paths.
+
+    This is used as an input to every step, so that editing a generator or
+    one of its templates causes the generated files to be rewritten.
+    """
+    return hash_inputs(*(hash_tree(p, _SOURCE_SUFFIXES) for p in paths))
+
+
+def _to_json(obj: object) -> object:
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    return str(obj)
+
+
+def _to_fingerprint_json(obj: object) -> object:
+    # Match the hjson encoder used for the generated files, which serializes
+    # objects with an _asdict method through that.
+    if hasattr(obj, "_asdict"):
+        return obj._asdict()
+    return _to_json(obj)
+
+
+def hash_inputs(*inputs: object) -> str:
+    """Return a hash of some Hjson-serializable objects.
+
+    Objects that are not serializable by default are serialized through
+    their attribute dictionaries (or as strings, if they have none).
+    """
+    text = hjson.dumps(list(inputs),
+                       for_json=True,
+                       default=_to_json,
+                       sort_keys=True,
+                       use_decimal=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def fingerprint(obj: object) -> str:
+    """Return a cheap hash of a JSON-like object, for in-process comparison.
+
+    Unlike hash_inputs, this doesn't sort keys (so dictionaries that differ
+    only in their ordering have different fingerprints) and uses the faster
+    json encoder. That makes it suitable for spotting changes between two
+    passes of the same run, but not for storing in a manifest.
+    """
+    text = json.dumps(obj, default=_to_fingerprint_json)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class GenManifest:
+    """The manifest of generation steps for an output tree."""
+
+    def __init__(self, out_path: Path) -> None:
+        self.out_path = out_path
+        self.path = out_path / MANIFEST_NAME
+        self.steps: Dict[str, Dict[str, object]] = {}
+
+        try:
+            with self.path.open(encoding="UTF-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable manifest at {self.path}: {e}")
+            return
+
+        if (not isinstance(manifest, dict) or
+                manifest.get("version") != MANIFEST_VERSION):
+            log.info(f"Ignoring manifest at {self.path} "
+                     "from a different version of topgen.")
+            return
+        self.steps = manifest.get("steps", {})
+
+    def is_fresh(self, step: str, input_hash: str) -> bool:
+        """Return true if step can be skipped.
+
+        This is true if the step was last run with inputs matching
+        input_hash and every file that it wrote still has the same contents.
+        """
+        entry = self.steps.get(step)
+        if entry is None or entry.get("inputs") != input_hash:
+            return False
+
+        for rel_path, out_hash in entry.get("outputs", {}).items():
+            path = self.out_path / rel_path
+            try:
+                if hash_file(path) != out_hash:
+                    log.info(f"{step}: {path} has changed since generation")
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def record(self, step: str, input_hash: str,
+               outputs: Iterable[Union[Path, str]]) -> None:
+        """Record that step ran with the given inputs, writing outputs.
+
+        Each item of outputs is either a file or a directory (where every
+        file under the directory is recorded). The manifest is written back
+        straight away, so that a run that stops early still keeps the steps
+        that completed.
+        """
+        out_hashes = {}
+        for output in outputs:
+            for path in _tree_files(Path(output)):
+                rel_path = os.path.relpath(path, self.out_path)
+                out_hashes[Path(rel_path).as_posix()] = hash_file(path)
+
+        self.steps[step] = {"inputs": input_hash, "outputs": out_hashes}
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest to the output tree (atomically)."""
+        self.out_path.mkdir(parents=True, exist_ok=True)
+        manifest = {"version": MANIFEST_VERSION, "steps": self.steps}
+        fd, tmp_path = tempfile.mkstemp(dir=self.out_path,
+                                        prefix=MANIFEST_NAME)
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+                f.write("\n")
+            # mkstemp creates the file as 0600. Give it the permissions that
+            # the other generated files get.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
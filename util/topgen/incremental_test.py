@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors (OpenTitan project).
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from topgen.incremental import (MANIFEST_NAME, GenManifest, fingerprint,
+                                hash_inputs)
+
+
+class TestGenManifest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.out_path = Path(self._tmpdir.name)
+        self.gen_dir = self.out_path / "ip_autogen" / "foo"
+        self.gen_dir.mkdir(parents=True)
+        (self.gen_dir / "a.sv").write_text("module a; endmodule\n")
+        (self.gen_dir / "b.hjson").write_text("{}\n")
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_fresh_after_record(self):
+        inputs = hash_inputs("foo", {"x": 1, "y": [2, 3]})
+        manifest = GenManifest(self.out_path)
+        self.assertFalse(manifest.is_fresh("ipgen:foo", inputs))
+        manifest.record("ipgen:foo", inputs, [self.gen_dir])
+        self.assertTrue((self.out_path / MANIFEST_NAME).exists())
+
+        # A new manifest reads back what was recorded
+        manifest = GenManifest(self.out_path)
+        self.assertTrue(manifest.is_fresh("ipgen:foo", inputs))
+        self.assertFalse(
+            manifest.is_fresh("ipgen:foo", hash_inputs("foo", {"x": 2})))
+        self.assertFalse(manifest.is_fresh("ipgen:bar", inputs))
+
+    def test_input_hash_ignores_key_order(self):
+        self.assertEqual(hash_inputs({"x": 1, "y": 2}),
+                         hash_inputs({"y": 2, "x": 1}))
+
+    def test_fingerprint(self):
+        cfg = {"x": [1, Decimal("2.5")], "y": {"z": "a"}}
+        self.assertEqual(fingerprint(cfg),
+                         fingerprint({"x": [1, Decimal("2.5")],
+                                      "y": {"z": "a"}}))
+        self.assertNotEqual(fingerprint(cfg),
+                            fingerprint({"y": {"z": "a"},
+                                         "x": [1, Decimal("2.5")]}))
+        self.assertNotEqual(fingerprint(cfg),
+                            fingerprint({"x": [1, Decimal("2.6")],
+                                         "y": {"z": "a"}}))
+
+    def test_changed_outputs(self):
+        inputs = hash_inputs("foo")
+        GenManifest(self.out_path).record("ipgen:foo", inputs, [self.gen_dir])
+
+        (self.gen_dir / "a.sv").write_text("module a2; endmodule\n")
+        self.assertFalse(GenManifest(self.out_path).is_fresh("ipgen:foo",
+                                                             inputs))
+
+        GenManifest(self.out_path).record("ipgen:foo", inputs, [self.gen_dir])
+        (self.gen_dir / "b.hjson").unlink()
+        self.assertFalse(GenManifest(self.out_path).is_fresh("ipgen:foo",
+                                                             inputs))
+
+    def test_bad_manifest(self):
+        (self.out_path / MANIFEST_NAME).write_text("not json")
+        manifest = GenManifest(self.out_path)
+        self.assertEqual(manifest.steps, {})
+
+
+if __name__ == '__main__':
+    unittest.main()